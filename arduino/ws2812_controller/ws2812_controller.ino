@@ -7,8 +7,8 @@
 
 // Set to the number of LEDs in your LED strip
 #define NUM_LEDS 60
-// Maximum number of packets to hold in the buffer. Don't change this.
-#define BUFFER_LEN 1024
+// Maximum size of a received packet. Must be at least the max_packet_size of the sender.
+#define BUFFER_LEN 1472
 // Toggles FPS output (1 = print FPS over serial, 0 = disable output)
 #define SERIAL_OUTPUT 1
 
@@ -22,7 +22,18 @@ IPAddress subnet(255, 255, 255, 0);
 // Do not change unless you know what you are doing
 char magicPacket[] = "ESP8266 DISCOVERY";
 unsigned int localPort = 7777;
-char packetBuffer[BUFFER_LEN];
+char packetBuffer[BUFFER_LEN + 1];
+
+// Protocol version 2, see audioled/esp_protocol.py
+// |'M'|'2'|flags|reserved|seq|num_runs| followed by runs |offset|count|rgb...|
+#define PROTO_VERSION 2
+#define V2_HEADER_LEN 8
+#define V2_RUN_HEADER_LEN 4
+#define FLAG_END_OF_FRAME 0x01
+// Packets of frames up to MAX_REORDER frames older than the current frame are dropped
+#define MAX_REORDER 64
+uint16_t currentSeq = 0;
+bool haveSeq = false;
 
 // LED strip
 static WS2812 ledstrip;
@@ -62,16 +73,23 @@ void loop() {
     }
 
     if (packetSize) {
-        uint16_t len = port.read(packetBuffer, BUFFER_LEN);    
-        
+        uint16_t len = port.read(packetBuffer, BUFFER_LEN);
+        packetBuffer[len] = 0;
+
         // Check for a magic packet discovery broadcast
         if (!strcmp(packetBuffer, magicPacket)) {
             char reply[50];
-            sprintf(reply, "ESP8266 ACK LEDS %i", NUM_LEDS);
+            sprintf(reply, "ESP8266 ACK LEDS %i PROTO %i", NUM_LEDS, PROTO_VERSION);
             sendReply(reply);
             return;
         }
 
+        // Protocol version 2 packets start with magic bytes
+        if (len >= V2_HEADER_LEN && packetBuffer[0] == 'M' && packetBuffer[1] == '2') {
+            handleV2Packet((uint8_t*)packetBuffer, len);
+            return;
+        }
+
         // Decode byte sequence and display on LED strip
         N = 0;
         for(uint16_t i = 0; i < len; i+=3) {
@@ -88,6 +106,48 @@ void loop() {
     ledstrip.show(pixels);
 }
 
+static uint16_t readUint16(uint8_t* data) {
+    return data[0] | (data[1] << 8);
+}
+
+// Decodes a protocol version 2 packet, shows the frame on its last packet
+void handleV2Packet(uint8_t* data, uint16_t len) {
+    uint8_t flags = data[2];
+    uint16_t seq = readUint16(data + 4);
+    uint16_t numRuns = readUint16(data + 6);
+
+    // Drop packets of frames older than the current one.
+    // Much older frames are accepted, the sender was probably restarted.
+    int16_t age = (int16_t)(seq - currentSeq);
+    if (haveSeq && age < 0 && age > -MAX_REORDER) {
+        return;
+    }
+    currentSeq = seq;
+    haveSeq = true;
+
+    uint16_t pos = V2_HEADER_LEN;
+    for (uint16_t r = 0; r < numRuns; r++) {
+        if (pos + V2_RUN_HEADER_LEN > len) {
+            return;
+        }
+        uint16_t offset = readUint16(data + pos);
+        uint16_t count = readUint16(data + pos + 2);
+        pos += V2_RUN_HEADER_LEN;
+        if (pos + 3 * count > len) {
+            return;
+        }
+        for (uint16_t i = 0; i < count && offset + i < NUM_LEDS; i++) {
+            pixels[offset + i].R = data[pos + 3 * i + 0];
+            pixels[offset + i].G = data[pos + 3 * i + 1];
+            pixels[offset + i].B = data[pos + 3 * i + 2];
+        }
+        pos += 3 * count;
+    }
+    if (flags & FLAG_END_OF_FRAME) {
+        ledstrip.show(pixels);
+    }
+}
+
 // Sends a UDP reply packet to the sender
 void sendReply(char message[]) {
     port.beginPacket(port.remoteIP(), port.remotePort());
@@ -0,0 +1,205 @@
+"""Shared analysis of audio chunks
+
+Audio-reactive effects connected to the same audio buffer need the same features of every chunk:
+band-pass filtered signals with their peak and rms, a windowed FFT and perceptual band energies.
+AudioAnalysis computes each requested feature once per chunk, further requests get the cached result.
+Results are read-only, since they are shared between effects.
+
+Stateful features (filters) keep their state across chunks.
+Filter bands are only kept while they are requested in every chunk, a band not requested in the last chunk is dropped.
+Requests passing an owner replace the previous band of the owner, so modulated cutoffs don't add a band per chunk.
+FFT windows spanning several chunks are views of the audio history (see AudioBuffer.setHistory),
+without a history the analysis records the chunks itself once a window was requested.
+State that wasn't requested for MAX_IDLE_CHUNKS chunks is dropped.
+"""
+import numpy as np
+
+from audioled import dsp
+from audioled.audio import AudioRing
+
+MAX_IDLE_CHUNKS = 120
+FILTER_ORDER = 3
+
+
+def _readonly(array):
+    array.flags.writeable = False
+    return array
+
+
+class AudioAnalysis(object):
+    """Per-chunk features of an audio signal, see AudioBuffer.getAnalysis"""
+    def __init__(self):
+        self._audio = None
+        self._sample_rate = None
+        self._chunk = 0
+        self._features = {}
+        # key -> [state, chunk the state was last used]
+        self._states = {}
+        self._filterBank = None  # type: dsp.FilterBank
+        # (lowcut, highcut) -> chunk the band was last used
+        self._bandsUsed = {}
+        # owner -> (lowcut, highcut) last requested by the owner
+        self._bandOwners = {}
+        # (ring, channel, gain, frame_length) of the audio history
+        self._history = None
+        self._ownRing = None  # type: AudioRing
+        self._frameLength = None
+
+    def setHistory(self, ring, channel, gain=1., frame_length=None):
+        """Sets the audio history of the next chunk, see AudioBuffer.setHistory"""
+        self._history = (ring, channel, gain, frame_length)
+        self._ownRing = None
+
+    def setAudio(self, audio, sample_rate):
+        """Sets the next chunk, features of the previous chunk are discarded"""
+        self._audio = audio
+        self._sample_rate = sample_rate
+        self._chunk += 1
+        self._features.clear()
+        if self._frameLength is None and audio is not None:
+            self._frameLength = len(audio)
+        if self._ownRing is not None:
+            self._ownRing.writeChannels(audio[None, :], 0.)
+        if self._chunk % MAX_IDLE_CHUNKS == 0:
+            self._states = {key: entry for key, entry in self._states.items() if self._chunk - entry[1] < MAX_IDLE_CHUNKS}
+        # Only bands requested in the last chunk are advanced further
+        for band, chunk in list(self._bandsUsed.items()):
+            if chunk < self._chunk - 1:
+                self._filterBank.removeBand(*band)
+                del self._bandsUsed[band]
+        self._bandOwners = {owner: band for owner, band in self._bandOwners.items() if band in self._bandsUsed}
+
+    def getSampleRate(self):
+        return self._sample_rate
+
+    def _feature(self, key, compute):
+        try:
+            return self._features[key]
+        except KeyError:
+            value = compute()
+            self._features[key] = value
+            return value
+
+    def _state(self, key, create):
+        entry = self._states.get(key)
+        if entry is None:
+            entry = [create(), self._chunk]
+            self._states[key] = entry
+        entry[1] = self._chunk
+        return entry[0]
+
+    def filtered(self, lowcut_hz=None, highcut_hz=None, owner=None):
+        """Returns the chunk filtered by a band-pass (see dsp.FilterBank), the unfiltered chunk if no cutoff is given
+
+        Arguments:
+            lowcut_hz {float} -- Lower cutoff of the band-pass
+            highcut_hz {float} -- Upper cutoff of the band-pass
+            owner {hashable} -- Requester of the band, e.g. the effect, its previous band is replaced by a changed band
+        """
+        if lowcut_hz is None and highcut_hz is None:
+            return self._audio
+        band = (lowcut_hz, highcut_hz)
+        key = ('filtered', ) + band
+        if key not in self._features:
+            self._filter(band, owner)
+        self._bandsUsed[band] = self._chunk
+        if owner is not None:
+            self._bandOwners[owner] = band
+        return self._features[key]
+
+    def _filter(self, band, owner):
+        if self._filterBank is None:
+            self._filterBank = dsp.FilterBank(self._sample_rate, FILTER_ORDER)
+        bank = self._filterBank
+        bank.setSampleRate(self._sample_rate)
+        if band not in self._bandsUsed:
+            previous = self._bandOwners.get(owner) if owner is not None else None
+            if previous is not None and previous != band and self._canReplace(previous, owner):
+                # Keep the filter state, so a modulated cutoff doesn't restart the filter
+                bank.replaceBand(previous, *band)
+                del self._bandsUsed[previous]
+            else:
+                bank.addBand(*band)
+        index = bank.getBands().index(band)
+        self._features[('filtered', ) + band] = _readonly(bank.filter(self._audio, [index])[0])
+
+    def _canReplace(self, band, owner):
+        """Returns whether the band is used by the owner only and wasn't advanced in the current chunk"""
+        if self._bandsUsed.get(band) != self._chunk - 1:
+            return False
+        return all(b != band for o, b in self._bandOwners.items() if o != owner)
+
+    def peak(self, lowcut_hz=None, highcut_hz=None, owner=None):
+        """Returns the peak of the (filtered) chunk, see filtered"""
+        y = self.filtered(lowcut_hz, highcut_hz, owner)
+        return self._feature(('peak', lowcut_hz, highcut_hz), lambda: float(np.max(y)))
+
+    def rms(self, lowcut_hz=None, highcut_hz=None, owner=None):
+        """Returns the rms of the (filtered) chunk, see dsp.rms and filtered"""
+        y = self.filtered(lowcut_hz, highcut_hz, owner)
+        return self._feature(('rms', lowcut_hz, highcut_hz), lambda: dsp.rms(y))
+
+    def windowed(self, fmax, n_overlaps):
+        """Returns (samples, fs) of the audio of the last n_overlaps frames prepared for a FFT
+
+        The latest n_overlaps frame lengths of audio are downsampled as far as fmax allows,
+        hanning windowed and zero padded to a power of two.
+        """
+        return self._feature(('windowed', fmax, n_overlaps), lambda: self._window(fmax, n_overlaps))
+
+    def _getHistory(self, num_samples):
+        if self._history is not None:
+            return self._history
+        if self._ownRing is None or self._ownRing.capacity < num_samples:
+            # Record the chunks from now on, older audio is silence
+            ring = AudioRing(1, 2 * num_samples)
+            if self._ownRing is not None:
+                ring.writeChannels(self._ownRing.getWindow(self._ownRing.capacity), 0.)
+            else:
+                ring.writeChannels(self._audio[None, :], 0.)
+            self._ownRing = ring
+        return self._ownRing, 0, 1., self._frameLength
+
+    def _window(self, fmax, n_overlaps):
+        factor = dsp.downsample_factor(self._sample_rate, fmax)
+        frame_length = (self._history[3] if self._history is not None else None) or self._frameLength
+        num_samples = max(n_overlaps, 1) * frame_length
+        ring, channel, gain, _ = self._getHistory(num_samples)
+        # Strided view, the only copy is the windowed result
+        y = ring.getWindow(num_samples)[channel, ::factor]
+        hanning, out = self._state(('window', fmax, n_overlaps, len(y)),
+                                   lambda: (np.hanning(len(y)), np.zeros(dsp.next_pow2(len(y)))))
+        np.multiply(y, hanning, out=out[:len(y)])
+        if gain != 1.:
+            out[:len(y)] *= gain
+        return _readonly(out.view()), self._sample_rate // factor
+
+    def powerSpectrum(self, fmax, n_overlaps):
+        """Returns (power spectrum, n_fft, fs) of the windowed chunks, see windowed"""
+        def compute():
+            y, fs = self.windowed(fmax, n_overlaps)
+            # Output buffer is reused for every chunk, results are handed out as read-only view
+            out = self._state(('psd', fmax, n_overlaps, len(y)), lambda: np.empty(len(y) // 2 + 1, dtype=np.float32))
+            return _readonly(dsp.power_spectrum(y, out=out).view()), len(y), fs
+
+        return self._feature(('psd', fmax, n_overlaps), compute)
+
+    def bandEnergies(self, bins, fmin_hz, fmax_hz, scale='bark', fmax=None, n_overlaps=4):
+        """Returns the power of the windowed chunks in bins bands between fmin_hz and fmax_hz
+
+        Arguments:
+            bins {int} -- Number of bands
+            fmin_hz {float} -- Lower frequency of the first band
+            fmax_hz {float} -- Upper frequency of the last band
+            scale {str} -- Perceptual scale of the bands, 'bark' or 'mel'
+            fmax {float} -- Highest frequency of the FFT, defaults to fmax_hz
+            n_overlaps {int} -- Number of chunks in the FFT window
+        """
+        if fmax is None:
+            fmax = fmax_hz
+
+        def compute():
+            pow_spectrum, n_fft, fs = self.powerSpectrum(fmax, n_overlaps)
+            return _readonly(dsp.warp_power_spectrum(pow_spectrum, n_fft, bins, fs, [fmin_hz, fmax_hz], scale))
+
+        return self._feature(('bands', bins, fmin_hz, fmax_hz, scale, fmax, n_overlaps), compute)
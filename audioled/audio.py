@@ -6,11 +6,9 @@ import io
 from collections import OrderedDict
 
 import numpy as np
-import pyaudio
 from ctypes import cdll, CFUNCTYPE, c_char_p, c_int
 
-from audioled.effects import Effect
-from audioled.effect import AudioBuffer
+from audioled.effect import Effect, AudioBuffer
 
 import logging
 logger = logging.getLogger(__name__)
@@ -42,19 +40,35 @@ def py_error_handler(filename, line, function, err, fmt, *val):
 
 c_error_handler = ERROR_HANDLER_FUNC(py_error_handler)
 
-try:
-    asound = cdll.LoadLibrary('libasound.so')
-    # Set error handler
-    asound.snd_lib_error_set_handler(c_error_handler)
-except OSError:
-    pass
-except Exception as e:
-    logger.error("Error setting logger for libasound: {}", e)
+_pyaudio_module = None
+# pyaudio.paContinue, returned by stream callbacks without loading pyaudio for audio sources
+PA_CONTINUE = 0
+
+
+def _pyaudio():
+    """Returns the pyaudio module
+
+    pyaudio and libasound are only loaded on first use, so importing this module stays cheap
+    for processes that never open an audio device.
+    """
+    global _pyaudio_module
+    if _pyaudio_module is None:
+        try:
+            asound = cdll.LoadLibrary('libasound.so')
+            # Set error handler
+            asound.snd_lib_error_set_handler(c_error_handler)
+        except OSError:
+            pass
+        except Exception as e:
+            logger.error("Error setting logger for libasound: {}".format(e))
+        import pyaudio
+        _pyaudio_module = pyaudio
+    return _pyaudio_module
 
 
 def print_audio_devices():
     """Print information about the system's audio devices"""
-    p = pyaudio.PyAudio()
+    p = _pyaudio().PyAudio()
     for i in range(p.get_device_count()):
         info = p.get_device_info_by_index(i)
         print(info['name'])
@@ -66,7 +80,7 @@ def print_audio_devices():
 
 
 def numInputChannels(device_index=None):
-    p = pyaudio.PyAudio()
+    p = _pyaudio().PyAudio()
     device = device_index
     defaults = p.get_default_host_api_info()
     if device_index is None:
@@ -76,32 +90,233 @@ def numInputChannels(device_index=None):
     return info['maxInputChannels']
 
 
+class AudioRing(object):
+    """Preallocated float32 ring buffer for captured audio
+
+    Samples are stored per channel in an array of shape (num_channels, 2 * capacity).
+    Each chunk is written twice, capacity samples apart, so the latest num_samples <= capacity samples
+    are always available as a contiguous view without copying.
+    Each chunk is stored with the time.monotonic() timestamp of the capture of its first sample.
+
+    Views returned by getWindow and getLatestChunk are overwritten by later writes, they are meant for the writing thread.
+    Other threads read with getSamplesSince, which copies the samples and retries if a write overlapped the copy.
+    """
+    # Attempts of getSamplesSince to copy without a concurrent write
+    READ_RETRIES = 3
+
+    def __init__(self, num_channels, capacity, max_chunks=256):
+        self.num_channels = num_channels
+        self.capacity = capacity
+        self._data = np.zeros((num_channels, 2 * capacity), dtype=np.float32)
+        self._chunkTimes = np.zeros(max_chunks)
+        self._chunkLengths = np.zeros(max_chunks, dtype=np.int64)
+        # Total number of samples and chunks written
+        self.num_samples = 0
+        self.num_chunks = 0
+        # Incremented before and after each write, odd while a write is in progress
+        self._sequence = 0
+
+    def write(self, in_data, t):
+        """Writes a chunk of interleaved float32 samples
+
+        Arguments:
+            in_data {bytes} -- Interleaved samples (s0c0 s0c1 .. s0cn s1c0 ..) as delivered by PortAudio
+            t {float} -- Timestamp of the chunk
+        """
+        # Deinterleave through a transposed view, samples are copied once per ring half
+        self.writeChannels(np.frombuffer(in_data, dtype=np.float32).reshape(-1, self.num_channels).T, t)
+
+    def writeChannels(self, chunk, t):
+        """Writes a chunk of shape (num_channels, chunk length)
+
+        Arguments:
+            chunk {np.ndarray} -- Samples per channel
+            t {float} -- Timestamp of the chunk
+        """
+        n = min(chunk.shape[1], self.capacity)
+        chunk = chunk[:, chunk.shape[1] - n:]
+        self._sequence += 1
+        start = self.num_samples % self.capacity
+        first = min(n, self.capacity - start)
+        # Both halves hold the same samples, a window ending in the second half is always contiguous
+        self._data[:, self.capacity + start:self.capacity + start + first] = chunk[:, :first]
+        self._data[:, start:start + first] = chunk[:, :first]
+        if first < n:
+            self._data[:, self.capacity:self.capacity + n - first] = chunk[:, first:]
+            self._data[:, :n - first] = chunk[:, first:]
+        slot = self.num_chunks % len(self._chunkTimes)
+        self._chunkTimes[slot] = t
+        self._chunkLengths[slot] = n
+        self.num_samples += n
+        self.num_chunks += 1
+        self._sequence += 1
+
+    def getWindow(self, num_samples):
+        """Returns a read-only view of the latest num_samples samples of shape (num_channels, num_samples)
+
+        Samples not written yet are zero.
+        """
+        return self._getWindow(num_samples, self.num_samples)
+
+    def _getWindow(self, num_samples, total):
+        # View of num_samples samples ending after sample total
+        if num_samples > self.capacity:
+            raise ValueError("Window of {} samples exceeds capacity {}".format(num_samples, self.capacity))
+        end = total % self.capacity + self.capacity
+        view = self._data[:, end - num_samples:end]
+        view.flags.writeable = False
+        return view
+
+    def getLatestChunk(self):
+        """Returns a read-only view of the latest chunk of shape (num_channels, chunk length)"""
+        if self.num_chunks == 0:
+            return self.getWindow(0)
+        return self.getWindow(int(self._chunkLengths[(self.num_chunks - 1) % len(self._chunkLengths)]))
+
+    def getSamplesSince(self, position):
+        """Returns (samples, position) of all samples written since position, see num_samples
+
+        Samples older than capacity are lost. Without position, the latest chunk is returned.
+        The returned position is passed to the next call, so every sample is returned exactly once.
+        The samples are a copy, safe to read while another thread writes to the ring.
+        """
+        for _ in range(self.READ_RETRIES):
+            sequence = self._sequence
+            if sequence % 2 == 1:
+                # Let the writer finish
+                time.sleep(0)
+                continue
+            samples, num_samples = self._copySamplesSince(position)
+            if self._sequence == sequence:
+                return samples, num_samples
+        # Writes keep overlapping, samples at the start of the window may be torn
+        return self._copySamplesSince(position)
+
+    def _copySamplesSince(self, position):
+        num_samples = self.num_samples
+        if position is None:
+            length = int(self._chunkLengths[(self.num_chunks - 1) % len(self._chunkLengths)]) if self.num_chunks > 0 else 0
+        else:
+            length = min(num_samples - position, self.capacity)
+        return np.array(self._getWindow(length, num_samples)), num_samples
+
+    def getTimestamp(self, chunks_ago=0):
+        """Returns the timestamp of a chunk, None if the chunk is not available anymore"""
+        if chunks_ago >= min(self.num_chunks, len(self._chunkTimes)):
+            return None
+        return float(self._chunkTimes[(self.num_chunks - 1 - chunks_ago) % len(self._chunkTimes)])
+
+
 class GlobalAudio():
     device_index = None
+    # Audio of the current frame
     buffer = None
+    buffer_t = None
+    # Captured audio, only in the process owning the audio device
+    ring = None  # type: AudioRing
+    # Audio received frame by frame (see receive), in processes rendering frames
+    frame_ring = None  # type: AudioRing
+    block_size = None
+    # audiosource.AudioSource streamed instead of an audio device
+    source = None
+    overflows = 0
     chunk_rate = None
     sample_rate = None
     global_autogain_enabled = False
     global_autogain_maxgain = 1.
     global_autogain_time = 30.
+    # Seconds of audio kept in GlobalAudio.ring
+    history = 2.
+
+    def __init__(self, device_index=None, chunk_rate=60, num_channels=None, source=None, block_size=None):
+        """Captures audio from a PortAudio device or, if given, an audiosource.AudioSource
 
-    def __init__(self, device_index=None, chunk_rate=60, num_channels=None):
+        Arguments:
+            chunk_rate {float} -- Nominal frame rate, the block size defaults to one frame of audio
+            block_size {int} -- Samples per audio block, small blocks reduce the latency independent of the frame rate
+        """
         GlobalAudio.device_index = device_index
         GlobalAudio.chunk_rate = chunk_rate
+        GlobalAudio.block_size = block_size
+        GlobalAudio.source = None
         self.num_channels = 1
         try:
-            self.global_stream, GlobalAudio.sample_rate, self.num_channels = self.stream_audio(device_index, chunk_rate, num_channels)
+            if source is not None:
+                self.global_stream, GlobalAudio.sample_rate, self.num_channels = self.stream_source(
+                    source, chunk_rate, block_size)
+            else:
+                self.global_stream, GlobalAudio.sample_rate, self.num_channels = self.stream_audio(
+                    device_index, chunk_rate, num_channels, block_size)
         except Exception as e:
             logger.error("!!! Fatal error in audio device !!!")
             logger.error(e)
             traceback.print_tb(e.__traceback__)
 
     def _audio_callback(self, in_data, frame_count, time_info, status):
-        chunk = np.frombuffer(in_data, np.float32).astype(np.float)
-        # layout for multiple channel is interleaved:
-        # 00 01 .. 0n 10 11 .. 1n
-        GlobalAudio.buffer = np.array([chunk[i::self.num_channels] for i in range(self.num_channels)])
-        return (None, pyaudio.paContinue)
+        # Runs on the PortAudio thread, must not allocate more than necessary
+        if status:
+            GlobalAudio.overflows += 1
+        ring = GlobalAudio.ring
+        ring.write(in_data, self._capture_time(frame_count, time_info))
+        GlobalAudio.buffer = ring.getLatestChunk()
+        GlobalAudio.buffer_t = ring.getTimestamp()
+        return (None, PA_CONTINUE)
+
+    @staticmethod
+    def _capture_time(frame_count, time_info):
+        """Returns the time.monotonic() at which the first sample of the chunk was captured"""
+        now = time.monotonic()
+        if time_info:
+            # PortAudio reports the ADC time of the first sample in the stream clock, translate it via the current stream time
+            delay = time_info.get('current_time', 0.) - time_info.get('input_buffer_adc_time', 0.)
+            if 0. < delay < 1.:
+                return now - delay
+        # Audio sources and hosts without timing information deliver chunks as soon as they are complete
+        return now - frame_count / GlobalAudio.sample_rate
+
+    @staticmethod
+    def pull():
+        """Delivers one frame of audio from a source that doesn't run in real-time, called once per frame
+
+        Does nothing for audio devices and real-time sources.
+        """
+        source = GlobalAudio.source
+        if source is None or source.realtime or not GlobalAudio.chunk_rate:
+            return
+        source.pull(source.sample_rate / GlobalAudio.chunk_rate)
+
+    @staticmethod
+    def receive(audioBuffer, t=None):
+        """Appends the audio of a frame to frame_ring and makes it the current buffer
+
+        Frames carry all audio captured since the previous frame, so their length varies.
+        Analysis windows spanning several frames are read from frame_ring.
+        """
+        if audioBuffer is None:
+            GlobalAudio.buffer = None
+            return
+        ring = GlobalAudio.frame_ring
+        if ring is None or ring.num_channels != audioBuffer.shape[0]:
+            capacity = int(GlobalAudio.sample_rate * GlobalAudio.history) if GlobalAudio.sample_rate else audioBuffer.shape[1]
+            ring = AudioRing(audioBuffer.shape[0], max(capacity, audioBuffer.shape[1]))
+            GlobalAudio.frame_ring = ring
+        ring.writeChannels(audioBuffer, time.monotonic() if t is None else t)
+        GlobalAudio.buffer = ring.getLatestChunk()
+        GlobalAudio.buffer_t = t
+
+    @staticmethod
+    def getHistory():
+        """Returns the ring holding the audio preceding the current buffer"""
+        if GlobalAudio.frame_ring is not None:
+            return GlobalAudio.frame_ring
+        return GlobalAudio.ring
+
+    @staticmethod
+    def _create_ring(channels, sample_rate, chunk_length):
+        # Ring and sample rate have to exist before the first callback
+        GlobalAudio.sample_rate = sample_rate
+        GlobalAudio.ring = AudioRing(channels, max(int(sample_rate * GlobalAudio.history), chunk_length))
+        GlobalAudio.buffer = GlobalAudio.ring.getWindow(chunk_length)
 
     def _open_input_stream(self, chunk_length, device_index=None, channels=1, retry=0):
         """Opens a PyAudio audio input stream
@@ -113,7 +328,7 @@ class GlobalAudio():
             If device index is not specified then the default audio device
             will be opened.
         """
-        p = pyaudio.PyAudio()
+        p = _pyaudio().PyAudio()
         defaults = p.get_default_host_api_info()
 
         logger.info("Using audio device {}".format(device_index))
@@ -127,7 +342,8 @@ class GlobalAudio():
 
         try:
             frameRate = int(device_info['defaultSampleRate'])
-            stream = p.open(format=pyaudio.paFloat32,
+            self._create_ring(channels, frameRate, chunk_length)
+            stream = p.open(format=_pyaudio().paFloat32,
                             channels=channels,
                             rate=frameRate,
                             input=True,
@@ -136,7 +352,6 @@ class GlobalAudio():
                             stream_callback=self._audio_callback)
             stream.start_stream()
             logger.info("Started stream on device {}, fs: {}, chunk_length: {}, channels: {}".format(device_index, frameRate, chunk_length, channels))
-            GlobalAudio.buffer = np.zeros((chunk_length, channels))
         except OSError as e:
             if retry == 5:
                 err = 'Error occurred while attempting to open audio device. '
@@ -149,13 +364,13 @@ class GlobalAudio():
             return self._open_input_stream(chunk_length, device_index=device_index, channels=channels, retry=retry + 1)
         return stream, int(device_info['defaultSampleRate']), channels
 
-    def stream_audio(self, device_index=None, chunk_rate=60, channels=None):
+    def stream_audio(self, device_index=None, chunk_rate=60, channels=None, block_size=None):
         if device_index == -1:
             logger.info("Audio device disabled by device_index -1.")
             return None, None
         if device_index is None:
             logger.info("No device_index for audio given. Using default.")
-            p = pyaudio.PyAudio()
+            p = _pyaudio().PyAudio()
             defaults = p.get_default_host_api_info()
             p.terminate()
             device_index = defaults['defaultInputDevice']
@@ -164,7 +379,7 @@ class GlobalAudio():
                 err += 'Change default audio device or supply a specific device index. '
                 raise OSError(err)
         # Get samplerate for device
-        p = pyaudio.PyAudio()
+        p = _pyaudio().PyAudio()
         device_info = p.get_device_info_by_index(device_index)
         samplerate = int(device_info['defaultSampleRate'])
         available_channels = int(device_info['maxInputChannels'])
@@ -173,9 +388,19 @@ class GlobalAudio():
         else:
             channels = min(channels, available_channels)
 
-        chunk_length = int(samplerate // chunk_rate)
+        chunk_length = block_size or int(samplerate // chunk_rate)
         return self._open_input_stream(chunk_length, device_index=device_index, channels=channels)
 
+    def stream_source(self, source, chunk_rate=60, block_size=None):
+        """Streams an audiosource.AudioSource into the ring with the same block size as an audio device"""
+        chunk_length = block_size or int(source.sample_rate // chunk_rate)
+        self._create_ring(source.num_channels, source.sample_rate, chunk_length)
+        GlobalAudio.source = source
+        source.start(self._audio_callback, chunk_length)
+        logger.info("Started stream on {}, fs: {}, chunk_length: {}, channels: {}".format(
+            type(source).__name__, source.sample_rate, chunk_length, source.num_channels))
+        return source, source.sample_rate, source.num_channels
+
 
 class AudioInput(Effect):
     @staticmethod
@@ -289,6 +514,9 @@ class AudioInput(Effect):
             raise RuntimeError("No audio signal. Audio device might be not present or disabled.")
         if len(self._buffer) <= 0:
             return
+        if self._buffer.shape[-1] == 0:
+            # No audio arrived since the last frame, outputs keep the previous chunk and its analysis
+            return
         if self._autogain:
             
             # determine max value -> in range 0,1
@@ -302,7 +530,11 @@ class AudioInput(Effect):
         else:
             self._cur_gain = 1
         maxChannels = len(self._buffer)
+        history = GlobalAudio.getHistory()
+        frame_length = int(GlobalAudio.sample_rate // GlobalAudio.chunk_rate) if GlobalAudio.chunk_rate else None
         for i in range(0, self.num_channels):
+            if history is not None:
+                self._outBuffer[i].setHistory(history, i % maxChannels, self._cur_gain, frame_length)
             self._outBuffer[i].audio = self._cur_gain * self._buffer[i % maxChannels]
             # TODO: Calculate audio stats per channel: peak, rms, FFT buckets for remote display
             self._outputBuffer[i] = self._outBuffer[i]
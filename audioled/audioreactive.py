@@ -11,6 +11,8 @@ from scipy.ndimage.filters import gaussian_filter1d
 
 import audioled.colors as colors
 import audioled.dsp as dsp
+import audioled.particles as particles
+import audioled.shifter as shifter
 from audioled.effects import Effect
 import audioled.effect as effect
 
@@ -52,11 +54,8 @@ class Spectrum(Effect):
         self._fft_dist = np.linspace(0, 1, self.fft_bins)
         self._max_filter = np.ones(8)
         self._min_feature_win = np.hamming(8)
-        self._fs_ds = 0.0
         self._bass_rms = None
         self._melody_rms = None
-        self._lastAudioChunk = None
-        self._gen = None
         super(Spectrum, self).__initstate__()
 
     def numInputChannels(self):
@@ -97,14 +96,6 @@ class Spectrum(Effect):
     def getModulateableParameters(self):
         return []  # Disable all modulations
 
-    def _audio_gen(self, audio_gen):
-        audio, self._fs_ds = dsp.preprocess(audio_gen, self._fs, self.fmax, self.n_overlaps)
-        return audio
-
-    def buffer_coroutine(self):
-        while True:
-            yield self._lastAudioChunk
-
     async def update(self, dt):
         await super().update(dt)
         if self._num_pixels is None:
@@ -119,7 +110,6 @@ class Spectrum(Effect):
             self._outputBuffer[0] = None
             return
         audio = self._inputBuffer[0].audio
-        self._fs = self._inputBuffer[0].sample_rate
         col_melody = self._inputBuffer[1]
         col_bass = self._inputBuffer[2]
         if col_melody is None:
@@ -129,15 +119,9 @@ class Spectrum(Effect):
             # default color: all white
             col_bass = np.ones(self._num_pixels) * np.array([[255.0], [255.0], [255.0]])
         if audio is not None:
-            if self._gen is None:
-                g = self.buffer_coroutine()
-                next(g)
-                self._lastAudioChunk = audio
-                self._gen = self._audio_gen(g)
-            self._lastAudioChunk = audio
-            y = next(self._gen)
-            bass = dsp.warped_psd(y, self.fft_bins, self._fs_ds, [32.7, 261.0], 'bark')
-            melody = dsp.warped_psd(y, self.fft_bins, self._fs_ds, [261.0, self.fmax], 'bark')
+            analysis = self._inputBuffer[0].getAnalysis()
+            bass = analysis.bandEnergies(self.fft_bins, 32.7, 261.0, 'bark', fmax=self.fmax, n_overlaps=self.n_overlaps)
+            melody = analysis.bandEnergies(self.fft_bins, 261.0, self.fmax, 'bark', fmax=self.fmax, n_overlaps=self.n_overlaps)
             bass = self.process_line(bass)
             melody = self.process_line(melody)
             pixels = colors.blend(
@@ -189,8 +173,7 @@ class VUMeterRMS(Effect):
 
     def __initstate__(self):
         super().__initstate__()
-        self._hold_values = []
-        self._bandpass = None
+        self._hold_values = dsp.RingBuffer(1)
         self._default_color = None
 
     def numInputChannels(self):
@@ -259,24 +242,15 @@ class VUMeterRMS(Effect):
         if color is None:
             color = self._default_color
 
-        y = self._inputBuffer[0].audio
-        fs = self._inputBuffer[0].sample_rate
-
+        analysis = self._inputBuffer[0].getAnalysis()
         if self.lowcut_hz > 0 or self.highcut_hz < 20000:
-            # construct filter if needed
-            if self._bandpass is None:
-                self._bandpass = dsp.Bandpass(self.lowcut_hz, self.highcut_hz, fs, 3)
-            # update bandpass
-            self._bandpass.updateParams(self.lowcut_hz, self.highcut_hz, fs, 3)
-            # process audio
-            y = self._bandpass.filter(np.array(y), fs)
-
-        rms = dsp.rms(y)
+            rms = analysis.rms(self.lowcut_hz, self.highcut_hz, owner=self)
+        else:
+            rms = analysis.rms()
         # calculate rms over hold_time
-        while len(self._hold_values) > self.n_overlaps:
-            self._hold_values.pop()
-        self._hold_values.insert(0, rms)
-        rms = dsp.rms(self._hold_values)
+        self._hold_values.setCapacity(int(self.n_overlaps) + 1)
+        self._hold_values.push(rms)
+        rms = self._hold_values.rms()
         db = 20 * math.log10(max(rms, 1e-16))
         scal_value = (self.db_range + db) / self.db_range
         bar = np.zeros(self._num_pixels) * np.array([[0], [0], [0]])
@@ -310,8 +284,7 @@ class VUMeterPeak(Effect):
 
     def __initstate__(self):
         super().__initstate__()
-        self._hold_values = []
-        self._bandpass = None
+        self._hold_values = dsp.RingBuffer(1)
         self._default_color = None
 
     def numInputChannels(self):
@@ -380,24 +353,15 @@ class VUMeterPeak(Effect):
         if color is None:
             color = self._default_color
 
-        y = self._inputBuffer[0].audio
-        fs = self._inputBuffer[0].sample_rate
-
+        analysis = self._inputBuffer[0].getAnalysis()
         if self.lowcut_hz > 0 or self.highcut_hz < 20000:
-            # construct filter if needed
-            if self._bandpass is None:
-                self._bandpass = dsp.Bandpass(self.lowcut_hz, self.highcut_hz, fs, 3)
-            # update bandpass params
-            self._bandpass.updateParams(self.lowcut_hz, self.highcut_hz, fs, 3)
-            # process audio
-            y = self._bandpass.filter(np.array(y), fs)
-
-        peak = np.max(y)
+            peak = analysis.peak(self.lowcut_hz, self.highcut_hz, owner=self)
+        else:
+            peak = analysis.peak()
         # calculate max over hold_time
-        while len(self._hold_values) > self.n_overlaps:
-            self._hold_values.pop()
-        self._hold_values.insert(0, peak)
-        peak = np.max(self._hold_values)
+        self._hold_values.setCapacity(int(self.n_overlaps) + 1)
+        self._hold_values.push(peak)
+        peak = self._hold_values.max()
 
         db = (20 * (math.log10(max(peak, 1e-16))))
         scal_value = (self.db_range + db) / self.db_range
@@ -445,10 +409,9 @@ class MovingLight(Effect):
         super(MovingLight, self).__initstate__()
         # state
         self._pixel_state = None
-        self._bandpass = None
         self._last_t = 0.0
         self._last_move_t = 0.0
-        self._hold_values = []
+        self._hold_values = dsp.RingBuffer(1)
 
     def numInputChannels(self):
         return 2
@@ -502,19 +465,10 @@ class MovingLight(Effect):
         if not self._inputBufferValid(0, buffer_type=effect.AudioBuffer.__name__):
             self._outputBuffer[0] = None
             return
-        audio = self._inputBuffer[0].audio
-        fs = self._inputBuffer[0].sample_rate
         color = self._inputBuffer[1]
         if color is None:
             # default color: all white
             color = np.ones(self._num_pixels) * np.array([[255.0], [255.0], [255.0]])
-        # construct filter if needed
-        if self._bandpass is None:
-            self._bandpass = dsp.Bandpass(self.lowcut_hz, self.highcut_hz, fs, 3)
-        # update bandpass
-        self._bandpass.updateParams(self.lowcut_hz, self.highcut_hz, fs, 3)
-        # apply bandpass to audio
-        y = self._bandpass.filter(np.array(audio), fs)
         # move in speed
         dt_move = self._t - self._last_move_t
         # calculate number of pixels to shift
@@ -534,12 +488,11 @@ class MovingLight(Effect):
         self._pixel_state *= (1.0 - dt / self.dim_time)
         self._pixel_state = gaussian_filter1d(self._pixel_state, sigma=0.5, axis=1)
         self._pixel_state = gaussian_filter1d(self._pixel_state, sigma=0.5, axis=1)
-        # calculate current peak
-        peak = np.max(y) * 1.0
-        while len(self._hold_values) > 20 * self.smoothing:
-            self._hold_values.pop()
-        self._hold_values.insert(0, peak)
-        peak = np.max(self._hold_values)
+        # calculate current peak of band-passed audio
+        peak = self._inputBuffer[0].getAnalysis().peak(self.lowcut_hz, self.highcut_hz, owner=self)
+        self._hold_values.setCapacity(int(20 * self.smoothing) + 1)
+        self._hold_values.push(peak)
+        peak = self._hold_values.max()
         # apply peak filter and scale
         try:
             peak = peak**self.peak_filter
@@ -585,8 +538,8 @@ class Bonfire(Effect):
         self.__initstate__()
 
     def __initstate__(self):
-        self._bandpass = None
-        self._hold_values = []
+        self._hold_values = dsp.RingBuffer(1)
+        self._shifter = shifter.Shifter()
         super(Bonfire, self).__initstate__()
 
     def numInputChannels(self):
@@ -638,21 +591,11 @@ class Bonfire(Effect):
             # default color: all white
             pixelbuffer = np.ones(self._num_pixels) * np.array([[255.0], [255.0], [255.0]])
 
-        audio = self._inputBuffer[0].audio
-        fs = self._inputBuffer[0].sample_rate
-
-        # construct filter if needed
-        if self._bandpass is None:
-            self._bandpass = dsp.Bandpass(self.lowcut_hz, self.highcut_hz, fs, 3)
-        # update bandpass
-        self._bandpass.updateParams(self.lowcut_hz, self.highcut_hz, fs, 3)
-        # apply bandpass to audio
-        y = self._bandpass.filter(np.array(audio), fs)
-        peak = np.max(y) * 1.0
-        while len(self._hold_values) > 20 * self.smoothing:
-            self._hold_values.pop()
-        self._hold_values.insert(0, peak)
-        peak = np.max(self._hold_values)
+        # peak of band-passed audio
+        peak = self._inputBuffer[0].getAnalysis().peak(self.lowcut_hz, self.highcut_hz, owner=self)
+        self._hold_values.setCapacity(int(20 * self.smoothing) + 1)
+        self._hold_values.push(peak)
+        peak = self._hold_values.max()
         # apply peak filter and scale
         try:
             peak = peak**self.peak_filter
@@ -660,8 +603,7 @@ class Bonfire(Effect):
             peak = peak
         peak = peak * self.peak_scale
 
-        pixelbuffer[0] = sp.ndimage.interpolation.shift(pixelbuffer[0], -self.spread * peak, mode='wrap', prefilter=True)
-        pixelbuffer[2] = sp.ndimage.interpolation.shift(pixelbuffer[2], self.spread * peak, mode='wrap', prefilter=True)
+        pixelbuffer[[0, 2]] = self._shifter.shift(pixelbuffer[[0, 2]], [-self.spread * peak, self.spread * peak])
         self._outputBuffer[0] = pixelbuffer
 
 
@@ -695,11 +637,7 @@ class FallingStars(Effect):
 
     def __initstate__(self):
         # state
-        self._t0Array = []
-        self._spawnArray = []
-        self._peakArray = []
-        self._starCounter = 0
-        self._bandpass = None
+        self._stars = particles.ParticleSystem(100)
         super(FallingStars, self).__initstate__()
 
     @staticmethod
@@ -746,35 +684,13 @@ class FallingStars(Effect):
         return 1
 
     def spawnStar(self, peak):
-        self._starCounter += 1
-        self._t0Array.append(self._t)
-        self._spawnArray.append(random.randint(0, self._num_pixels - self.thickness))
-        self._peakArray.append(peak)
-        if self._starCounter > 100:
-            self._starCounter -= 1
-            self._t0Array.pop(0)
-            self._spawnArray.pop(0)
-            self._peakArray.pop(0)
-
-    def allStars(self, t, dim_speed, thickness, t0, spawnSpot, peak):
-        controlArray = []
-        for i in range(0, self._starCounter):
-            oneStarArray = np.zeros(self._num_pixels)
-            for j in range(0, thickness):
-                if i < len(spawnSpot):
-                    index = spawnSpot[i] + j
-                    if index < self._num_pixels:
-                        tmp = math.exp(-(100 / dim_speed) * (self._t - t0[i])) * max(self.min_brightness, peak[i])
-                        oneStarArray[index] = tmp
-            controlArray.append(oneStarArray)
-        return controlArray
+        self._stars.spawn(self._t, random.randint(0, self._num_pixels - self.thickness), max(self.min_brightness, peak))
 
     def starControl(self, prob, intensity):
         for i in range(int(self.max_spawns)):
             if random.random() <= prob:
                 self.spawnStar(intensity)
-        outputArray = self.allStars(self._t, self.dim_speed, self.thickness, self._t0Array, self._spawnArray, self._peakArray)
-        return np.sum(outputArray, axis=0)
+        return self._stars.render(self._t, 100 / self.dim_speed, self.thickness, self._num_pixels)
 
     async def update(self, dt):
         await super().update(dt)
@@ -799,19 +715,8 @@ class FallingStars(Effect):
         else:
             color = np.ones(self._num_pixels) * np.array([[255.0], [255.0], [255.0]])
 
-        audio = self._inputBuffer[0].audio
-        fs = self._inputBuffer[0].sample_rate
-
-        # construct filter if needed
-        if self._bandpass is None:
-            self._bandpass = dsp.Bandpass(self.lowcut_hz, self.highcut_hz, fs, 3)
-        # update bandpass
-        self._bandpass.updateParams(self.lowcut_hz, self.highcut_hz, fs, 3)
-        # apply bandpass to audio
-        y = self._bandpass.filter(np.array(audio), fs)
-
-        # adjust probability according to peak of audio
-        peak = np.max(y) * 1.0
+        # adjust probability according to peak of band-passed audio
+        peak = self._inputBuffer[0].getAnalysis().peak(self.lowcut_hz, self.highcut_hz, owner=self)
         maxpeak = 1
         try:
             peak = peak**self.peak_filter
@@ -845,7 +750,6 @@ class Oscilloscope(Effect):
 
     def __initstate__(self):
         super().__initstate__()
-        self._bandpass = None
         self._audioBuffer = None
         self._last_process_dt = 0.0
 
@@ -919,17 +823,10 @@ class Oscilloscope(Effect):
             color = np.ones(cols) * np.array([[255], [255], [255]])
 
         # Init audio
-        audio = self._inputBuffer[0].audio * self.gain
         fs = self._inputBuffer[0].sample_rate
 
-        # construct filter if needed
-        if self._bandpass is None:
-            self._bandpass = dsp.Bandpass(self.lowcut_hz, self.highcut_hz, fs, 3)
-        # update bandpass
-        self._bandpass.updateParams(self.lowcut_hz, self.highcut_hz, fs, 3)
-
-        # apply bandpass to audio
-        y = self._bandpass.filter(np.array(audio), fs)
+        # band-passed audio, filter is linear so gain can be applied afterwards
+        y = self._inputBuffer[0].getAnalysis().filtered(self.lowcut_hz, self.highcut_hz, owner=self) * self.gain
 
         # adjust number of samples to respect window_fq_hz.
         # if we have 440 samples @ 44000 Hz -> 440/44000 = 0.01 s of data -> 100 Hz
@@ -997,7 +894,7 @@ class Blink(Effect):
 
     def __initstate__(self):
         super().__initstate__()
-        self._hold_values = []
+        self._hold_values = dsp.RingBuffer(1)
         self._default_color = None
 
     def numInputChannels(self):
@@ -1035,13 +932,11 @@ class Blink(Effect):
             return
         if not self._inputBufferValid(0, buffer_type=effect.AudioBuffer.__name__):
             return
-        y = self._inputBuffer[0].audio
-        rms = dsp.rms(y)
+        rms = self._inputBuffer[0].getAnalysis().rms()
         # calculate rms over hold_time
-        while len(self._hold_values) > 20 * self.smoothing:
-            self._hold_values.pop()
-        self._hold_values.insert(0, rms)
-        rms = dsp.rms(self._hold_values)
+        self._hold_values.setCapacity(int(20 * self.smoothing) + 1)
+        self._hold_values.push(rms)
+        rms = self._hold_values.rms()
         db = 20 * math.log10(max(rms, 1e-16))
         scal_value = (self.db_range + db) / self.db_range
         self._outputBuffer[0] = self._inputBuffer[1] * (1 - self.amount) + self._inputBuffer[1] * scal_value * self.amount
@@ -1074,10 +969,10 @@ class Shift(Effect):
 
     def __initstate__(self):
         super().__initstate__()
-        self._bandpass = None
-        self._hold_values = []
+        self._hold_values = dsp.RingBuffer(1)
         self._shift_pixels = 0
         self._last_t = self._t
+        self._shifter = shifter.Shifter()
 
     def numInputChannels(self):
         return 2
@@ -1127,25 +1022,13 @@ class Shift(Effect):
             self._outputBuffer[0] = None
             return
 
-        # Init audio
-        audio = self._inputBuffer[0].audio
-        fs = self._inputBuffer[0].sample_rate
-
-        # construct filter if needed
-        if self._bandpass is None:
-            self._bandpass = dsp.Bandpass(self.lowcut_hz, self.highcut_hz, fs, 3)
-        # update bandpass
-        self._bandpass.updateParams(self.lowcut_hz, self.highcut_hz, fs, 3)
-        # apply bandpass to audio
-        y = self._bandpass.filter(np.array(audio), fs)
-
         x = self._inputBuffer[1]
-        rms = dsp.rms(y)
+        # rms of band-passed audio
+        rms = self._inputBuffer[0].getAnalysis().rms(self.lowcut_hz, self.highcut_hz, owner=self)
         # calculate rms over hold_time
-        while len(self._hold_values) > 20 * self.smoothing:
-            self._hold_values.pop()
-        self._hold_values.insert(0, rms)
-        rms = dsp.rms(self._hold_values)
+        self._hold_values.setCapacity(int(20 * self.smoothing) + 1)
+        self._hold_values.push(rms)
+        rms = self._hold_values.rms()
         db = 20 * math.log10(max(rms, 1e-16))
         db = max(db, -self.db_range)
 
@@ -1160,4 +1043,4 @@ class Shift(Effect):
         shift = dt_move * self.speed * 0.1 * scal_value
         self._shift_pixels = math.fmod((self._shift_pixels + shift), np.size(x, axis=1))
         self._last_t = self._t
-        self._outputBuffer[0] = sp.ndimage.interpolation.shift(x, [0, self._shift_pixels], mode='wrap', prefilter=True)
+        self._outputBuffer[0] = self._shifter.shift(x, self._shift_pixels)
@@ -0,0 +1,244 @@
+"""Audio sources feeding GlobalAudio without an audio device
+
+Sources deliver interleaved float32 chunks through the same callback as the PortAudio stream,
+so their audio ends up in the same ring buffer with the same chunk rate.
+Available sources:
+    FileAudioSource -- Playback of WAV files or raw interleaved float32 files
+    SyntheticAudioSource -- Deterministic test signals (sine, sweep, noise, kick)
+    NullAudioSource -- Silence
+Sources run in real-time or, e.g. for reproducible benchmarks, are pulled by the consumer one frame at a time
+(see GlobalAudio.pull).
+"""
+import os
+import threading
+import time
+import wave
+
+import numpy as np
+
+import logging
+logger = logging.getLogger(__name__)
+
+SYNTHETIC_SIGNALS = ['sine', 'sweep', 'noise', 'kick', 'click']
+NULL_SOURCE = 'null'
+
+
+class AudioSource(object):
+    """Base class for audio sources
+
+    Subclasses implement _generate(start, num_frames), returning the samples of shape (num_frames, num_channels)
+    starting at frame index start.
+
+    Arguments:
+        sample_rate {int} -- Sample rate in Hz
+        num_channels {int} -- Number of channels
+        realtime {bool} -- Deliver chunks in real-time, only when pulled otherwise
+    """
+    def __init__(self, sample_rate=44100, num_channels=2, realtime=True):
+        self.sample_rate = sample_rate
+        self.num_channels = num_channels
+        self.realtime = realtime
+        self._position = 0
+        self._callback = None
+        self._chunk_length = None
+        self._stopSignal = False
+        self._thread = None  # type: threading.Thread
+
+    def read(self, num_frames):
+        """Returns the next num_frames frames as interleaved float32 array"""
+        chunk = self._generate(self._position, num_frames)
+        self._position += num_frames
+        return np.ascontiguousarray(chunk, dtype=np.float32).reshape(-1)
+
+    def _generate(self, start, num_frames):
+        raise NotImplementedError('_generate() was not implemented')
+
+    def start(self, callback, chunk_length):
+        """Start delivering chunks
+
+        Sources that don't run in real-time only deliver chunks when pulled.
+
+        Arguments:
+            callback {callable} -- Called like a PortAudio stream callback with (in_data, frame_count, time_info, status)
+            chunk_length {int} -- Number of frames per chunk
+        """
+        if self._thread is not None:
+            return
+        self._callback = callback
+        self._chunk_length = chunk_length
+        self._stopSignal = False
+        if not self.realtime:
+            return
+        self._thread = threading.Thread(target=self._process_thread, name='AudioSourceThread')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=1):
+        """Stop delivering chunks
+        Raises TimeoutError """
+        self._stopSignal = True
+        if self._thread is None:
+            return
+        self._thread.join(timeout=timeout)
+        if self._thread.is_alive():
+            raise TimeoutError("thread.join timed out")
+        self._thread = None
+
+    def isAlive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def pull(self, num_frames):
+        """Delivers num_frames frames rounded to whole chunks, for sources that don't run in real-time"""
+        if self._callback is None or self._stopSignal:
+            return
+        for _ in range(max(1, int(round(num_frames / self._chunk_length)))):
+            self._callback(self.read(self._chunk_length), self._chunk_length, None, 0)
+
+    def _process_thread(self):
+        interval = self._chunk_length / self.sample_rate
+        next_t = time.monotonic()
+        while not self._stopSignal:
+            # Like a capture device, a chunk is delivered once all of its samples were 'recorded'
+            next_t += interval
+            delay = next_t - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -interval:
+                # Fell behind, continue from now instead of delivering a burst of chunks
+                next_t = time.monotonic()
+            self._callback(self.read(self._chunk_length), self._chunk_length, None, 0)
+
+
+class NullAudioSource(AudioSource):
+    """Silence"""
+    def _generate(self, start, num_frames):
+        return np.zeros((num_frames, self.num_channels), dtype=np.float32)
+
+
+class SyntheticAudioSource(AudioSource):
+    """Deterministic test signals, identical in all channels
+
+    Arguments:
+        signal {str} -- One of
+            'sine': Sine with frequency
+            'sweep': Logarithmic sine sweep through sweep_range within sweep_time seconds, repeated
+            'noise': White noise from a random generator seeded with seed
+            'kick': Kick drum pattern with bpm beats per minute
+            'click': Short full-scale burst on every beat with bpm beats per minute, silence in between
+        amplitude {float} -- Peak amplitude of the signal
+    """
+    def __init__(self,
+                 signal='sweep',
+                 sample_rate=44100,
+                 num_channels=2,
+                 realtime=True,
+                 amplitude=0.5,
+                 frequency=440.,
+                 sweep_range=(20., 20000.),
+                 sweep_time=10.,
+                 bpm=120.,
+                 seed=0):
+        super().__init__(sample_rate, num_channels, realtime)
+        if signal not in SYNTHETIC_SIGNALS:
+            raise ValueError("Unknown signal {}, must be one of {}".format(signal, SYNTHETIC_SIGNALS))
+        self.signal = signal
+        self.amplitude = amplitude
+        self.frequency = frequency
+        self.sweep_range = sweep_range
+        self.sweep_time = sweep_time
+        self.bpm = bpm
+        self._random = np.random.RandomState(seed)
+
+    def _generate(self, start, num_frames):
+        t = (start + np.arange(num_frames)) / self.sample_rate
+        if self.signal == 'sine':
+            y = np.sin(2 * np.pi * self.frequency * t)
+        elif self.signal == 'sweep':
+            f0, f1 = self.sweep_range
+            rate = np.log(f1 / f0) / self.sweep_time
+            y = np.sin(2 * np.pi * f0 / rate * np.expm1(rate * np.mod(t, self.sweep_time)))
+        elif self.signal == 'noise':
+            y = self._random.random_sample(num_frames) * 2 - 1
+        elif self.signal == 'click':
+            # 1 ms square burst starting exactly on the beat
+            y = (np.mod(start + np.arange(num_frames), self.getBeatLength()) < self.sample_rate // 1000).astype(np.float64)
+        else:
+            # Decaying sine with falling pitch on every beat
+            tb = np.mod(t, 60. / self.bpm)
+            y = np.exp(-tb * 30) * np.sin(2 * np.pi * (50 * tb + 100 / 40 * -np.expm1(-tb * 40)))
+        y = (self.amplitude * y).astype(np.float32)
+        return np.repeat(y[:, None], self.num_channels, axis=1)
+
+    def getBeatLength(self):
+        """Returns the number of samples between beats of the kick and click signals"""
+        return int(round(self.sample_rate * 60. / self.bpm))
+
+
+class FileAudioSource(AudioSource):
+    """Playback of an audio file
+
+    WAV files (8, 16, 24 or 32 bit PCM) provide their own sample rate and channels,
+    all other files are read as raw interleaved float32 samples with the given sample rate and channels.
+
+    Arguments:
+        filename {str} -- Audio file
+        looping {bool} -- Restart at the end of the file, silence after the end otherwise
+    """
+    def __init__(self, filename, looping=True, realtime=True, sample_rate=44100, num_channels=1):
+        if os.path.splitext(filename)[1].lower() == '.wav':
+            samples, sample_rate = self._readWav(filename)
+        else:
+            samples = np.fromfile(filename, dtype=np.float32).reshape(-1, num_channels)
+        super().__init__(sample_rate, samples.shape[1], realtime)
+        self.filename = filename
+        self.looping = looping
+        self._samples = samples
+        logger.info("Playing {} ({} channels, {} Hz, {:.1f} s)".format(filename, self.num_channels, sample_rate,
+                                                                      len(samples) / sample_rate))
+
+    @staticmethod
+    def _readWav(filename):
+        with wave.open(filename, 'rb') as f:
+            width = f.getsampwidth()
+            channels = f.getnchannels()
+            sample_rate = f.getframerate()
+            data = f.readframes(f.getnframes())
+        if width == 1:
+            samples = (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128) / 128
+        elif width == 2:
+            samples = np.frombuffer(data, dtype='<i2').astype(np.float32) / 2**15
+        elif width == 3:
+            # Pad 24 bit samples to 32 bit
+            padded = np.zeros((len(data) // 3, 4), dtype=np.uint8)
+            padded[:, 1:] = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+            samples = padded.view('<i4').reshape(-1).astype(np.float32) / 2**31
+        elif width == 4:
+            samples = np.frombuffer(data, dtype='<i4').astype(np.float32) / 2**31
+        else:
+            raise ValueError("Unsupported sample width {} in {}".format(width, filename))
+        return samples.reshape(-1, channels), sample_rate
+
+    def _generate(self, start, num_frames):
+        if len(self._samples) == 0:
+            return np.zeros((num_frames, self.num_channels), dtype=np.float32)
+        indices = start + np.arange(num_frames)
+        if self.looping:
+            return np.take(self._samples, indices, axis=0, mode='wrap')
+        chunk = np.take(self._samples, indices, axis=0, mode='clip')
+        chunk[indices >= len(self._samples)] = 0
+        return chunk
+
+
+def createAudioSource(spec, sample_rate=44100, num_channels=2, realtime=True):
+    """Creates an audio source from a command line specification
+
+    Arguments:
+        spec {str} -- 'null', one of SYNTHETIC_SIGNALS or the path of an audio file
+    """
+    if spec == NULL_SOURCE:
+        return NullAudioSource(sample_rate, num_channels, realtime)
+    if spec in SYNTHETIC_SIGNALS:
+        return SyntheticAudioSource(spec, sample_rate, num_channels, realtime)
+    if not os.path.exists(spec):
+        raise FileNotFoundError("Audio file {} does not exist.".format(spec))
+    return FileAudioSource(spec, realtime=realtime)
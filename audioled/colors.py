@@ -5,7 +5,6 @@ import math
 from collections import OrderedDict
 
 import numpy as np
-from PIL import Image
 
 from audioled.effect import Effect
 
@@ -58,6 +57,7 @@ def blend(pixel_a, pixel_b, blend_mode):
 
 
 def hsv_to_rgb(hsv):
+    from PIL import Image
     a = np.expand_dims(hsv, axis=1).T.astype(np.uint8)
     pImg = Image.fromarray(a, mode='HSV')
     pImg = pImg.convert('RGB')
@@ -67,6 +67,7 @@ def hsv_to_rgb(hsv):
 
 
 def rgb_to_hsv(rgb):
+    from PIL import Image
     a = np.expand_dims(rgb, axis=1).T.astype(np.uint8)
     pImg = Image.fromarray(a, mode='RGB')
     pImg = pImg.convert('HSV')
@@ -318,6 +319,7 @@ class RGBToHSV(Effect):
         a = self._inputBuffer[0]
         if a is None:
             return
+        from PIL import Image
         a = np.expand_dims(a, axis=1).T.astype(np.uint8)
         pImg = Image.fromarray(a, mode='RGB')
         pImg = pImg.convert('HSV')
@@ -347,6 +349,7 @@ class HSVToRGB(Effect):
         a = self._inputBuffer[0]
         if a is None:
             return
+        from PIL import Image
         a = np.expand_dims(a, axis=1).T.astype(np.uint8)
         pImg = Image.fromarray(a, mode='HSV')
         pImg = pImg.convert('RGB')
@@ -4,10 +4,15 @@ from __future__ import unicode_literals
 from __future__ import absolute_import
 from collections import OrderedDict
 from typing import List
+import hashlib
+import json
+import os
+import struct
 import time
 import numpy as np
 import multiprocessing
 from audioled.effect import Effect
+from audioled.sender import FrameSender
 import logging
 logger = logging.getLogger(__name__)
 
@@ -38,6 +43,10 @@ class LEDController:
         device = LEDController()
         device.show(pixels)
     """
+    # Interval in seconds after which an unchanged frame is sent again to keep the device alive.
+    # None if unchanged frames never need to be sent again, 0 to send every frame.
+    KEEP_ALIVE_INTERVAL = 1.0
+
     def __init__(self, num_pixels, num_rows=1, brightness=1.0):
         self.num_pixels = num_pixels
         self.num_rows = num_rows
@@ -65,6 +74,24 @@ class LEDController:
     def setNumRows(self, num_rows):
         self.num_rows = num_rows
 
+    def getKeepAliveInterval(self):
+        return self.KEEP_ALIVE_INTERVAL
+
+    def setLatency(self, value):
+        self.latency = value
+
+    def getLatency(self):
+        """Returns the calibrated latency in seconds from show() until the LEDs light up"""
+        try:
+            return self.latency
+        except AttributeError:
+            self.latency = 0.
+            return self.latency
+
+    def getTransmitLatency(self):
+        """Returns the measured latency in seconds of frames sent in the background after show() returned"""
+        return 0.
+
     def shutdown(self):
         logger.debug("Shutting down device")
 
@@ -113,7 +140,17 @@ class LEDController:
 
 
 class ESP8266(LEDController):
-    def __init__(self, num_pixels, num_rows=1, ip='192.168.0.150', port=7777):
+    # Seconds between discovery packets while sending protocol version 1 to an ESP8266 that didn't reply
+    REPROBE_INTERVAL = 10.0
+
+    def __init__(self,
+                 num_pixels,
+                 num_rows=1,
+                 ip='192.168.0.150',
+                 port=7777,
+                 delta=False,
+                 max_packet_size=1400,
+                 keyframe_interval=30):
         super().__init__(num_pixels, num_rows)
         """Initialize object for communicating with as ESP8266
 
@@ -125,35 +162,138 @@ class ESP8266(LEDController):
         port: int, optional
             The port number to use when sending data to the ESP8266. This
             must exactly match the port number in the ESP8266's firmware.
+        delta: bool, optional
+            Only send changed pixels between keyframes if the ESP8266 supports
+            protocol version 2. UDP packets aren't retransmitted, pixels of a lost
+            packet stay stale until they change again or the next keyframe is sent.
+        max_packet_size: int, optional
+            Maximum UDP payload size for protocol version 2.
+        keyframe_interval: int, optional
+            Number of frames after which all pixels are sent again in delta mode.
         """
         import socket
+        from audioled import esp_protocol
         self._ip = ip
         self._port = port
         self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.settimeout(0.5)
+        self._protocol = None
+        self._nextProbe = 0.
+        # Time the last packet was sent in protocol version 2
+        self._lastPacket_t = 0.
+        self._encoder = esp_protocol.FrameEncoder(max_packet_size=max_packet_size,
+                                                  delta=delta,
+                                                  keyframe_interval=keyframe_interval)
+        self._sender = None
+        self._senderPid = None
+
+    def _discover(self):
+        """Sends a discovery packet and selects the protocol version from the reply
+
+        Older firmware may not reply, protocol version 1 is used then and discovery is repeated
+        every REPROBE_INTERVAL seconds while sending.
+        """
+        import socket
+        from audioled import esp_protocol
+        self._sock.sendto(esp_protocol.DISCOVERY, (self._ip, self._port))
+        self._nextProbe = time.monotonic() + self.REPROBE_INTERVAL
+        while True:
+            try:
+                reply, addr = self._sock.recvfrom(1024)
+            except socket.timeout:
+                if self._protocol != 1:
+                    logger.info("No discovery reply from ESP8266 {}:{}, using protocol version 1".format(
+                        self._ip, self._port))
+                self._protocol = 1
+                return True
+            result = esp_protocol.parseDiscoveryReply(reply)
+            if result is not None:
+                break
+        self._setProtocol(*result)
+        return True
+
+    def _pollDiscoveryReply(self):
+        """Reads pending discovery replies without blocking"""
+        import select
+        from audioled import esp_protocol
+        while select.select([self._sock], [], [], 0)[0]:
+            reply, addr = self._sock.recvfrom(1024)
+            result = esp_protocol.parseDiscoveryReply(reply)
+            if result is not None and result[1] != self._protocol:
+                self._setProtocol(*result)
+
+    def _setProtocol(self, num_leds, protocol):
+        self._protocol = protocol
+        logger.info("ESP8266 {}:{} with {} LEDs uses protocol version {}".format(self._ip, self._port, num_leds,
+                                                                                   self._protocol))
+        if num_leds < self.num_pixels:
+            logger.warning("ESP8266 {}:{} only supports {} LEDs, {} configured".format(
+                self._ip, self._port, num_leds, self.num_pixels))
+        self._encoder.reset()
+
+    def _send(self, pixels):
+        from audioled import esp_protocol
+        address = (self._ip, self._port)
+        if self._protocol == 1:
+            if time.monotonic() >= self._nextProbe:
+                # Sent right before a frame, older firmware may show the discovery packet as pixels
+                self._sock.sendto(esp_protocol.DISCOVERY, address)
+                self._nextProbe = time.monotonic() + self.REPROBE_INTERVAL
+            self._sock.sendto(pixels.tobytes(), address)
+            self._pollDiscoveryReply()
+            return
+        # Unchanged frames are encoded as empty delta, a keep-alive has to send a keyframe to reach the controller.
+        # Half the interval leaves room for frames submitted shortly before the keep-alive is due.
+        keepAlive = self.getKeepAliveInterval()
+        now = time.monotonic()
+        keyframe = keepAlive is not None and now - self._lastPacket_t >= 0.5 * keepAlive
+        packets = self._encoder.encode(pixels, keyframe=keyframe)
+        for packet in packets:
+            self._sock.sendto(packet, address)
+        if packets:
+            self._lastPacket_t = now
+
+    def _getSender(self):
+        # Sender thread is started in the process calling show(), threads don't survive fork
+        if self._sender is None or self._senderPid != os.getpid():
+            self._sender = FrameSender(self._send,
+                                       connect=self._discover,
+                                       disconnect=self._encoder.reset,
+                                       name='ESP8266Sender {}:{}'.format(self._ip, self._port))
+            self._sender.start()
+            self._senderPid = os.getpid()
+        return self._sender
+
+    def getStats(self):
+        """Returns statistics of the sender, see FrameSender.getStats"""
+        return self._sender.getStats() if self._sender is not None else None
+
+    def getTransmitLatency(self):
+        return self._sender.latency_avg if self._sender is not None else 0.
+
+    def shutdown(self):
+        if self._sender is not None and self._senderPid == os.getpid():
+            self._sender.stop()
+        self._sender = None
+        return super().shutdown()
 
     def show(self, pixels):
         """Sends UDP packets to ESP8266 to update LED strip values
 
         The ESP8266 will receive and decode the packets to determine what values
-        to display on the LED strip. The communication protocol supports LED strips
-        with a maximum of 256 LEDs.
-
-        The packet encoding scheme is:
-            |i|r|g|b|
-        where
-            i (0 to 255): Index of LED to change (zero-based)
-            r (0 to 255): Red value of LED
-            g (0 to 255): Green value of LED
-            b (0 to 255): Blue value of LED
+        to display on the LED strip. The protocol version is negotiated on connect,
+        see audioled.esp_protocol for the packet encoding.
+        Version 1 sends all pixels in a single datagram, version 2 splits frames into
+        MTU-sized packets and optionally sends only changed pixels.
         """
         if pixels is None:
             pixels = np.zeros((3, self.num_pixels))
-        message = (pixels * self.getBrightness()).T.clip(0, 255).astype(np.uint8).ravel().tostring()
-        self._sock.sendto(message, (self._ip, self._port))
+        frame = np.ascontiguousarray((pixels * self.getBrightness()).T.clip(0, 255).astype(np.uint8))
+        self._getSender().submit(frame)
 
 
 class FadeCandy(LEDController):
-    def __init__(self, num_pixels, num_rows=1, server='localhost:7890'):
+    def __init__(self, num_pixels, num_rows=1, server='localhost:7890', channels=None):
         super().__init__(num_pixels, num_rows)
         """Initializes object for communicating with a FadeCandy device
 
@@ -161,22 +301,74 @@ class FadeCandy(LEDController):
         ----------
         server: str, optional
             FadeCandy server used to communicate with the FadeCandy device.
+        channels: list of int, optional
+            Number of pixels per OPC channel. Pixels are split into consecutive
+            segments sent on OPC channels 1, 2, ... in a single transmission.
+            If None, all pixels are sent on channel 0.
         """
         import audioled.opc
+        self.channels = channels
         self.client = audioled.opc.Client(server)
+        self._sender = None
+        self._senderPid = None
+        self._connectFailed = False
+
+    def _connect(self):
         if self.client.can_connect():
             logger.info('Successfully connected to FadeCandy server.')
-        else:
+            self._connectFailed = False
+            return True
+        if not self._connectFailed:
+            # Sender retries in the background, only log the first failure
             logger.error('Could not connect to FadeCandy server.')
             logger.error('Ensure that fcserver is running and try again.')
+            self._connectFailed = True
+        return False
+
+    def _getSender(self):
+        # Sender thread is started in the process calling show(), threads don't survive fork
+        if self._sender is None or self._senderPid != os.getpid():
+            self._sender = FrameSender(self.client.put_channels,
+                                       connect=self._connect,
+                                       disconnect=self.client.disconnect,
+                                       name='FadeCandySender {}:{}'.format(self.client._ip, self.client._port))
+            self._sender.start()
+            self._senderPid = os.getpid()
+        return self._sender
+
+    def getStats(self):
+        """Returns statistics of the sender, see FrameSender.getStats"""
+        return self._sender.getStats() if self._sender is not None else None
+
+    def getTransmitLatency(self):
+        return self._sender.latency_avg if self._sender is not None else 0.
+
+    def shutdown(self):
+        if self._sender is not None and self._senderPid == os.getpid():
+            self._sender.stop()
+            self.client.disconnect()
+        self._sender = None
+        return super().shutdown()
 
     def show(self, pixels):
         if pixels is None:
             pixels = np.zeros((3, self.num_pixels))
-        self.client.put_pixels((pixels * self.getBrightness()).T.clip(0, 255).astype(int).tolist())
+        pixels = (pixels * self.getBrightness()).T
+        if not self.channels:
+            self._getSender().submit([(0, pixels)])
+            return
+        channel_pixels = []
+        start = 0
+        for channel, num in enumerate(self.channels):
+            channel_pixels.append((channel + 1, pixels[start:start + num]))
+            start += num
+        self._getSender().submit(channel_pixels)
 
 
 class BlinkStick(LEDController):
+    # LEDs keep their state, no need to resend unchanged frames
+    KEEP_ALIVE_INTERVAL = None
+
     def __init__(self, num_pixels, num_rows=1):
         super().__init__(num_pixels, num_rows)
         """Initializes a BlinkStick controller"""
@@ -217,6 +409,9 @@ class BlinkStick(LEDController):
 
 
 class RaspberryPi(LEDController):
+    # LEDs keep their state, no need to resend unchanged frames
+    KEEP_ALIVE_INTERVAL = None
+
     def __init__(self, num_pixels, num_rows=1, pin=18, invert_logic=False, freq=800000, dma=10):
         super().__init__(num_pixels, num_rows)
         """Creates a Raspberry Pi output device
@@ -247,6 +442,8 @@ class RaspberryPi(LEDController):
         self.__initstate__()
 
     def __initstate__(self):
+        self._lut = None
+        self._ledBuffer = None
         try:
             import rpi_ws281x
             logger.debug('Initializing RaspberryPI LED device')
@@ -257,6 +454,7 @@ class RaspberryPi(LEDController):
                                                 invert=self.invert,
                                                 brightness=self.brightness)
             self._strip.begin()
+            self._ledBuffer = self._getLedBuffer()
         except ImportError:
             url = 'learn.adafruit.com/neopixels-on-raspberry-pi/software'
             logger.error('Could not import the neopixel library')
@@ -291,6 +489,30 @@ class RaspberryPi(LEDController):
         self._strip._cleanup()
         return super().shutdown()
 
+    def _getLedBuffer(self):
+        """Returns the LED buffer of the rpi_ws281x channel as uint32 numpy array, None if not accessible"""
+        try:
+            import ctypes
+            import _rpi_ws281x as ws
+            address = int(ws.ws2811_channel_t_leds_get(self._strip._channel))
+            if address == 0:
+                return None
+            ledType = ctypes.c_uint32 * self.num_pixels
+            return np.ctypeslib.as_array(ledType.from_address(address))
+        except Exception as e:
+            logger.info("LED buffer not accessible, falling back to slice assignment: {}".format(e))
+            return None
+
+    def _getLut(self):
+        """Returns gamma correction lookup tables for red, green and blue
+
+        Values are already shifted to their position in the 24-bit LED value.
+        """
+        if self._lut is None:
+            values = _GAMMA_TABLE.astype(np.uint32)
+            self._lut = (np.left_shift(values, 16), np.left_shift(values, 8), values)
+        return self._lut
+
     def show(self, pixels):
         """Writes new LED values to the Raspberry Pi's LED strip
 
@@ -300,24 +522,236 @@ class RaspberryPi(LEDController):
         if pixels is None:
             pixels = np.zeros((3, self.num_pixels))
 
-        # Truncate values and cast to integer
-        n_pixels = pixels.shape[1]
-        pixels = (pixels * self.getBrightness()).clip(0, 255).astype(int)
-        # Optional gamma correction
-        pixels = _GAMMA_TABLE[pixels]
-        # Encode 24-bit LED values in 32 bit integers
-        r = np.left_shift(pixels[0][:].astype(int), 16)
-        g = np.left_shift(pixels[1][:].astype(int), 8)
-        b = pixels[2][:].astype(int)
-        rgb = np.bitwise_or(np.bitwise_or(g, r), b)
+        # Apply brightness, then truncate values and cast to integer
+        n_pixels = min(pixels.shape[1], self.num_pixels)
+        pixels = pixels[:, :n_pixels]
+        brightness = self.getBrightness()
+        if brightness != 1.0:
+            pixels = pixels * brightness
+        pixels = pixels.clip(0, 255).astype(np.uint8)
+        # Gamma correction, encode 24-bit LED values in 32 bit integers
+        lutR, lutG, lutB = self._getLut()
+        rgb = lutR[pixels[0]] | lutG[pixels[1]] | lutB[pixels[2]]
         # Update the pixels
-
-        for i in range(n_pixels):
-            self._strip.setPixelColor(i, int(rgb[i]))
+        if self._ledBuffer is not None:
+            self._ledBuffer[:n_pixels] = rgb
+        else:
+            self._strip._led_data[0:n_pixels] = rgb.tolist()
         self._strip.show()
 
 
+_E131_PORT = 5568
+_E131_ACN_ID = b'ASC-E1.17\x00\x00\x00'
+_E131_DATA_HEADER = 126
+_ARTNET_PORT = 6454
+_ARTNET_ID = b'Art-Net\x00'
+_ARTNET_DATA_HEADER = 18
+_DMX_SLOTS = 512
+_DMX_PIXELS_PER_UNIVERSE = 170
+
+
+def _e131DataPacket(universe, num_slots, cid, source_name, priority, sync_universe):
+    length = _E131_DATA_HEADER + num_slots
+    packet = bytearray(length)
+    # Root layer
+    struct.pack_into('>HH12sHI16s', packet, 0, 0x0010, 0x0000, _E131_ACN_ID, 0x7000 | (length - 16), 0x00000004, cid)
+    # Framing layer
+    struct.pack_into('>HI64sBHBBH', packet, 38, 0x7000 | (length - 38), 0x00000002,
+                     source_name.encode('utf-8')[:63], priority, sync_universe, 0, 0, universe)
+    # DMP layer
+    struct.pack_into('>HBBHHHB', packet, 115, 0x7000 | (length - 115), 0x02, 0xa1, 0x0000, 0x0001, num_slots + 1, 0x00)
+    return packet
+
+
+def _e131SyncPacket(cid, sync_universe):
+    packet = bytearray(49)
+    struct.pack_into('>HH12sHI16s', packet, 0, 0x0010, 0x0000, _E131_ACN_ID, 0x7000 | (49 - 16), 0x00000008, cid)
+    struct.pack_into('>HIBHH', packet, 38, 0x7000 | (49 - 38), 0x00000001, 0, sync_universe, 0)
+    return packet
+
+
+def _artnetDataPacket(universe, num_slots):
+    packet = bytearray(_ARTNET_DATA_HEADER + num_slots)
+    struct.pack_into('<8sH', packet, 0, _ARTNET_ID, 0x5000)
+    struct.pack_into('>HBBBBH', packet, 10, 14, 0, 0, universe & 0xFF, (universe >> 8) & 0x7F, num_slots)
+    return packet
+
+
+def _artnetSyncPacket():
+    packet = bytearray(14)
+    struct.pack_into('<8sH', packet, 0, _ARTNET_ID, 0x5200)
+    struct.pack_into('>HBB', packet, 10, 14, 0, 0)
+    return packet
+
+
+class DMXOutput(LEDController):
+    """Output device for DMX over IP using E1.31 (sACN) or Art-Net
+
+    Pixels are split into universes of 170 RGB pixels (510 DMX slots), starting with start_universe.
+    All universes of a frame are sent in one burst from preallocated packets, only pixel data and
+    sequence numbers are updated per frame.
+    """
+    def __init__(self,
+                 num_pixels,
+                 num_rows=1,
+                 protocol='e131',
+                 host=None,
+                 port=None,
+                 start_universe=1,
+                 channel_order='RGB',
+                 sync=False,
+                 sync_universe=0,
+                 source_name='MOLECOLE',
+                 priority=100):
+        super().__init__(num_pixels, num_rows)
+        """Creates a DMX over IP output device
+
+        Parameters
+        ----------
+        protocol: str, optional
+            'e131' for E1.31 (sACN) or 'artnet' for Art-Net.
+        host: str, optional
+            Receiver address. If None, E1.31 uses multicast per universe
+            and Art-Net uses broadcast.
+        port: int, optional
+            UDP port, defaults to 5568 for E1.31 and 6454 for Art-Net.
+        start_universe: int, optional
+            Universe of the first 170 pixels.
+        channel_order: str, optional
+            Order of the color channels in the DMX data, e.g. 'RGB' or 'GRB'.
+        sync: bool, optional
+            Send a synchronization packet after each frame.
+        sync_universe: int, optional
+            E1.31 synchronization universe, 0 to use start_universe.
+        source_name: str, optional
+            E1.31 source name.
+        priority: int, optional
+            E1.31 priority (0 to 200).
+        """
+        if protocol not in ['e131', 'artnet']:
+            raise ValueError("Unsupported DMX protocol {}".format(protocol))
+        if sorted(channel_order.upper()) != ['B', 'G', 'R']:
+            raise ValueError("Invalid channel order {}".format(channel_order))
+        self.protocol = protocol
+        self.host = host
+        self.port = port
+        self.start_universe = start_universe
+        self.channel_order = channel_order.upper()
+        self.sync = sync
+        self.sync_universe = sync_universe
+        self.source_name = source_name
+        self.priority = priority
+        self._sender = None
+        self._senderPid = None
+        self._sock = None
+        self._buildPackets()
+
+    def getUniverses(self):
+        """Returns the universes used for the configured number of pixels"""
+        num_universes = -(-self.num_pixels // _DMX_PIXELS_PER_UNIVERSE)
+        return list(range(self.start_universe, self.start_universe + num_universes))
+
+    def _address(self, universe):
+        if self.protocol == 'e131':
+            host = self.host or '239.255.{}.{}'.format((universe >> 8) & 0xFF, universe & 0xFF)
+            return (host, self.port or _E131_PORT)
+        return (self.host or '255.255.255.255', self.port or _ARTNET_PORT)
+
+    def _buildPackets(self):
+        import uuid
+        universes = self.getUniverses()
+        sync_universe = (self.sync_universe or self.start_universe) if self.sync else 0
+        cid = uuid.uuid4().bytes
+        header = _E131_DATA_HEADER if self.protocol == 'e131' else _ARTNET_DATA_HEADER
+        packets = []
+        for i, universe in enumerate(universes):
+            num_slots = 3 * min(_DMX_PIXELS_PER_UNIVERSE, self.num_pixels - i * _DMX_PIXELS_PER_UNIVERSE)
+            if self.protocol == 'e131':
+                packets.append(_e131DataPacket(universe, num_slots, cid, self.source_name, self.priority, sync_universe))
+            else:
+                # Art-Net requires an even number of slots
+                packets.append(_artnetDataPacket(universe, num_slots + num_slots % 2))
+        # All packets in a single buffer, pixel data and sequence numbers are updated in place
+        self._buffer = bytearray(b''.join(packets))
+        self._packets = []
+        self._slotIndex = []
+        self._seqIndex = []
+        offset = 0
+        for i, (universe, packet) in enumerate(zip(universes, packets)):
+            self._packets.append((offset, len(packet), self._address(universe)))
+            num_pixels = min(_DMX_PIXELS_PER_UNIVERSE, self.num_pixels - i * _DMX_PIXELS_PER_UNIVERSE)
+            self._slotIndex.append(offset + header + np.arange(3 * num_pixels))
+            self._seqIndex.append(offset + (111 if self.protocol == 'e131' else 12))
+            offset += len(packet)
+        self._slotIndex = np.concatenate(self._slotIndex) if self._slotIndex else np.zeros(0, dtype=np.int64)
+        self._seqIndex = np.array(self._seqIndex, dtype=np.int64)
+        self._channelIndex = np.array(['RGB'.index(c) for c in self.channel_order])
+        self._seq = 0
+        self._syncPacket = None
+        if self.sync:
+            if self.protocol == 'e131':
+                self._syncPacket = (_e131SyncPacket(cid, sync_universe), self._address(sync_universe))
+            else:
+                self._syncPacket = (_artnetSyncPacket(), self._address(self.start_universe))
+
+    def setNumPixels(self, num_pixels):
+        super().setNumPixels(num_pixels)
+        self._buildPackets()
+
+    def _send(self, frame):
+        if self._sock is None:
+            import socket
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            self._sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+        data = np.frombuffer(self._buffer, dtype=np.uint8)
+        n = min(len(frame), len(self._slotIndex))
+        data[self._slotIndex[:n]] = frame[:n]
+        # Sequence numbers 1..255, 0 disables sequence checking for Art-Net
+        self._seq = self._seq % 255 + 1
+        data[self._seqIndex] = self._seq
+        buffer = memoryview(self._buffer)
+        for offset, length, address in self._packets:
+            self._sock.sendto(buffer[offset:offset + length], address)
+        if self._syncPacket is not None:
+            packet, address = self._syncPacket
+            if self.protocol == 'e131':
+                packet[44] = self._seq
+            self._sock.sendto(packet, address)
+
+    def _getSender(self):
+        # Sender thread is started in the process calling show(), threads don't survive fork
+        if self._sender is None or self._senderPid != os.getpid():
+            self._sender = FrameSender(self._send, name='DMXSender {}'.format(self.protocol))
+            self._sender.start()
+            self._senderPid = os.getpid()
+        return self._sender
+
+    def getStats(self):
+        """Returns statistics of the sender, see FrameSender.getStats"""
+        return self._sender.getStats() if self._sender is not None else None
+
+    def getTransmitLatency(self):
+        return self._sender.latency_avg if self._sender is not None else 0.
+
+    def shutdown(self):
+        if self._sender is not None and self._senderPid == os.getpid():
+            self._sender.stop()
+        self._sender = None
+        return super().shutdown()
+
+    def show(self, pixels):
+        """Sends the pixels to the DMX universes"""
+        if pixels is None:
+            pixels = np.zeros((3, self.num_pixels))
+        frame = (pixels[self._channelIndex] * self.getBrightness()).T.clip(0, 255).astype(np.uint8).ravel()
+        self._getSender().submit(frame)
+
+
 class DotStar(LEDController):
+    # LEDs keep their state, no need to resend unchanged frames
+    KEEP_ALIVE_INTERVAL = None
+
     def __init__(self, num_pixels, num_rows=1, brightness=31):
         super().__init__(num_pixels, num_rows)
         """Creates an APA102-based output device
@@ -429,11 +863,29 @@ class VirtualOutput(LEDController):
     def setNumRows(self, num_rows):
         self.num_rows = num_rows
 
+    def getKeepAliveInterval(self):
+        return self.device.getKeepAliveInterval()
+
+    def setLatency(self, value):
+        self.device.setLatency(value)
+
+    def getLatency(self):
+        return self.device.getLatency()
+
+    def getTransmitLatency(self):
+        return self.device.getTransmitLatency()
+
     def show(self, pixels):
         # logger.debug("propagating virtual from {} to {}".format(self.start_index, (self.start_index+self.num_pixels)))
         npArray = np.ctypeslib.as_array(self._shared_array.get_obj()).reshape(3, -1)
         npArray[:, self.start_index:self.start_index+self.num_pixels] = pixels
 
+    def showMapped(self, pixels, mapping):
+        """Gathers pixels through a flat mapping (see compilePanelMapping) directly into the shared array"""
+        npArray = np.ctypeslib.as_array(self._shared_array.get_obj()).reshape(3, -1)
+        np.take(pixels.reshape(-1), mapping, out=npArray[:, self.start_index:self.start_index + mapping.shape[1]], mode='clip')
+
+
 class PanelWrapper(LEDController):
     """Device Wrapper for LED Panels
 
@@ -465,11 +917,13 @@ class PanelWrapper(LEDController):
         ]
     }
     """
-    def __init__(self, device, mappingJson):
+    def __init__(self, device, mappingJson, cacheDir=None):
         self.device = device
         self.num_pixels = device.num_pixels
         self.num_rows = device.num_rows
         self.pixel_mapping = None
+        self._cacheDir = cacheDir
+        self._mapped = None
         if mappingJson is not None:
             self.pixel_mapping = self._createPixelMapping(mappingJson)
 
@@ -491,49 +945,176 @@ class PanelWrapper(LEDController):
     def setNumRows(self, num_rows):
         self.device.setNumRows(num_rows)
 
+    def getKeepAliveInterval(self):
+        return self.device.getKeepAliveInterval()
+
+    def setLatency(self, value):
+        self.device.setLatency(value)
+
+    def getLatency(self):
+        return self.device.getLatency()
+
+    def getTransmitLatency(self):
+        return self.device.getTransmitLatency()
+
     def show(self, pixels):
-        mapped_pixels = pixels
-        if self.pixel_mapping is not None:
-            mapped_pixels = pixels[self.pixel_mapping[:, :, 0], self.pixel_mapping[:, :, 1]]
-        self.device.show(mapped_pixels)
-    
+        if self.pixel_mapping is None:
+            self.device.show(pixels)
+            return
+        if pixels.shape != self.pixel_mapping.shape:
+            # Flat indices are only valid for pixels with the shape of the panel
+            num_pixels = self.pixel_mapping.shape[1]
+            self.device.show(pixels[self.pixel_mapping // num_pixels, self.pixel_mapping % num_pixels])
+            return
+        if isinstance(self.device, VirtualOutput):
+            # Mapping and offset of the virtual output in a single gather
+            self.device.showMapped(pixels, self.pixel_mapping)
+            return
+        if self._mapped is None or self._mapped.shape != self.pixel_mapping.shape or self._mapped.dtype != pixels.dtype:
+            self._mapped = np.empty(self.pixel_mapping.shape, dtype=pixels.dtype)
+        np.take(pixels.reshape(-1), self.pixel_mapping, out=self._mapped, mode='clip')
+        self.device.show(self._mapped)
+
     def setPixelMapping(self, mappingJson):
         if mappingJson:
             self.pixel_mapping = self._createPixelMapping(mappingJson)
-    
+
     def setDevice(self, device):
         self.device = device
 
     def _createPixelMapping(self, mappingJson):
-        def toIdx(row, col, num_cols):
-            return row * num_cols + col
-
-        num_rows = mappingJson['num_rows']
-        num_cols = mappingJson['num_cols']
-        mapping = np.zeros((3, num_rows * num_cols, 2), dtype=np.int64)
-
-        for substrip in mappingJson['substrips']:
-            start_index = substrip['start_index']
-            row = substrip['row']
-            col = substrip['col']
-            dir = substrip['dir']
-            num_pixels = substrip['num_pixels']
-            cur_row = row
-            cur_col = col
-            for i in range(num_pixels):
-                index = start_index + i
-                mapping[0, index, :] = [0, toIdx(cur_row, cur_col, num_cols)]
-                mapping[1, index, :] = [1, toIdx(cur_row, cur_col, num_cols)]
-                mapping[2, index, :] = [2, toIdx(cur_row, cur_col, num_cols)]
-                if dir == 'L':
-                    cur_col = cur_col - 1
-                elif dir == 'R':
-                    cur_col = cur_col + 1
-                elif dir == 'U':
-                    cur_row = cur_row - 1
-                else:
-                    cur_row = cur_row + 1
-        return mapping
+        return loadPanelMapping(mappingJson, self._cacheDir)
+
+
+class RecordingOutput(LEDController):
+    """Device wrapper recording every shown frame into a memory-mapped ring file
+
+    Frames are stored as uint8 with a monotonic timestamp, see audioled.recording.
+    The file is created (and an existing recording overwritten) on the first frame shown.
+    """
+    def __init__(self, device, filename, capacity=3000):
+        self.device = device
+        self.num_pixels = device.num_pixels
+        self.num_rows = device.num_rows
+        self.filename = filename
+        self.capacity = capacity
+        self._ring = None
+        self._ringPid = None
+        self._recordingFailed = False
+
+    def getBrightness(self):
+        return self.device.getBrightness()
+
+    def setBrightness(self, value):
+        self.device.setBrightness(value)
+
+    def getNumPixels(self):
+        return self.device.getNumPixels()
+
+    def setNumPixels(self, num_pixels):
+        self.device.setNumPixels(num_pixels)
+        self._ring = None
+
+    def getNumRows(self):
+        return self.device.getNumRows()
+
+    def setNumRows(self, num_rows):
+        self.device.setNumRows(num_rows)
+
+    def getKeepAliveInterval(self):
+        # Every frame is recorded
+        return 0
+
+    def setLatency(self, value):
+        self.device.setLatency(value)
+
+    def getLatency(self):
+        return self.device.getLatency()
+
+    def getTransmitLatency(self):
+        return self.device.getTransmitLatency()
+
+    def getStats(self):
+        try:
+            return self.device.getStats()
+        except AttributeError:
+            return None
+
+    def shutdown(self):
+        if self._ring is not None and self._ringPid == os.getpid():
+            self._ring.close()
+        self._ring = None
+        return self.device.shutdown()
+
+    def _getRing(self):
+        # File is mapped in the process calling show()
+        if self._ring is None or self._ringPid != os.getpid():
+            from audioled import recording
+            self._ring = recording.FrameRing.create(self.filename, self.device.getNumPixels(), self.device.getNumRows(),
+                                                    self.capacity)
+            self._ringPid = os.getpid()
+            logger.info("Recording output to {}".format(self.filename))
+        return self._ring
+
+    def show(self, pixels):
+        if pixels is not None and not self._recordingFailed:
+            try:
+                self._getRing().append(pixels, time.monotonic())
+            except OSError as e:
+                logger.error("Error recording to {}, recording disabled: {}".format(self.filename, e))
+                self._recordingFailed = True
+        self.device.show(pixels)
+
+
+# Version of compilePanelMapping, part of the cache key of compiled mappings
+PANEL_MAPPING_VERSION = 2
+
+
+def compilePanelMapping(mappingJson):
+    """Compiles a panel mapping JSON (see PanelWrapper) into a flat permutation
+
+    Returns an int32 array of shape (3, num_rows * num_cols) with indices into the flattened
+    (3, num_rows * num_cols) pixel array, i.e. mapped = pixels.reshape(-1)[mapping]
+    """
+    num_rows = mappingJson['num_rows']
+    num_cols = mappingJson['num_cols']
+    num_pixels = num_rows * num_cols
+    indices = np.zeros(num_pixels, dtype=np.int32)
+    steps = {'L': (0, -1), 'R': (0, 1), 'U': (-1, 0)}
+    for substrip in mappingJson['substrips']:
+        start_index = substrip['start_index']
+        n = substrip['num_pixels']
+        d_row, d_col = steps.get(substrip['dir'], (1, 0))
+        rows = substrip['row'] + d_row * np.arange(n)
+        cols = substrip['col'] + d_col * np.arange(n)
+        indices[start_index:start_index + n] = rows * num_cols + cols
+    # Unmapped pixels read pixel 0 of their own channel
+    mapping = np.empty((3, num_pixels), dtype=np.int32)
+    for c in range(3):
+        mapping[c] = indices + c * num_pixels
+    return mapping
+
+
+def loadPanelMapping(mappingJson, cacheDir=None):
+    """Returns the compiled panel mapping, cached in cacheDir by compiler version and a hash of the mapping JSON"""
+    if cacheDir is None:
+        return compilePanelMapping(mappingJson)
+    mappingHash = hashlib.sha1(json.dumps(mappingJson, sort_keys=True).encode('utf-8')).hexdigest()
+    cacheFile = os.path.join(cacheDir, 'panel_mapping_v{}_{}.npy'.format(PANEL_MAPPING_VERSION, mappingHash))
+    try:
+        return np.load(cacheFile)
+    except (OSError, ValueError):
+        pass
+    mapping = compilePanelMapping(mappingJson)
+    try:
+        os.makedirs(cacheDir, exist_ok=True)
+        tmpFile = cacheFile + '.tmp.npy'
+        np.save(tmpFile, mapping)
+        os.replace(tmpFile, cacheFile)
+    except OSError as e:
+        logger.warning("Error storing panel mapping cache {}: {}".format(cacheFile, e))
+    return mapping
+
 
 class MultiOutputWrapper(object):
     def __init__(self, devices: List[LEDController]):
@@ -1,10 +1,12 @@
 from __future__ import (absolute_import, division, print_function, unicode_literals)
 
+import collections
+import functools
 import itertools
 import math
 
 import numpy as np
-from scipy.signal import butter, lfilter_zi, lfilter
+from scipy.signal import butter, lfilter_zi, lfilter, sosfilt, sosfilt_zi
 
 
 def rollwin(signal, n_overlaps):
@@ -85,9 +87,7 @@ def downsample(signal, fs, fmax):
         The downsampled sampling rate. If downsampling is not possible
         then the original sampling rate is returned.
     """
-    if fs < 2 * fmax:
-        raise ValueError('Sampling frequency fs must be at least 2 * fmax')
-    n = int(fs / (2 * fmax))
+    n = downsample_factor(fs, fmax)
     if n == 1:
         # Downsampling is not possible
         return signal, fs
@@ -98,6 +98,18 @@ def downsample(signal, fs, fmax):
         return ds_signal, ds_fs
 
 
+def downsample_factor(fs, fmax):
+    """Returns the integer factor signals sampled with fs can be downsampled by, keeping frequencies up to fmax"""
+    if fs < 2 * fmax:
+        raise ValueError('Sampling frequency fs must be at least 2 * fmax')
+    return int(fs / (2 * fmax))
+
+
+def next_pow2(n):
+    """Returns the smallest power of two >= n"""
+    return int(2**np.ceil(np.log2(n)))
+
+
 def pad_zeros(signal):
     """Pad chunks with zeros until chunk length is a power of two
 
@@ -125,7 +137,7 @@ def pad_zeros(signal):
     peek = next(signal)
     signal = itertools.chain([peek], signal)
     N = len(peek)
-    N_zeros = int(2**np.ceil(np.log2(N))) - N
+    N_zeros = next_pow2(N) - N
     zeros = np.zeros(N_zeros)
     return (np.r_[chunk, zeros] for chunk in signal)
 
@@ -152,51 +164,100 @@ def memoize(function):
     return wrapper
 
 
-@memoize
-def filter_bank(n_filters, n_fft, fs, fmin_hz, fmax_hz, scale):
-    """Returns an overlapping triangular filterbank"""
+# Number of filter banks kept in the cache, one per combination of FFT size, sample rate, range and scale
+FILTER_BANK_CACHE_SIZE = 32
+
+SparseFilterBank = collections.namedtuple('SparseFilterBank', ['indices', 'weights', 'offsets', 'nonempty', 'n_bins'])
+"""Triangular filters stored as band-limited slices of the power spectrum
+
+indices {np.ndarray} -- Spectrum bins covered by the filters, concatenated
+weights {np.ndarray} -- float32 weights of these bins
+offsets {np.ndarray} -- Start of each filter in indices and weights
+nonempty {np.ndarray} -- False for filters not covering any bin
+n_bins {int} -- Length of the power spectrum
+"""
+
+
+def _filter_bank_points(n_filters, fmin_hz, fmax_hz, scale):
     if scale == 'mel':
         fmin_mel = 2595. * np.log10(1 + fmin_hz / 700.)
         fmax_mel = 2595. * np.log10(1 + fmax_hz / 700.)
         f_mel = np.linspace(fmin_mel, fmax_mel, n_filters + 2)
-        f_hz = 700. * (np.exp(f_mel / 1127.) - 1.)
+        return 700. * (np.exp(f_mel / 1127.) - 1.)
     elif scale == 'bark':
         fmin_bark = 6.0 * np.arcsinh(fmin_hz / 600.0)
         fmax_bark = 6.0 * np.arcsinh(fmax_hz / 600.0)
         f_bark = np.linspace(fmin_bark, fmax_bark, n_filters + 2)
-        f_hz = 600.0 * np.sinh(f_bark / 6.0)
+        return 600.0 * np.sinh(f_bark / 6.0)
+    raise ValueError("Unknown scale {}".format(scale))
+
+
+@functools.lru_cache(maxsize=FILTER_BANK_CACHE_SIZE)
+def sparse_filter_bank(n_filters, n_fft, fs, fmin_hz, fmax_hz, scale):
+    """Returns an overlapping triangular filterbank as SparseFilterBank"""
+    f_hz = _filter_bank_points(n_filters, fmin_hz, fmax_hz, scale)
+    n_bins = n_fft // 2 + 1
     # Convert from Hz points to FFT bin number
     bins = np.floor((n_fft + 1.) * f_hz / fs)
-    # Construct the filter bank
-    filters = np.zeros((n_filters, n_fft // 2 + 1))
-    for m in range(1, n_filters + 1):
-        f_m_minus = int(bins[m - 1])  # left
-        f_m = int(bins[m])  # center
-        f_m_plus = int(bins[m + 1])  # right
-        for k in range(f_m_minus, f_m):
-            filters[m - 1, k] = (k - bins[m - 1]) / (bins[m] - bins[m - 1])
-        for k in range(f_m, f_m_plus):
-            filters[m - 1, k] = (bins[m + 1] - k) / (bins[m + 1] - bins[m])
-    return filters, f_hz[1:-1]
+    left, center, right = bins[:-2], bins[1:-1], bins[2:]
+    # Filter m covers bins left..right-1, rising until center and falling afterwards
+    starts = left.astype(np.int64)
+    lengths = np.maximum(np.minimum(right, n_bins) - left, 0).astype(np.int64)
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    filterIdx = np.repeat(np.arange(n_filters), lengths)
+    indices = np.arange(lengths.sum()) - offsets[filterIdx] + starts[filterIdx]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rising = (indices - left[filterIdx]) / (center - left)[filterIdx]
+        falling = (right[filterIdx] - indices) / (right - center)[filterIdx]
+    weights = np.where(indices < center[filterIdx], rising, falling).astype(np.float32)
+    return SparseFilterBank(indices, weights, offsets, lengths > 0, n_bins)
+
+
+@functools.lru_cache(maxsize=FILTER_BANK_CACHE_SIZE)
+def filter_bank(n_filters, n_fft, fs, fmin_hz, fmax_hz, scale):
+    """Returns an overlapping triangular filterbank as dense matrix and the center frequencies of the filters"""
+    bank = sparse_filter_bank(n_filters, n_fft, fs, fmin_hz, fmax_hz, scale)
+    filters = np.zeros((n_filters, bank.n_bins))
+    filterIdx = np.repeat(np.arange(n_filters), np.diff(np.append(bank.offsets, len(bank.indices))) * bank.nonempty)
+    filters[filterIdx, bank.indices] = bank.weights
+    return filters, _filter_bank_points(n_filters, fmin_hz, fmax_hz, scale)[1:-1]
+
+
+def apply_filter_bank(pow_spectrum, bank):
+    """Returns the energy of each filter of a SparseFilterBank, single threaded and without dense temporaries"""
+    # Trailing zero keeps the offsets of empty filters at the end valid for reduceat
+    weighted = np.zeros(len(bank.indices) + 1, dtype=np.float32)
+    np.multiply(np.take(pow_spectrum, bank.indices), bank.weights, out=weighted[:-1], casting='same_kind')
+    output = np.add.reduceat(weighted, bank.offsets)
+    # reduceat returns the element at the offset for empty filters
+    output[~bank.nonempty] = 0
+    return output
 
 
-def warped_psd(y, bins, fs, frange, scale):
-    """Returns the power spectrum mapped to a perceptual scale"""
+def power_spectrum(y, out=None):
+    """Returns the power spectrum of y
+
+    The result is written to out (float32 array of length len(y) // 2 + 1) if given.
+    """
     N = len(y)
     # Transform to frequency domain
-    pow_spectrum = np.abs(np.fft.rfft(y))**2 * (2 / N)
-    # Construct triangular filter bank
-    output, f = filter_bank(bins, N, fs, frange[0], frange[1], scale)
-    # Apply filter bank to power spectrum
-    # Remark: Numpy matrix multiplication uses all available CPU cores for a rather small matrix multiplication
-    # output_np = np.dot(pow_spectrum, output.T)
-
-    # Own MM:
-    pow_spectrum = pow_spectrum.reshape(1, -1)
-    output = np.sum(pow_spectrum[:, :, None]*output.T[None, :, :], axis=1)
-    output = output.reshape(-1)
-    # print(np.allclose(output, output_np))
-    return output
+    spectrum = np.fft.rfft(y)
+    if out is None:
+        out = np.empty(len(spectrum), dtype=np.float32)
+    np.abs(spectrum, out=out, casting='same_kind')
+    np.square(out, out=out)
+    out *= 2 / N
+    return out
+
+
+def warped_psd(y, bins, fs, frange, scale):
+    """Returns the power spectrum mapped to a perceptual scale"""
+    return warp_power_spectrum(power_spectrum(y), len(y), bins, fs, frange, scale)
+
+
+def warp_power_spectrum(pow_spectrum, N, bins, fs, frange, scale):
+    """Maps the power spectrum of N samples to a perceptual scale"""
+    return apply_filter_bank(pow_spectrum, sparse_filter_bank(bins, N, fs, frange[0], frange[1], scale))
 
 
 def preprocess(audio, fs, fmax, n_overlaps):
@@ -215,12 +276,102 @@ def preprocess(audio, fs, fmax, n_overlaps):
 
 
 def rms(normalized_sample_points):
-    N = len(normalized_sample_points)
-    sum_squares = sum(s**2 for s in normalized_sample_points)
+    x = np.ravel(normalized_sample_points)
+    N = len(x)
+    if N == 0:
+        return 0.
+    sum_squares = float(np.dot(x, x))
     # TODO: Why N/2???
     return math.sqrt(sum_squares / (N / 2))
 
 
+class RingBuffer(object):
+    """Fixed-capacity history of scalar values with O(1) push
+
+    Holds the latest capacity values in a numpy array. The maximum is tracked with a monotonic deque
+    and mean and rms with running sums, so none of them iterates over the history.
+    """
+    # Running sums are recomputed from the values after this many pushes to bound rounding errors
+    RESUM_INTERVAL = 1024
+
+    def __init__(self, capacity):
+        self._reset(capacity)
+
+    def _reset(self, capacity):
+        self._values = np.zeros(max(int(capacity), 1))
+        # Total number of values pushed
+        self._count = 0
+        # (push index, value) of maximum candidates, values are decreasing
+        self._maxQueue = collections.deque()
+        self._sum = 0.
+        self._sumSquares = 0.
+
+    def __len__(self):
+        return min(self._count, len(self._values))
+
+    def getCapacity(self):
+        return len(self._values)
+
+    def setCapacity(self, capacity):
+        """Changes the capacity, keeping the latest values"""
+        capacity = max(int(capacity), 1)
+        if capacity == len(self._values):
+            return
+        values = self.getValues()[-capacity:]
+        self._reset(capacity)
+        for value in values:
+            self.push(value)
+
+    def push(self, value):
+        """Appends a value, the oldest value is dropped if the buffer is full"""
+        value = float(value)
+        capacity = len(self._values)
+        slot = self._count % capacity
+        if self._count >= capacity:
+            old = self._values[slot]
+            self._sum -= old
+            self._sumSquares -= old * old
+        self._values[slot] = value
+        self._sum += value
+        self._sumSquares += value * value
+        # Smaller values before this one can't become the maximum anymore
+        queue = self._maxQueue
+        while queue and queue[-1][1] <= value:
+            queue.pop()
+        queue.append((self._count, value))
+        self._count += 1
+        if queue[0][0] < self._count - capacity:
+            queue.popleft()
+        if self._count % self.RESUM_INTERVAL == 0:
+            values = self.getValues()
+            self._sum = float(np.sum(values))
+            self._sumSquares = float(np.dot(values, values))
+
+    def getValues(self):
+        """Returns a copy of the values from oldest to latest"""
+        capacity = len(self._values)
+        if self._count <= capacity:
+            return self._values[:self._count].copy()
+        slot = self._count % capacity
+        return np.concatenate((self._values[slot:], self._values[:slot]))
+
+    def max(self):
+        if not self._maxQueue:
+            raise ValueError("RingBuffer is empty")
+        return self._maxQueue[0][1]
+
+    def mean(self):
+        if self._count == 0:
+            raise ValueError("RingBuffer is empty")
+        return self._sum / len(self)
+
+    def rms(self):
+        """Returns dsp.rms of the values"""
+        if self._count == 0:
+            return 0.
+        return math.sqrt(max(self._sumSquares, 0.) / (len(self) / 2))
+
+
 def design_filter(lowcut, highcut, fs, order=3):
     nyq = 0.5 * fs
     lowcut = max(lowcut, 10)
@@ -231,6 +382,109 @@ def design_filter(lowcut, highcut, fs, order=3):
     return b, a, lfilter_zi(b, a)
 
 
+# Number of band-pass designs kept in the cache
+FILTER_DESIGN_CACHE_SIZE = 64
+
+
+@functools.lru_cache(maxsize=FILTER_DESIGN_CACHE_SIZE)
+def design_sos(lowcut, highcut, fs, order=3):
+    """Returns second-order sections and their initial state of a butterworth band-pass
+
+    Cutoffs are limited like in design_filter, highcut additionally stays below the nyquist frequency.
+    """
+    nyq = 0.5 * fs
+    lowcut = max(lowcut, 10)
+    highcut = min(highcut, 22000, 0.99 * nyq)
+    sos = butter(order, [lowcut / nyq, highcut / nyq], btype='band', output='sos')
+    zi = sosfilt_zi(sos)
+    sos.flags.writeable = False
+    zi.flags.writeable = False
+    return sos, zi
+
+
+class FilterBank(object):
+    """Band-pass filters in second-order sections (SOS) with persistent state
+
+    Second-order sections stay numerically stable for low cutoffs, where the (b, a) form used by Bandpass degrades.
+    The coefficients of all bands are stacked into a single (num_bands, num_sections, 6) array
+    and filters are designed through the cached design_sos.
+    Each band is applied to all channels of a chunk in a single sosfilt call.
+    """
+    def __init__(self, fs, order=3):
+        self._fs = fs
+        self._order = order
+        self._bands = []
+        # Band-pass of order N has N second-order sections
+        self._sos = np.zeros((0, order, 6))
+        self._zi = []
+        self._state = []
+
+    def getBands(self):
+        """Returns the (lowcut, highcut) tuples of all bands in order of their index"""
+        return list(self._bands)
+
+    def addBand(self, lowcut, highcut):
+        """Adds a band-pass and returns its index, the index of the existing band if already present"""
+        band = (lowcut, highcut)
+        if band in self._bands:
+            return self._bands.index(band)
+        sos, zi = design_sos(lowcut, highcut, self._fs, self._order)
+        self._bands.append(band)
+        self._sos = np.concatenate((self._sos, sos[None]))
+        self._zi.append(zi)
+        self._state.append(None)
+        return len(self._bands) - 1
+
+    def removeBand(self, lowcut, highcut):
+        """Removes a band-pass, indices of the following bands decrease by one"""
+        idx = self._bands.index((lowcut, highcut))
+        del self._bands[idx]
+        self._sos = np.delete(self._sos, idx, axis=0)
+        del self._zi[idx]
+        del self._state[idx]
+
+    def replaceBand(self, band, lowcut, highcut):
+        """Changes the cutoffs of a band-pass, the band keeps its index and filter state"""
+        idx = self._bands.index(band)
+        sos, zi = design_sos(lowcut, highcut, self._fs, self._order)
+        self._bands[idx] = (lowcut, highcut)
+        self._sos[idx] = sos
+        self._zi[idx] = zi
+        return idx
+
+    def setSampleRate(self, fs):
+        """Redesigns all bands for the new sample rate, filter states are reset"""
+        if fs == self._fs:
+            return
+        bands = self._bands
+        self.__init__(fs, self._order)
+        for lowcut, highcut in bands:
+            self.addBand(lowcut, highcut)
+
+    def filter(self, audio, bands=None):
+        """Filters a chunk with the given bands (default: all) and advances their state
+
+        Arguments:
+            audio {np.ndarray} -- Samples of shape (num_samples,) or (num_channels, num_samples)
+            bands {list} -- Indices of the bands to apply
+
+        Returns an array of shape (len(bands),) + audio.shape
+        """
+        if bands is None:
+            bands = range(len(self._bands))
+        audio = np.asarray(audio)
+        output = np.empty((len(bands), ) + audio.shape)
+        for i, band in enumerate(bands):
+            state = self._state[band]
+            if state is None or state.shape[1:-1] != audio.shape[:-1]:
+                # Start in steady state for the first sample of each channel
+                zi = self._zi[band]
+                first = audio[..., 0]
+                state = zi.reshape((zi.shape[0], ) + (1, ) * first.ndim + (2, )) * first[None, ..., None]
+            output[i], self._state[band] = sosfilt(self._sos[band], audio, axis=-1, zi=state)
+        return output
+
+
 class Bandpass():
     def __init__(self, lowcut, highcut, fs, order=3):
         self._fs = fs
@@ -2,6 +2,25 @@ import inspect
 import logging
 logger = logging.getLogger(__name__)
 
+# Constructor arguments with default values per effect class
+_argsWithDefaults = {}
+
+
+def getArgsWithDefaults(cls):
+    """Returns the constructor arguments with default values of a class as dictionary
+
+    The result is cached per class, since inspecting the signature is costly.
+    """
+    argsWithDefaults = _argsWithDefaults.get(cls)
+    if argsWithDefaults is None:
+        argspec = inspect.getfullargspec(cls.__init__)
+        if argspec.defaults is not None:
+            argsWithDefaults = dict(zip(argspec.args[-len(argspec.defaults):], argspec.defaults))
+        else:
+            argsWithDefaults = {}
+        _argsWithDefaults[cls] = argsWithDefaults
+    return argsWithDefaults
+
 
 class PixelBuffer(object):
     def __init__(self):
@@ -11,9 +30,47 @@ class PixelBuffer(object):
 class AudioBuffer(object):
     def __init__(self, sample_rate):
         super().__init__()
-        self.audio = None
+        self._audio = None
+        self._analysis = None
+        self._history = None
         self.sample_rate = sample_rate
 
+    def setHistory(self, ring, channel, gain=1., frame_length=None):
+        """Sets the audio preceding the chunk, analysis windows are read from it without copying
+
+        Arguments:
+            ring {audioled.audio.AudioRing} -- Ring ending with the chunk
+            channel {int} -- Channel of the chunk in the ring
+            gain {float} -- Gain applied to the chunk
+            frame_length {int} -- Nominal samples per frame, the length of analysis windows is a multiple of it
+        """
+        self._history = (ring, channel, gain, frame_length)
+        if self._analysis is not None:
+            self._analysis.setHistory(*self._history)
+
+    @property
+    def audio(self):
+        return self._audio
+
+    @audio.setter
+    def audio(self, value):
+        self._audio = value
+        if self._analysis is not None:
+            self._analysis.setAudio(value, self.sample_rate)
+
+    def getAnalysis(self):
+        """Returns the analysis of the current chunk, see audioled.analysis
+
+        The analysis is shared by all effects reading this buffer, so each feature is computed once per chunk.
+        """
+        if self._analysis is None:
+            from audioled.analysis import AudioAnalysis
+            self._analysis = AudioAnalysis()
+            if self._history is not None:
+                self._analysis.setHistory(*self._history)
+            self._analysis.setAudio(self._audio, self.sample_rate)
+        return self._analysis
+
 
 class Effect(object):
     """
@@ -58,13 +115,11 @@ class Effect(object):
         except AttributeError:
             self._outputBuffer = None
         # make sure all default values are set (basic backwards compatibility)
-        argspec = inspect.getfullargspec(self.__init__)
-        if argspec.defaults is not None:
-            argsWithDefaults = dict(zip(argspec.args[-len(argspec.defaults):], argspec.defaults))
-            for key in argsWithDefaults:
-                if key not in self.__dict__:
-                    logger.info("Backwards compatibility: Adding default value {}={}".format(key, argsWithDefaults[key]))
-                    self.__dict__[key] = argsWithDefaults[key]
+        argsWithDefaults = getArgsWithDefaults(type(self))
+        for key in argsWithDefaults:
+            if key not in self.__dict__:
+                logger.info("Backwards compatibility: Adding default value {}={}".format(key, argsWithDefaults[key]))
+                self.__dict__[key] = argsWithDefaults[key]
 
     def numOutputChannels(self):
         """
@@ -205,7 +260,11 @@ class Effect(object):
         state = self.__getstate__()  # cleaned state
         for k in state.keys():
             val = state[k]
-            definition['parameters'][k][0] = val
+            if isinstance(definition['parameters'][k], list):
+                definition['parameters'][k][0] = val
+            else:
+                # Boolean parameters are defined by their default value
+                definition['parameters'][k] = val
         logger.info(definition)
         return definition
 
@@ -3,10 +3,10 @@ from __future__ import (absolute_import, division, print_function, unicode_liter
 from collections import OrderedDict
 
 import numpy as np
-import scipy as sp
 import math
 
 import audioled.colors as colors
+import audioled.shifter as shifter
 from audioled.effect import Effect
 
 import logging
@@ -30,6 +30,7 @@ class Shift(Effect):
         super(Shift, self).__initstate__()
         self._shift_pixels = 0
         self._last_t = self._t
+        self._shifter = shifter.Shifter()
 
     def numInputChannels(self):
         return 1
@@ -68,7 +69,7 @@ class Shift(Effect):
         shift = dt_move * self.speed * 0.1
         self._shift_pixels = math.fmod((self._shift_pixels + shift), np.size(y, axis=1))
         self._last_t = self._t
-        self._outputBuffer[0] = sp.ndimage.interpolation.shift(y, [0, self._shift_pixels], mode='wrap', prefilter=True)
+        self._outputBuffer[0] = self._shifter.shift(y, self._shift_pixels)
 
 
 class Append(Effect):
@@ -602,6 +603,7 @@ class Swing(Effect):
     def __initstate__(self):
         # state
         super(Swing, self).__initstate__()
+        self._shifter = shifter.Shifter()
 
     @staticmethod
     def getParameterDefinition():
@@ -641,7 +643,7 @@ class Swing(Effect):
         pixels = self._inputBuffer[0]
         config = self.displacement * math.sin(self._t * self.swingspeed)
 
-        self._outputBuffer[0] = sp.ndimage.interpolation.shift(pixels, [0, config], mode='wrap', prefilter=True)
+        self._outputBuffer[0] = self._shifter.shift(pixels, config)
 
 
 class Flipping(Effect):
@@ -0,0 +1,155 @@
+"""UDP protocol for ESP8266 LED controllers (see arduino/ws2812_controller)
+
+Version 1 sends one datagram per frame containing the raw pixel values:
+    |r0|g0|b0|r1|g1|b1|...
+
+Version 2 splits frames into packets that fit into a single MTU:
+    |'M'|'2'|flags|reserved|seq|num_runs|run0|run1|...
+with each run encoded as
+    |offset|count|r0|g0|b0|...|r(count-1)|g(count-1)|b(count-1)|
+where flags and reserved are uint8, seq, num_runs, offset and count are uint16 (little endian).
+seq identifies the frame, the receiver drops packets of frames older than the current one
+(packets more than 64 frames older are accepted as the sender was probably restarted).
+Packets of a keyframe contain all pixels, packets of a delta frame only runs of changed pixels.
+The last packet of a frame has FLAG_END_OF_FRAME set, the receiver shows the frame on this packet.
+
+The protocol version is negotiated via the discovery packet:
+the controller answers DISCOVERY with "ESP8266 ACK LEDS <num_leds>" and, if it supports version 2,
+" PROTO 2" appended.
+"""
+import struct
+
+import numpy as np
+
+DISCOVERY = b'ESP8266 DISCOVERY'
+MAGIC = b'M2'
+HEADER = struct.Struct('<2sBBHH')
+RUN = struct.Struct('<HH')
+
+FLAG_END_OF_FRAME = 0x01
+FLAG_KEYFRAME = 0x02
+
+
+def parseDiscoveryReply(reply):
+    """Parses the reply to a discovery packet
+
+    Returns a tuple (num_leds, protocol version), None if the reply is invalid
+    """
+    parts = reply.decode('ascii', errors='replace').strip('\x00').split()
+    if parts[:3] != ['ESP8266', 'ACK', 'LEDS'] or len(parts) < 4:
+        return None
+    try:
+        num_leds = int(parts[3])
+        version = int(parts[parts.index('PROTO') + 1]) if 'PROTO' in parts else 1
+    except (ValueError, IndexError):
+        return None
+    return num_leds, version
+
+
+def decodePacket(packet):
+    """Decodes a version 2 packet into (flags, seq, [(offset, rgb bytes), ...])"""
+    magic, flags, _, seq, num_runs = HEADER.unpack_from(packet)
+    if magic != MAGIC:
+        raise ValueError("Invalid packet")
+    pos = HEADER.size
+    runs = []
+    for _ in range(num_runs):
+        offset, count = RUN.unpack_from(packet, pos)
+        pos += RUN.size
+        runs.append((offset, packet[pos:pos + 3 * count]))
+        pos += 3 * count
+    return flags, seq, runs
+
+
+class FrameEncoder(object):
+    """Encodes frames into version 2 packets
+
+    Arguments:
+        max_packet_size {int} -- Maximum size of a packet in bytes, must fit into the receive buffer of the controller
+        delta {bool} -- Send only runs of changed pixels between keyframes
+        keyframe_interval {int} -- Number of frames after which a keyframe is sent in delta mode
+        max_gap {int} -- Runs of changed pixels separated by up to max_gap unchanged pixels are merged
+    """
+    def __init__(self, max_packet_size=1400, delta=True, keyframe_interval=30, max_gap=1):
+        if max_packet_size < HEADER.size + RUN.size + 3:
+            raise ValueError("max_packet_size {} too small".format(max_packet_size))
+        self.max_packet_size = max_packet_size
+        self.delta = delta
+        self.keyframe_interval = keyframe_interval
+        self.max_gap = max_gap
+        self._seq = 0
+        self.reset()
+
+    def reset(self):
+        """Forces the next frame to be sent as keyframe"""
+        self._last = None
+        self._sinceKeyframe = 0
+
+    def encode(self, pixels, keyframe=False):
+        """Encodes a frame
+
+        Arguments:
+            pixels {np.ndarray} -- uint8 array of shape (num_pixels, 3)
+            keyframe {bool} -- Send all pixels even if nothing changed, e.g. to keep the controller alive
+
+        Returns a list of packets, empty if nothing changed since the last frame
+        """
+        pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+        keyframe = (keyframe or not self.delta or self._last is None or self._last.shape != pixels.shape
+                    or self._sinceKeyframe >= self.keyframe_interval)
+        runs = None
+        if not keyframe:
+            runs = self._changedRuns(pixels)
+            if not runs:
+                self._sinceKeyframe += 1
+                return []
+            delta_size = sum(count for _, count in runs) * 3 + RUN.size * len(runs)
+            if delta_size >= 3 * len(pixels):
+                keyframe = True
+        if keyframe:
+            runs = [(0, len(pixels))]
+            self._sinceKeyframe = 0
+        else:
+            self._sinceKeyframe += 1
+        self._last = pixels.copy()
+        packets = self._packetize(pixels, runs, FLAG_KEYFRAME if keyframe else 0)
+        self._seq = (self._seq + 1) & 0xFFFF
+        return packets
+
+    def _changedRuns(self, pixels):
+        changed = np.flatnonzero(np.any(pixels != self._last, axis=1))
+        if len(changed) == 0:
+            return []
+        breaks = np.flatnonzero(np.diff(changed) > self.max_gap + 1)
+        starts = changed[np.r_[0, breaks + 1]]
+        ends = changed[np.r_[breaks, len(changed) - 1]] + 1
+        return list(zip(starts.tolist(), (ends - starts).tolist()))
+
+    def _packetize(self, pixels, runs, flags):
+        packets = []
+        parts = []
+        num_runs = 0
+        size = HEADER.size
+
+        def flush(end):
+            packets.append(HEADER.pack(MAGIC, flags | (FLAG_END_OF_FRAME if end else 0), 0, self._seq, num_runs) +
+                           b''.join(parts))
+
+        for offset, count in runs:
+            while count > 0:
+                available = (self.max_packet_size - size - RUN.size) // 3
+                if available < 1:
+                    flush(False)
+                    parts = []
+                    num_runs = 0
+                    size = HEADER.size
+                    continue
+                n = min(count, available)
+                parts.append(RUN.pack(offset, n))
+                parts.append(pixels[offset:offset + n].tobytes())
+                num_runs += 1
+                size += RUN.size + 3 * n
+                offset += n
+                count -= n
+        flush(True)
+        return packets
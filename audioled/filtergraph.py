@@ -1,4 +1,5 @@
 import asyncio
+import itertools
 import uuid
 import traceback
 import jsonpickle
@@ -243,6 +244,10 @@ class Updateable(object):
         raise NotImplementedError("Process not implemented")
 
 
+# Versions are unique across all filtergraphs, so a replaced filtergraph never reuses a version
+_versionCounter = itertools.count(1)
+
+
 class FilterGraph(Updateable):
     def __init__(self, recordTimings=False, asyncUpdate=True):
         self.recordTimings = recordTimings
@@ -268,6 +273,9 @@ class FilterGraph(Updateable):
         self._onModulationSourceAdded = None
         self._onModulationSourceRemoved = None
         self._onModulationSourceUpdate = None
+        self._version = next(_versionCounter)
+        self._batchDepth = 0
+        self._processOrderDirty = False
 
     def update(self, dt: float, event_loop=asyncio.get_event_loop()):
         """Update method from Updateable
@@ -379,6 +387,7 @@ class FilterGraph(Updateable):
         if self._onNodeAdded is not None:
             self._onNodeAdded(node)
         self._updateProcessOrder()
+        self._bumpVersion()
         return node
 
     def removeEffectNode(self, nodeUid):
@@ -409,6 +418,7 @@ class FilterGraph(Updateable):
             if node in self.__processOrder:
                 self.__processOrder.remove(node)
                 self._updateProcessOrder()
+        self._bumpVersion()
 
     def addConnection(self, fromEffect, fromEffectChannel, toEffect, toEffectChannel):
         """Adds a connection between two filters
@@ -427,6 +437,7 @@ class FilterGraph(Updateable):
             self._onConnectionAdded(newConnection)
         toNode._incomingConnections.append(newConnection)
         self._updateProcessOrder()
+        self._bumpVersion()
         return newConnection
 
     def addNodeConnection(self, fromNodeUid, fromEffectChannel, toNodeUid, toEffectChannel):
@@ -443,6 +454,7 @@ class FilterGraph(Updateable):
             self._onConnectionAdded(newConnection)
         toNode._incomingConnections.append(newConnection)
         self._updateProcessOrder()
+        self._bumpVersion()
         return newConnection
 
     def removeConnection(self, conUid):
@@ -452,6 +464,7 @@ class FilterGraph(Updateable):
             if self._onConnectionRemoved is not None:
                 self._onConnectionRemoved(con)
             con.toNode._incomingConnections.remove(con)
+            self._bumpVersion()
         else:
             logger.info("Could not remove connection {}".format(conUid))
 
@@ -466,6 +479,7 @@ class FilterGraph(Updateable):
         self.__modulationsources.append(modSourceNode)
         if self._onModulationSourceAdded is not None:
             self._onModulationSourceAdded(modSourceNode)
+        self._bumpVersion()
         return modSourceNode
 
     def removeModulationSource(self, modSourceUid):
@@ -485,6 +499,7 @@ class FilterGraph(Updateable):
         self.__modulationsources.remove(modSourceNode)
         if self._onModulationSourceRemoved is not None:
             self._onModulationSourceRemoved(modSourceNode)
+        self._bumpVersion()
 
     def addModulation(self, modSourceUid, targetNodeUid, targetParam=None, amount=0, inverted=False):
         """Adds a modulation driven by a modulationSource
@@ -516,6 +531,7 @@ class FilterGraph(Updateable):
                 if self._onModulationAdded is not None:
                     self._onModulationAdded(newModB)
 
+                self._bumpVersion()
                 # TODO: Return value used somewhere?
                 return newModR
             else:
@@ -525,6 +541,7 @@ class FilterGraph(Updateable):
                 self.__modulations.append(newMod)
                 if self._onModulationAdded is not None:
                     self._onModulationAdded(newMod)
+                self._bumpVersion()
                 return newMod
 
             # newMod = ColorModulation(modSource, targetNode)
@@ -535,6 +552,7 @@ class FilterGraph(Updateable):
             self.__modulations.append(newMod)
             if self._onModulationAdded is not None:
                 self._onModulationAdded(newMod)
+            self._bumpVersion()
             return newMod
 
     def removeModulation(self, modUid):
@@ -550,12 +568,14 @@ class FilterGraph(Updateable):
             self.__modulations.remove(mod)
             if self._onModulationRemoved is not None:
                 self._onModulationRemoved(mod)
+            self._bumpVersion()
 
     def resetControllerModulations(self):
         """Resets modulations to their initial value ()
         """
         for modSource in self.__modulationsources:
             modSource.modulator.resetControllerModulation()
+        self._bumpVersion()
 
     def getControllerModulations(self):
         """Returns aggregated modulation values per controller as dictionary
@@ -627,6 +647,7 @@ class FilterGraph(Updateable):
         logger.info(jsonpickle.encode(node.effect))
         if self._onNodeUpdate is not None:
             self._onNodeUpdate(node, updateParameters)
+        self._bumpVersion()
         return node
 
     def updateModulationSourceValue(self, modCtrl, newValue):
@@ -635,6 +656,7 @@ class FilterGraph(Updateable):
             if mod.modulator.isControlledBy(modCtrl):
                 logger.debug("Updating mod source value")
                 mod.modulator.updateParameter(newValue)
+                self._bumpVersion()
 
     def updateModulationSourceParameter(self, modSourceUid, updateParameters):
         mod = next(mod for mod in self.__modulationsources if mod.uid == modSourceUid)  # type: ModulationSourceNode
@@ -643,6 +665,7 @@ class FilterGraph(Updateable):
         if self._onModulationSourceUpdate is not None:
             logger.debug("Firing: {}".format(modSourceUid))
             self._onModulationSourceUpdate(mod, updateParameters)
+        self._bumpVersion()
         return mod
 
     def updateModulationParameter(self, modUid, updateParameters):
@@ -650,8 +673,33 @@ class FilterGraph(Updateable):
         mod.updateParameter(updateParameters)
         if self._onModulationUpdate is not None:
             self._onModulationUpdate(mod, updateParameters)
+        self._bumpVersion()
         return mod
 
+    def beginBatch(self):
+        """Starts a batch of modifications
+
+        The process order is only recomputed once when the outermost batch ends.
+        """
+        self._batchDepth += 1
+
+    def endBatch(self):
+        """Ends a batch of modifications started with beginBatch"""
+        self._batchDepth = max(0, self._batchDepth - 1)
+        if self._batchDepth == 0 and self._processOrderDirty:
+            self._processOrderDirty = False
+            self._updateProcessOrder()
+
+    def getVersion(self):
+        """Returns the version of the filtergraph
+
+        The version changes with every modification of nodes, connections, modulation sources or modulations.
+        """
+        return self._version
+
+    def _bumpVersion(self):
+        self._version = next(_versionCounter)
+
     def setContentRoot(self, path):
         self._contentRoot = path
 
@@ -663,6 +711,9 @@ class FilterGraph(Updateable):
         return self._contentRoot
 
     def _updateProcessOrder(self):
+        if self._batchDepth > 0:
+            self._processOrderDirty = True
+            return
         processOrder = []
         if self._outputNode is None:
             # logger.debug("No output node")
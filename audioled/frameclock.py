@@ -0,0 +1,130 @@
+import collections
+import threading
+import time
+
+import numpy as np
+
+import logging
+logger = logging.getLogger(__name__)
+
+NS_PER_SECOND = 1000000000
+
+
+class FrameClock(object):
+    """Persistent thread calling a callback at a fixed target frame rate
+
+    Frames are scheduled on absolute deadlines taken from time.monotonic_ns, so errors of
+    single sleeps do not accumulate. If a frame overruns its deadline by more than one period,
+    the schedule is re-anchored to the current time instead of trying to catch up with a burst of frames.
+    """
+    def __init__(self, callback, fps=60, name='LEDThread', stats_window=600):
+        """Constructor for frame clock
+
+        Arguments:
+            callback {function} -- Called once per frame with the time since the last frame in seconds
+            fps {float} -- Target frame rate
+            name {str} -- Name of the thread
+            stats_window {int} -- Number of frames used for timing statistics
+        """
+        self._callback = callback
+        self._name = name
+        self._thread = None  # type: threading.Thread
+        self._stopEvent = threading.Event()
+        self._lock = threading.Lock()
+        self._jitter_ns = collections.deque(maxlen=stats_window)
+        self._frame_ns = collections.deque(maxlen=stats_window)
+        self._overruns = 0
+        self._frames = 0
+        self.setFps(fps)
+
+    def setFps(self, fps):
+        """Sets the target frame rate, takes effect with the next frame"""
+        if fps <= 0:
+            raise ValueError("fps must be positive")
+        self._fps = fps
+        self._period_ns = int(NS_PER_SECOND / fps)
+
+    def getFps(self):
+        return self._fps
+
+    def start(self):
+        """Start the frame clock thread"""
+        if self._thread is not None:
+            return
+        self._stopEvent.clear()
+        self._thread = threading.Thread(target=self._run, name=self._name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=1):
+        """Stop the frame clock thread
+        Raises TimeoutError """
+        self._stopEvent.set()
+        if self._thread is None:
+            return
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+            if self._thread.is_alive():
+                raise TimeoutError("thread.join timed out")
+        self._thread = None
+
+    def isAlive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def getStats(self):
+        """Returns timing statistics over the last frames
+
+        jitter is the delay of the frame start after its scheduled deadline,
+        frame_time is the measured time between two consecutive frames.
+        All times are in milliseconds.
+        """
+        with self._lock:
+            jitter = np.array(self._jitter_ns, dtype=np.float64) / 1e6
+            frame = np.array(self._frame_ns, dtype=np.float64) / 1e6
+            frames = self._frames
+            overruns = self._overruns
+        stats = {
+            "target_fps": self._fps,
+            "frames": frames,
+            "overruns": overruns,
+        }
+        if len(frame) > 0:
+            mean_frame = np.mean(frame)
+            stats["fps"] = 1000. / mean_frame if mean_frame > 0 else 0.
+            stats["frame_time_mean"] = mean_frame
+            stats["frame_time_max"] = np.max(frame)
+        if len(jitter) > 0:
+            stats["jitter_mean"] = np.mean(jitter)
+            stats["jitter_p95"] = np.percentile(jitter, 95)
+            stats["jitter_max"] = np.max(jitter)
+        return stats
+
+    def _run(self):
+        last_ns = time.monotonic_ns()
+        deadline_ns = last_ns + self._period_ns
+        while not self._stopEvent.is_set():
+            now_ns = time.monotonic_ns()
+            remaining_ns = deadline_ns - now_ns
+            if remaining_ns > 0:
+                # Event.wait returns early on stop
+                if self._stopEvent.wait(remaining_ns / NS_PER_SECOND):
+                    break
+                now_ns = time.monotonic_ns()
+            with self._lock:
+                self._jitter_ns.append(max(0, now_ns - deadline_ns))
+                self._frame_ns.append(now_ns - last_ns)
+                self._frames += 1
+            dt = (now_ns - last_ns) / NS_PER_SECOND
+            last_ns = now_ns
+            try:
+                self._callback(dt)
+            except Exception as e:
+                logger.error("Error in frame callback: {}".format(e))
+            # Schedule next frame on absolute deadline
+            deadline_ns += self._period_ns
+            now_ns = time.monotonic_ns()
+            if now_ns - deadline_ns > self._period_ns:
+                # Overrun by more than one frame, re-anchor schedule instead of catching up
+                with self._lock:
+                    self._overruns += 1
+                deadline_ns = now_ns + self._period_ns
@@ -9,10 +9,10 @@ import numpy as np
 import scipy as sp
 from scipy import signal as signal
 
+import audioled.particles as particles
+import audioled.shifter as shifter
 from audioled.effect import Effect
 
-from PIL import Image, ImageOps
-
 import logging
 logger = logging.getLogger(__name__)
 
@@ -89,6 +89,7 @@ class SwimmingPool(Effect):
             self._rotate_counter
         except AttributeError:
             self._rotate_counter = 0
+        self._shifter = shifter.Shifter()
         super(SwimmingPool, self).__initstate__()
 
     @staticmethod
@@ -247,21 +248,17 @@ class SwimmingPool(Effect):
             color = self._inputBuffer[0]
 
         all_waves = np.zeros(self._num_pixels)
-        for i in range(0, int(self.num_waves)):
-            fact = 1.0
-            if i == 0:
-                fact = (self._rotate_counter / 30)
-            if i == self.num_waves - 1:
-                fact = (1.0 - self._rotate_counter / 30)
-            if i < len(self._Wave) and i < len(self._WaveSpecSpeed):
-                
-                step = sp.ndimage.interpolation.shift(
-                    self._Wave[i],
-                    self._t * self._WaveSpecSpeed[i],
-                    mode='wrap',
-                    prefilter=True) * self.scale * fact
-                # step = np.roll(self._Wave[i], int(self._t * self._WaveSpecSpeed[i]), axis=0) * self.scale * fact
-                all_waves += step
+        num_waves = min(int(self.num_waves), len(self._Wave), len(self._WaveSpecSpeed))
+        if num_waves > 0:
+            # Fade in the first and fade out the last wave
+            fact = np.ones(num_waves)
+            fact[0] = self._rotate_counter / 30
+            if num_waves == self.num_waves:
+                fact[-1] = 1.0 - self._rotate_counter / 30
+            # Shift all waves at once, waves only change on rotation so their spline coefficients are cached
+            waves = self._shifter.shift(np.asarray(self._Wave[:num_waves]),
+                                        self._t * np.asarray(self._WaveSpecSpeed[:num_waves]))
+            all_waves += fact.dot(waves) * self.scale
 
         self._outputBuffer[0] = np.multiply(color, all_waves).clip(0, 255.0)
 
@@ -588,9 +585,7 @@ class FallingStars(Effect):
 
     def __initstate__(self):
         # state
-        self._t0Array = []
-        self._spawnArray = []
-        self._starCounter = 0
+        self._stars = particles.ParticleSystem(100)
         self._spawnflag = True
         self._lastSpawn = 0
         super(FallingStars, self).__initstate__()
@@ -630,32 +625,13 @@ class FallingStars(Effect):
         return 1
 
     def spawnStar(self):
-        self._starCounter += 1
-        self._t0Array.append(self._t)
-        self._spawnArray.append(random.randint(0, self._num_pixels - self.thickness))
-        if self._starCounter > 100:
-            self._starCounter -= 1
-            self._t0Array.pop(0)
-            self._spawnArray.pop(0)
-
-    def allStars(self, t, dim_speed, thickness, t0, spawnSpot):
-        controlArray = []
-        for i in range(0, self._starCounter):
-            oneStarArray = np.zeros(self._num_pixels)
-            for j in range(0, thickness):
-                if i < len(spawnSpot):
-                    index = spawnSpot[i] + j
-                    if index < self._num_pixels:
-                        oneStarArray[index] = math.exp(-(100 / dim_speed) * (self._t - t0[i]))
-            controlArray.append(oneStarArray)
-        return controlArray
+        self._stars.spawn(self._t, random.randint(0, self._num_pixels - self.thickness))
 
     def starControl(self, prob):
         for _ in range(int(self.max_spawns)):
             if random.random() <= prob:
                 self.spawnStar()
-        outputArray = self.allStars(self._t, self.dim_speed, self.thickness, self._t0Array, self._spawnArray)
-        return np.sum(outputArray, axis=0)
+        return self._stars.render(self._t, 100 / self.dim_speed, self.thickness, self._num_pixels)
 
     async def update(self, dt):
         await super().update(dt)
@@ -696,6 +672,7 @@ class Pendulum(Effect):
     def __initstate__(self):
         # state
         super(Pendulum, self).__initstate__()
+        self._shifter = shifter.Shifter()
 
     def __setstate__(self, state):
         if 'spread' in state and state['spread'] > 1:
@@ -751,10 +728,7 @@ class Pendulum(Effect):
 
     def moveBlob(self, blobArray, displacement_rel, swingspeed):
         displacement = displacement_rel * self._num_pixels
-        outputArray = sp.ndimage.interpolation.shift(blobArray,
-                                                     displacement * math.sin(self._t * swingspeed),
-                                                     mode='wrap',
-                                                     prefilter=True)
+        outputArray = self._shifter.shift(blobArray, displacement * math.sin(self._t * swingspeed))
         return outputArray
 
     def controlBlobs(self):
@@ -809,6 +783,7 @@ class RandomPendulums(Effect):
         self._lightflip = []
         self._offset = []
         self._swingspeed = []
+        self._shifter = shifter.Shifter()
 
     @staticmethod
     def getParameterDefinition():
@@ -841,13 +816,13 @@ class RandomPendulums(Effect):
                 blobArray[location + i] = math.cos((math.pi / spread) * i)
         return blobArray.clip(0.0, 255.0)
 
-    def moveBlob(self, blobArray, displacement_rel, offset_rel, swingspeed):
+    def moveBlob(self, blobArray, displacement_rel, offset_rel, swingspeed, key=None):
         config = displacement_rel * self._num_pixels * math.sin((self._t * swingspeed) + offset_rel * self._num_pixels)
-        outputArray = sp.ndimage.interpolation.shift(blobArray, config, mode='wrap', prefilter=True)
+        outputArray = self._shifter.shift(blobArray, config, key=key)
         return outputArray.clip(0.0, 255.0)
 
-    def controlBlobs(self, spread_rel, location_rel, displacement_rel, offset_rel, swingspeed):
-        output = self.moveBlob(self.createBlob(spread_rel, location_rel), displacement_rel, offset_rel, swingspeed)
+    def controlBlobs(self, spread_rel, location_rel, displacement_rel, offset_rel, swingspeed, key=None):
+        output = self.moveBlob(self.createBlob(spread_rel, location_rel), displacement_rel, offset_rel, swingspeed, key)
         return output
 
     def numInputChannels(self):
@@ -901,7 +876,7 @@ class RandomPendulums(Effect):
             self._output += np.multiply(
                 color,
                 self.controlBlobs(self._spread[i], self._location[i], self._displacement[i], self._offset[i],
-                                  self._swingspeed[i]) * configArray)
+                                  self._swingspeed[i], i) * configArray)
         self._outputBuffer[0] = self._output.clip(0.0, 255.0)
 
 
@@ -1377,6 +1352,7 @@ class GIFPlayer(Effect):
         if self._filterGraph is not None and self._filterGraph.getContentRoot() is not None:
             adjustedFile = os.path.join(self._filterGraph.getContentRoot(), self.file)
         try:
+            from PIL import Image
             self._gif = Image.open(adjustedFile)
         except Exception:
             logger.error("Cannot open file {}".format(adjustedFile))
@@ -1393,6 +1369,7 @@ class GIFPlayer(Effect):
             num_cols = int(self._num_pixels / self._num_rows)
             # Resize image
             if self._gif is not None:
+                from PIL import Image, ImageOps
                 self._cur_image = ImageOps.fit(self._gif.convert('RGB'), (num_cols, self._num_rows),
                                                Image.ANTIALIAS,
                                                centering=(self.center_x, self.center_y))
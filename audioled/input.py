@@ -1,6 +1,12 @@
+import os
 from collections import OrderedDict
 
-from audioled import effect, opc_server
+import numpy as np
+
+from audioled import effect, opc_server, recording
+
+import logging
+logger = logging.getLogger(__name__)
 
 
 class CandyServer(effect.Effect):
@@ -53,3 +59,118 @@ class CandyServer(effect.Effect):
             return
         pixels = self._server.get_pixels()
         self._outputBuffer[0] = pixels
+
+
+class ReplayInput(effect.Effect):
+
+    @staticmethod
+    def getEffectDescription():
+        return \
+            "Plays back frames recorded with a RecordingOutput device."
+
+    def __init__(self, file=None, speed=1.0, looping=True):
+        self.file = file
+        self.speed = speed
+        self.looping = looping
+        self.__initstate__()
+
+    def __initstate__(self):
+        super().__initstate__()
+        self._ring = None
+        self._index = 0
+        self._play_t = 0.
+        self._open_t = None
+        self._buffer = None
+
+    def numInputChannels(self):
+        return 0
+
+    def numOutputChannels(self):
+        return 1
+
+    @staticmethod
+    def getParameterDefinition():
+        definition = {
+            "parameters":
+            OrderedDict([
+                # default, min, max, stepsize
+                ("speed", [1.0, 0.1, 4.0, 0.01]),
+                ("looping", True),
+                ("file", ['rec', None]),
+            ])
+        }
+        return definition
+
+    def getModulateableParameters(self):
+        params = super().getModulateableParameters()
+        params.remove('file')
+        return params
+
+    @staticmethod
+    def getParameterHelp():
+        help = {
+            "parameters": {
+                "speed": "Playback speed relative to the recording.",
+                "looping": "Restart playback at the end of the recording.",
+                "file": "The recording to play back."
+            }
+        }
+        return help
+
+    def updateParameter(self, stateDict):
+        file = self.file
+        super().updateParameter(stateDict)
+        if self.file != file:
+            # Open the new recording on the next update
+            self._ring = None
+            self._open_t = None
+
+    def _openRing(self):
+        if self.file is None:
+            return
+        filename = self.file
+        if self._filterGraph is not None and self._filterGraph.getContentRoot() is not None:
+            filename = os.path.join(self._filterGraph.getContentRoot(), self.file)
+        try:
+            self._ring = recording.FrameRing.open(filename)
+        except (OSError, ValueError) as e:
+            logger.error("Cannot open recording {}: {}".format(filename, e))
+            self._ring = None
+        self._index = 0
+        self._play_t = 0.
+
+    async def update(self, dt):
+        await super().update(dt)
+        if self._ring is None:
+            # Retry opening at most once per second
+            if self._open_t is not None and self._t - self._open_t < 1.0:
+                return
+            self._open_t = self._t
+            self._openRing()
+            return
+        num_frames = len(self._ring)
+        if num_frames == 0:
+            return
+        self._play_t += dt * self.speed
+        start_t = self._ring.getFrame(0)[0]
+        # Advance to the last frame due at the current playback time
+        while self._index + 1 < num_frames and self._ring.getFrame(self._index + 1)[0] - start_t <= self._play_t:
+            self._index += 1
+        if self._index + 1 >= num_frames and self.looping:
+            end_t = self._ring.getFrame(num_frames - 1)[0] - start_t
+            if self._play_t > end_t:
+                self._index = 0
+                self._play_t = 0.
+
+    def process(self):
+        if self._outputBuffer is None or self._ring is None or len(self._ring) == 0:
+            return
+        index = min(self._index, len(self._ring) - 1)
+        _, pixels = self._ring.getFrame(index)
+        num_pixels = pixels.shape[1] if self._num_pixels is None else self._num_pixels
+        if self._buffer is None or self._buffer.shape[1] != num_pixels:
+            self._buffer = np.zeros((3, num_pixels), dtype=np.float32)
+        # Recorded frames are uint8, effects expect float pixels
+        n = min(num_pixels, pixels.shape[1])
+        self._buffer[:, :n] = pixels[:, :n]
+        self._outputBuffer[0] = self._buffer
@@ -0,0 +1,234 @@
+"""End-to-end latency self-test
+
+Injects clicks through a synthetic audio source and passes them through the same stages as the server:
+GlobalAudio ring buffer, UpdateMessage, the worker's update and process and the output process with
+its presentation delay. A ClickDetector device stands in for a camera or photodiode watching the LEDs,
+the time from each click until the LEDs light up is the end-to-end latency.
+
+Run with python -m audioled.latencytest
+"""
+import argparse
+import asyncio
+import ctypes
+import multiprocessing as mp
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from audioled import audio, audiosource, devices, effect, project
+from audioled.filtergraph import FilterGraph
+from audioled.frameclock import FrameClock
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Maximum number of light-ups recorded by ClickDetector
+MAX_DETECTIONS = 4096
+
+
+class ClickSource(audiosource.SyntheticAudioSource):
+    """Click signal recording the capture time of every click"""
+    def __init__(self, sample_rate=44100, bpm=120.):
+        super().__init__('click', sample_rate, num_channels=1, realtime=True, amplitude=1., bpm=bpm)
+        self.clickTimes = []
+
+    def read(self, num_frames):
+        start = self._position
+        chunk = super().read(num_frames)
+        # Same capture time as GlobalAudio._capture_time assigns to the chunk
+        t = time.monotonic() - num_frames / self.sample_rate
+        beat = self.getBeatLength()
+        for index in range(-(-start // beat) * beat, start + num_frames, beat):
+            self.clickTimes.append(t + (index - start) / self.sample_rate)
+        return chunk
+
+
+class ClickFlash(effect.Effect):
+    @staticmethod
+    def getEffectDescription():
+        return \
+            "Lights all pixels while the audio peak exceeds threshold, used by the latency self-test"
+
+    def __init__(self, threshold=0.5):
+        self.threshold = threshold
+        self.__initstate__()
+
+    @staticmethod
+    def getParameterDefinition():
+        definition = {
+            "parameters": OrderedDict([
+                # default, min, max, stepsize
+                ("threshold", [0.5, 0.0, 1.0, 0.01]),
+            ])
+        }
+        return definition
+
+    @staticmethod
+    def getParameterHelp():
+        help = {"parameters": {"threshold": "Audio peak above which all pixels light up."}}
+        return help
+
+    def numInputChannels(self):
+        return 1
+
+    def numOutputChannels(self):
+        return 1
+
+    def process(self):
+        if self._inputBuffer is None or self._outputBuffer is None:
+            return
+        if not self._inputBufferValid(0, buffer_type=effect.AudioBuffer.__name__):
+            return
+        value = 255. if self._inputBuffer[0].getAnalysis().peak() > self.threshold else 0.
+        self._outputBuffer[0] = np.full((3, self._num_pixels), value)
+
+
+class ClickDetector(devices.LEDController):
+    """Stand-in for a capture device watching the LEDs
+
+    Records the time.monotonic() at which the mean brightness rises above threshold in a process-shared array,
+    since the device is shown from the output process.
+    """
+    KEEP_ALIVE_INTERVAL = None
+
+    def __init__(self, num_pixels, threshold=128):
+        super().__init__(num_pixels)
+        self.threshold = threshold
+        self._lit = False
+        self._detections = mp.Array(ctypes.c_double, MAX_DETECTIONS, lock=False)
+        self._count = mp.Value(ctypes.c_int64, 0, lock=False)
+
+    def show(self, pixels):
+        lit = np.mean(pixels) > self.threshold
+        if lit and not self._lit and self._count.value < MAX_DETECTIONS:
+            self._detections[self._count.value] = time.monotonic() + self.getLatency()
+            self._count.value += 1
+        self._lit = lit
+
+    def getDetections(self):
+        return list(self._detections[:self._count.value])
+
+
+def matchClicks(clickTimes, lightUpTimes, maxLatency):
+    """Returns the latency of every light-up to the latest click before it, light-ups later than maxLatency are ignored"""
+    clickTimes = np.asarray(clickTimes)
+    latencies = []
+    for t in lightUpTimes:
+        idx = np.searchsorted(clickTimes, t, side='right') - 1
+        if idx >= 0 and t - clickTimes[idx] <= maxLatency:
+            latencies.append(float(t - clickTimes[idx]))
+    return latencies
+
+
+def runSelfTest(duration=10., fps=60, bpm=120., num_pixels=10, device_latency=0., block_size=None):
+    """Measures the end-to-end latency from audio capture until the LEDs light up
+
+    Arguments:
+        duration {float} -- Duration of the test in seconds
+        fps {float} -- Frame rate
+        bpm {float} -- Clicks per minute
+        num_pixels {int} -- Number of pixels of the detector device
+        device_latency {float} -- Calibrated latency of the detector device in seconds (see LEDController.setLatency)
+        block_size {int} -- Samples per audio block, defaults to one frame
+
+    Returns a dict with
+        clicks: Number of clicks injected
+        detected: Number of clicks the detector saw
+        latencies: Latency of every detected click in seconds
+        percentiles: Percentiles (project.LATENCY_PERCENTILES) of latencies, None without detections
+        pipeline: Percentiles of the latency the output process measured from the audio timestamps
+    """
+    source = ClickSource(bpm=bpm)
+    audio.GlobalAudio(chunk_rate=fps, source=source, block_size=block_size)
+    detector = ClickDetector(num_pixels)
+    detector.setLatency(device_latency)
+    lock = mp.Lock()
+    array = mp.Array(ctypes.c_uint8, 3 * num_pixels, lock=lock)
+    virtualDevice = devices.VirtualOutput(device=detector, num_pixels=num_pixels, shared_array=array, shared_lock=lock)
+
+    fg = FilterGraph()
+    fg.asyncUpdate = False
+    audioIn = audio.AudioInput(num_channels=1)
+    flash = ClickFlash()
+    ledOut = devices.LEDOutput()
+    for node in [audioIn, flash, ledOut]:
+        fg.addEffectNode(node)
+    fg.addConnection(audioIn, 0, flash, 0)
+    fg.addConnection(flash, 0, ledOut, 0)
+    fg.propagateNumPixels(num_pixels)
+
+    endToEnd = project.LatencyHistory()
+    q = mp.JoinableQueue()
+    p = mp.Process(target=project.output, args=(q, detector, virtualDevice, None, endToEnd))
+    p.start()
+    event_loop = asyncio.new_event_loop()
+    position = [None]
+
+    def update(dt):
+        # Like Project._sendUpdateCommand, each frame gets the audio captured since the previous frame
+        audio_t = audio.GlobalAudio.buffer_t
+        audioBuffer, position[0] = audio.GlobalAudio.ring.getSamplesSince(position[0])
+        message = project.UpdateMessage(dt, audioBuffer, fps, False, 1., 30., audio_t)
+        project.worker_process_updateMessage(fg, virtualDevice, 0, event_loop, message)
+        return message
+
+    def frame(dt):
+        message = update(dt)
+        # Like Project.update, the previous show has to be done before the next one is sent
+        q.join()
+        q.put(project.ShowMessage(time.monotonic(), message.audioTimestamp))
+
+    clock = FrameClock(frame, fps=fps, name='LatencyTestThread')
+    try:
+        # Wait until the output process is up, its start-up shouldn't count as latency
+        q.put("check_is_processing")
+        q.join()
+        # Warm up with the first audio, the first update loads the analysis modules
+        deadline = time.monotonic() + 1.
+        while audio.GlobalAudio.ring.num_chunks == 0:
+            if time.monotonic() > deadline:
+                raise RuntimeError("No audio from click source")
+            time.sleep(0.001)
+        update(0.)
+        # Clicks during set-up aren't measured
+        start_t = time.monotonic()
+        clock.start()
+        time.sleep(duration)
+    finally:
+        clock.stop()
+        source.stop()
+        q.put(None)
+        p.join(1)
+        if p.is_alive():
+            p.terminate()
+        event_loop.close()
+
+    # Clicks at the very end may not have been shown
+    clickTimes = [t for t in source.clickTimes[:-1] if t >= start_t]
+    latencies = matchClicks(clickTimes, detector.getDetections(), 60. / bpm)
+    return {
+        "clicks": len(clickTimes),
+        "detected": len(latencies),
+        "latencies": latencies,
+        "percentiles": np.percentile(latencies, project.LATENCY_PERCENTILES).tolist() if latencies else None,
+        "pipeline": endToEnd.getPercentiles(),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='End-to-end audio to light latency self-test')
+    parser.add_argument('--duration', type=float, default=10., help='Duration of the test in seconds')
+    parser.add_argument('--fps', type=float, default=60, help='Frame rate')
+    parser.add_argument('--block_size', type=int, default=None, help='Samples per audio block, defaults to one frame')
+    parser.add_argument('--bpm', type=float, default=120., help='Clicks per minute')
+    parser.add_argument('--device_latency', type=float, default=0., help='Calibrated device latency in ms')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    result = runSelfTest(args.duration, args.fps, args.bpm, device_latency=args.device_latency / 1000.,
+                         block_size=args.block_size)
+    print("Detected {} of {} clicks".format(result["detected"], result["clicks"]))
+    for name in ["percentiles", "pipeline"]:
+        if result[name] is not None:
+            print("{}: {}".format(name, ", ".join("p{} {:.1f} ms".format(q, 1000 * v)
+                                                  for q, v in zip(project.LATENCY_PERCENTILES, result[name]))))
@@ -3,7 +3,8 @@ from __future__ import (absolute_import, division, print_function, unicode_liter
 from collections import OrderedDict
 
 import math
-import inspect
+
+from audioled.effect import getArgsWithDefaults
 
 import logging
 logger = logging.getLogger(__name__)
@@ -45,14 +46,12 @@ class ModulationSource(object):
             self._t
         except AttributeError:
             self._t = 0
-        # make sure all default values are set (basic backwards compatibility) # TODO: Duplicate code in effect?
-        argspec = inspect.getfullargspec(self.__init__)
-        if argspec.defaults is not None:
-            argsWithDefaults = dict(zip(argspec.args[-len(argspec.defaults):], argspec.defaults))
-            for key in argsWithDefaults:
-                if key not in self.__dict__:
-                    logger.info("Backwards compatibility: Adding default value {}={}".format(key, argsWithDefaults[key]))
-                    self.__dict__[key] = argsWithDefaults[key]
+        # make sure all default values are set (basic backwards compatibility)
+        argsWithDefaults = getArgsWithDefaults(type(self))
+        for key in argsWithDefaults:
+            if key not in self.__dict__:
+                logger.info("Backwards compatibility: Adding default value {}={}".format(key, argsWithDefaults[key]))
+                self.__dict__[key] = argsWithDefaults[key]
 
     def __cleanState__(self, stateDict):
         """
@@ -26,9 +26,15 @@ Recommended use:
 """
 
 import socket
+import struct
+import numpy as np
 import logging
 logger = logging.getLogger(__name__)
 
+# channel, command, length (big endian)
+HEADER = struct.Struct('>BBH')
+CMD_SET_PIXEL_COLORS = 0
+
 
 class Client(object):
     def __init__(self, server_ip_port, long_connection=True, verbose=False):
@@ -56,6 +62,7 @@ class Client(object):
         self._port = int(self._port)
 
         self._socket = None  # will be None when we're not connected
+        self._buffer = bytearray()  # message buffer, reused as long as the frame size doesn't change
 
     def _debug(self, m):
         if self.verbose:
@@ -73,6 +80,7 @@ class Client(object):
             self._debug('_ensure_connected: trying to connect...')
             self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self._socket.settimeout(1)
+            self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
             self._socket.connect((self._ip, self._port))
             self._debug('_ensure_connected:    ...success')
             return True
@@ -116,27 +124,28 @@ class Client(object):
         with the first LED.  It's not possible to send a color just to one
         LED at a time (unless it's the first one).
         """
+        return self.put_array(np.asarray(pixels).reshape(-1, 3), channel=channel)
+
+    def put_array(self, pixels, channel=0):
+        """Send a numpy array of pixel colors to the OPC server on the given channel.
+        pixels: Array of shape (num_pixels, 3) with rgb values.
+            Values are clamped to 0-255, floats are rounded down.
+        Return True on successful transmission, False otherwise.
+        """
+        return self.put_channels([(channel, pixels)])
+
+    def put_channels(self, channel_pixels):
+        """Send pixel colors for multiple channels to the OPC server with a single send.
+        channel_pixels: List of tuples (channel, pixels) with pixels being an array of shape (num_pixels, 3).
+        Return True on successful transmission, False otherwise.
+        """
         self._debug('put_pixels: connecting')
         is_connected = self._ensure_connected()
         if not is_connected:
             self._debug('put_pixels: not connected.  ignoring these pixels.')
             return False
 
-        # build OPC message
-        len_hi_byte = int(len(pixels) * 3 / 256)
-        len_lo_byte = (len(pixels) * 3) % 256
-        header = chr(channel) + chr(0) + chr(len_hi_byte) + chr(len_lo_byte)
-
-        pieces = [header]
-        for r, g, b in pixels:
-            r = min(255, max(0, int(r)))
-            g = min(255, max(0, int(g)))
-            b = min(255, max(0, int(b)))
-            pieces.append(chr(r) + chr(g) + chr(b))
-        if bytes is str:
-            message = ''.join(pieces)
-        else:
-            message = bytes(map(ord, ''.join(pieces)))
+        message = self._encode(channel_pixels)
 
         self._debug('put_pixels: sending pixels to server')
         try:
@@ -152,3 +161,21 @@ class Client(object):
             self.disconnect()
 
         return True
+
+    def _encode(self, channel_pixels):
+        """Encode OPC messages into the preallocated buffer, returns a memoryview of the messages"""
+        size = sum(HEADER.size + 3 * len(pixels) for _, pixels in channel_pixels)
+        if len(self._buffer) != size:
+            self._buffer = bytearray(size)
+        offset = 0
+        for channel, pixels in channel_pixels:
+            num_bytes = 3 * len(pixels)
+            HEADER.pack_into(self._buffer, offset, channel, CMD_SET_PIXEL_COLORS, num_bytes)
+            offset += HEADER.size
+            data = np.frombuffer(self._buffer, dtype=np.uint8, count=num_bytes, offset=offset).reshape(-1, 3)
+            if pixels.dtype == np.uint8:
+                data[:] = pixels
+            else:
+                np.clip(pixels, 0, 255, out=data, casting='unsafe')
+            offset += num_bytes
+        return memoryview(self._buffer)
@@ -0,0 +1,77 @@
+"""Fixed-capacity particle storage for effects like FallingStars
+
+Particles are kept as structure of arrays (spawn time, position, brightness) in a ring,
+when full the oldest particle is replaced. Rendering evaluates the exponential decay of all particles at once
+and scatter-adds their footprints into one output buffer, independent of the number of particles per pixel.
+"""
+import numpy as np
+
+
+class ParticleSystem(object):
+    """Particles decaying exponentially from their spawn time
+
+    Arguments:
+        capacity {int} -- Maximum number of particles, spawning more replaces the oldest ones
+    """
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self._t0 = np.zeros(capacity)
+        self._position = np.zeros(capacity, dtype=np.int64)
+        self._brightness = np.zeros(capacity)
+        self._next = 0
+        self._count = 0
+        self._output = None
+
+    def __len__(self):
+        return self._count
+
+    def clear(self):
+        self._next = 0
+        self._count = 0
+
+    def spawn(self, t0, position, brightness=1.0):
+        """Adds a particle
+
+        Arguments:
+            t0 {float} -- Spawn time in seconds
+            position {int} -- First pixel of the particle
+            brightness {float} -- Brightness at spawn time
+        """
+        self._t0[self._next] = t0
+        self._position[self._next] = position
+        self._brightness[self._next] = brightness
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def render(self, t, decay_rate, thickness, num_pixels):
+        """Returns the sum of all particle footprints at time t
+
+        Every particle lights thickness pixels starting at its position, pixels beyond num_pixels are dropped.
+        The returned array is reused by the next call.
+
+        Arguments:
+            t {float} -- Time in seconds
+            decay_rate {float} -- Exponential decay rate per second
+            thickness {int} -- Width of a particle in pixels
+            num_pixels {int} -- Number of output pixels
+        """
+        if self._output is None or len(self._output) != num_pixels:
+            self._output = np.zeros(num_pixels)
+        output = self._output
+        if self._count == 0 or num_pixels == 0:
+            output[:] = 0
+            return output
+        active = slice(0, self._count)
+        brightness = np.exp(-decay_rate * (t - self._t0[active])) * self._brightness[active]
+        position = self._position[active]
+        # Scatter-add the first pixel of every particle
+        impulses = np.bincount(position, weights=brightness, minlength=num_pixels)[:num_pixels]
+        thickness = max(int(thickness), 1)
+        if thickness == 1:
+            output[:] = impulses
+        else:
+            # Convolve with a box of width thickness as difference of running sums
+            np.cumsum(impulses, out=output)
+            output[thickness:] -= output[:-thickness].copy()
+            np.maximum(output, 0, out=output)
+        return output
@@ -0,0 +1,369 @@
+"""Live preview of rendered frames over WebSocket
+
+Streams are selected by the request path:
+    /output/<deviceIdx>                     Frame of the output device as written to the shared output array
+    /node/<slotId>/<nodeUid>/<channel>      Output buffer of a node in a worker process
+An optional query parameter ?fps=<n> limits the frame rate of the client (capped by the server's max_fps).
+
+Each frame is sent as a single binary WebSocket message:
+    |version|kind|num_rows|num_pixels|seq|r0|g0|b0|r1|g1|b1|...
+where version and kind are uint8, num_rows is uint16 and num_pixels, seq are uint32 (little endian).
+kind is 0 for device outputs and 1 for node outputs. Pixel values are uint8.
+
+Clients that cannot keep up are not buffered: while a frame is still being transmitted,
+newer frames for that client are skipped.
+"""
+import base64
+import hashlib
+import selectors
+import socket
+import struct
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+
+import logging
+logger = logging.getLogger(__name__)
+
+FRAME_VERSION = 1
+KIND_OUTPUT = 0
+KIND_NODE = 1
+HEADER = struct.Struct('<BBHII')
+
+_WS_GUID = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+_OPCODE_BINARY = 0x2
+_OPCODE_CLOSE = 0x8
+_OPCODE_PING = 0x9
+_OPCODE_PONG = 0xA
+
+
+def encodeFrame(kind, num_rows, pixels, seq):
+    """Encodes a frame message
+
+    Arguments:
+        kind {int} -- KIND_OUTPUT or KIND_NODE
+        num_rows {int} -- Number of rows
+        pixels {np.ndarray} -- uint8 array of shape (num_pixels, 3)
+        seq {int} -- Frame sequence number
+    """
+    return HEADER.pack(FRAME_VERSION, kind, num_rows, len(pixels), seq & 0xFFFFFFFF) + pixels.tobytes()
+
+
+def decodeFrame(message):
+    """Decodes a frame message into (kind, num_rows, num_pixels, seq, rgb bytes)"""
+    version, kind, num_rows, num_pixels, seq = HEADER.unpack_from(message)
+    if version != FRAME_VERSION:
+        raise ValueError("Unsupported frame version {}".format(version))
+    return kind, num_rows, num_pixels, seq, message[HEADER.size:HEADER.size + 3 * num_pixels]
+
+
+def _wsHeader(opcode, length):
+    if length < 126:
+        return struct.pack('!BB', 0x80 | opcode, length)
+    elif length < (1 << 16):
+        return struct.pack('!BBH', 0x80 | opcode, 126, length)
+    return struct.pack('!BBQ', 0x80 | opcode, 127, length)
+
+
+class PreviewClient(object):
+    """State of a single WebSocket client"""
+    def __init__(self, sock, addr):
+        self.sock = sock
+        self.addr = addr
+        self.path = None
+        self.stream = None
+        self.interval = 0.
+        self.next_t = 0.
+        self.seq = 0
+        self.skipped = 0
+        self.sent = 0
+        self._recv_buffer = b""
+        self._send_buffer = memoryview(b"")
+
+    @property
+    def isOpen(self):
+        return self.stream is not None
+
+    def isSending(self):
+        return len(self._send_buffer) > 0
+
+    def queue(self, data):
+        self._send_buffer = memoryview(data)
+        self.flush()
+
+    def flush(self):
+        """Sends as much of the pending data as possible without blocking"""
+        if len(self._send_buffer) == 0:
+            return
+        try:
+            sent = self.sock.send(self._send_buffer)
+        except (BlockingIOError, InterruptedError):
+            return
+        self._send_buffer = self._send_buffer[sent:]
+
+
+class PreviewServer(object):
+    """WebSocket server streaming preview frames to connected clients
+
+    Frames are fetched via frame_source(stream) which must not block.
+    stream is a tuple ('output', deviceIdx) or ('node', slotId, nodeUid, channel).
+    frame_source returns a tuple (num_rows, pixels) with pixels as uint8 array of shape (num_pixels, 3), or None.
+    on_subscribe(stream) and on_unsubscribe(stream) are called when clients open or close a stream.
+    """
+    def __init__(self, host, port, frame_source, max_fps=30, on_subscribe=None, on_unsubscribe=None):
+        self._host = host
+        self._port = port
+        self._frame_source = frame_source
+        self._max_fps = max_fps
+        self._on_subscribe = on_subscribe
+        self._on_unsubscribe = on_unsubscribe
+        self._socket = None  # type: socket.socket
+        self._thread = None  # type: threading.Thread
+        self._stopSignal = False
+        self._clients = {}
+        self.sel = selectors.DefaultSelector()
+
+    def start(self):
+        """Start the server thread"""
+        if self._thread is not None:
+            return
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((self._host, self._port))
+        self._socket.listen()
+        self._socket.setblocking(False)
+        self._port = self._socket.getsockname()[1]
+        self.sel.register(self._socket, selectors.EVENT_READ, data=None)
+        self._stopSignal = False
+        self._thread = threading.Thread(target=self._process_thread, name='PreviewThread')
+        self._thread.daemon = True
+        self._thread.start()
+        logger.info("Preview server listening on {}:{}".format(self._host, self._port))
+
+    def stop(self, timeout=1):
+        """Stop the server thread
+        Raises TimeoutError """
+        self._stopSignal = True
+        if self._thread is None:
+            return
+        self._thread.join(timeout=timeout)
+        if self._thread.is_alive():
+            raise TimeoutError("thread.join timed out")
+        self._thread = None
+
+    def getPort(self):
+        return self._port
+
+    def getStreams(self):
+        """Returns the streams with at least one connected client"""
+        return set(c.stream for c in list(self._clients.values()) if c.isOpen)
+
+    def getStats(self):
+        """Returns number of sent and skipped frames per connected client"""
+        return [{
+            "addr": "{}:{}".format(*c.addr[:2]),
+            "path": c.path,
+            "sent": c.sent,
+            "skipped": c.skipped
+        } for c in list(self._clients.values()) if c.isOpen]
+
+    def _process_thread(self):
+        tick = 1.0 / self._max_fps
+        try:
+            while not self._stopSignal:
+                events = self.sel.select(timeout=tick / 4)
+                for key, mask in events:
+                    if key.data is None:
+                        self._accept()
+                    else:
+                        self._read(key.data)
+                self._sendFrames()
+        except Exception as e:
+            logger.error("Preview server exiting due to exception: {}".format(e))
+        finally:
+            for client in list(self._clients.values()):
+                self._close(client)
+            self.sel.close()
+            self._socket.close()
+
+    def _accept(self):
+        conn, addr = self._socket.accept()
+        conn.setblocking(False)
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        client = PreviewClient(conn, addr)
+        self._clients[conn] = client
+        self.sel.register(conn, selectors.EVENT_READ, data=client)
+
+    def _read(self, client):
+        try:
+            data = client.sock.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._close(client)
+            return
+        client._recv_buffer += data
+        if not client.isOpen:
+            self._handshake(client)
+        else:
+            self._handleClientFrames(client)
+
+    def _handshake(self, client):
+        if b"\r\n\r\n" not in client._recv_buffer:
+            if len(client._recv_buffer) > 8192:
+                self._close(client)
+            return
+        request, _, rest = client._recv_buffer.partition(b"\r\n\r\n")
+        client._recv_buffer = rest
+        lines = request.decode('latin-1').split("\r\n")
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                k, v = line.split(':', 1)
+                headers[k.strip().lower()] = v.strip()
+        parts = lines[0].split(' ')
+        stream = None
+        if len(parts) >= 2:
+            url = urlparse(parts[1])
+            stream = self._parseStream(url.path)
+            fps = parse_qs(url.query).get('fps')
+            client.interval = 1.0 / self._max_fps
+            try:
+                if fps:
+                    client.interval = 1.0 / min(self._max_fps, max(0.1, float(fps[0])))
+            except ValueError:
+                pass
+            client.path = url.path
+        key = headers.get('sec-websocket-key')
+        if stream is None or key is None or headers.get('upgrade', '').lower() != 'websocket':
+            # Best effort, the socket doesn't block
+            try:
+                client.sock.send(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+            except OSError:
+                pass
+            self._close(client)
+            return
+        accept = base64.b64encode(hashlib.sha1(key.encode('latin-1') + _WS_GUID).digest())
+        # Queued like frames, no frame is sent before the response is flushed completely
+        try:
+            client.queue(b"HTTP/1.1 101 Switching Protocols\r\n"
+                         b"Upgrade: websocket\r\n"
+                         b"Connection: Upgrade\r\n"
+                         b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+        except OSError:
+            self._close(client)
+            return
+        client.stream = stream
+        logger.info("Preview client {} subscribed to {}".format(client.addr, client.path))
+        if self._on_subscribe is not None:
+            self._on_subscribe(stream)
+
+    def _parseStream(self, path):
+        parts = [p for p in path.split('/') if p]
+        try:
+            if len(parts) == 2 and parts[0] == 'output':
+                return ('output', int(parts[1]))
+            if len(parts) in [3, 4] and parts[0] == 'node':
+                channel = int(parts[3]) if len(parts) == 4 else 0
+                return ('node', int(parts[1]), parts[2], channel)
+        except ValueError:
+            pass
+        return None
+
+    def _handleClientFrames(self, client):
+        # Client frames are masked, only control frames are of interest
+        buf = client._recv_buffer
+        while len(buf) >= 2:
+            opcode = buf[0] & 0x0F
+            length = buf[1] & 0x7F
+            offset = 2
+            if length == 126:
+                if len(buf) < 4:
+                    break
+                length = struct.unpack('!H', buf[2:4])[0]
+                offset = 4
+            elif length == 127:
+                if len(buf) < 10:
+                    break
+                length = struct.unpack('!Q', buf[2:10])[0]
+                offset = 10
+            masked = buf[1] & 0x80
+            if masked:
+                offset += 4
+            if len(buf) < offset + length:
+                break
+            payload = buf[offset:offset + length]
+            if masked:
+                mask = buf[offset - 4:offset]
+                payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+            buf = buf[offset + length:]
+            if opcode == _OPCODE_CLOSE:
+                try:
+                    client.sock.send(_wsHeader(_OPCODE_CLOSE, 0))
+                except OSError:
+                    pass
+                self._close(client)
+                return
+            elif opcode == _OPCODE_PING:
+                try:
+                    client.sock.send(_wsHeader(_OPCODE_PONG, len(payload)) + payload)
+                except OSError:
+                    pass
+        client._recv_buffer = buf
+
+    def _sendFrames(self):
+        now = time.monotonic()
+        frames = {}
+        for client in list(self._clients.values()):
+            if not client.isOpen:
+                continue
+            try:
+                client.flush()
+            except OSError:
+                self._close(client)
+                continue
+            if now < client.next_t:
+                continue
+            client.next_t = max(client.next_t + client.interval, now)
+            if client.isSending():
+                # Client is slow, skip this frame
+                client.skipped += 1
+                continue
+            if client.stream not in frames:
+                try:
+                    frames[client.stream] = self._frame_source(client.stream)
+                except Exception as e:
+                    logger.debug("Error getting preview frame for {}: {}".format(client.stream, e))
+                    frames[client.stream] = None
+            frame = frames[client.stream]
+            if frame is None:
+                continue
+            num_rows, pixels = frame
+            kind = KIND_OUTPUT if client.stream[0] == 'output' else KIND_NODE
+            payload = encodeFrame(kind, num_rows, pixels, client.seq)
+            client.seq += 1
+            try:
+                client.queue(_wsHeader(_OPCODE_BINARY, len(payload)) + payload)
+                client.sent += 1
+            except OSError:
+                self._close(client)
+
+    def _close(self, client):
+        if client.sock not in self._clients:
+            return
+        del self._clients[client.sock]
+        try:
+            self.sel.unregister(client.sock)
+        except Exception:
+            pass
+        try:
+            client.sock.close()
+        except OSError:
+            pass
+        if client.isOpen and self._on_unsubscribe is not None:
+            try:
+                self._on_unsubscribe(client.stream)
+            except Exception as e:
+                logger.error("Error unsubscribing preview {}: {}".format(client.stream, e))
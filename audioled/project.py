@@ -12,14 +12,26 @@ import ctypes
 import logging
 import threading
 import signal
+import queue
+from collections import deque
 
 import os
 from functools import wraps
 import numpy as np
+import jsonpickle
 
 logger = logging.getLogger(__name__)
 
 SCENE_META_BRIGHTNESS = "brightness"
+# Maximum time to wait for late workers within one frame before skipping them
+FRAME_OVERRUN_TIMEOUT = 0.1
+# Time a process may stay busy before it is considered unresponsive and restarted
+PROCESS_UNRESPONSIVE_TIMEOUT = 5.0
+# Maximum time frames are held back to present them on all output devices at the same time
+MAX_PRESENTATION_DELAY = 0.05
+# Number of end-to-end latencies per output device kept for percentiles
+LATENCY_HISTORY = 512
+LATENCY_PERCENTILES = [50, 90, 99]
 
 def ensure_parent(func):
     @wraps(func)
@@ -91,11 +103,43 @@ class PublishQueue(object):
             return
         raise TimeoutError
 
+    @ensure_parent
+    def isBusy(self, q):
+        """Returns True if q still has unfinished tasks"""
+        return not q._unfinished_tasks._semlock._is_zero()
+
+    @ensure_parent
+    def publishTo(self, q, val):
+        """Publishes val to a single registered queue"""
+        q.put(val, True, 1)
+
+    @ensure_parent
+    def waitIdle(self, queues, timeout):
+        """Waits until the given queues have finished all tasks
+
+        Returns the queues that are still busy after timeout
+        """
+        stop = time.time() + timeout
+        busy = [q for q in queues if self.isBusy(q)]
+        while busy and time.time() < stop:
+            time.sleep(0.001)
+            busy = [q for q in busy if self.isBusy(q)]
+        return busy
+
 
 class UpdateMessage:
-    def __init__(self, dt, audioBuffer, chunkRate, globalAutogainEnabled, globalAutogainMaxGain, globalAutogainTime):
+    def __init__(self,
+                 dt,
+                 audioBuffer,
+                 chunkRate,
+                 globalAutogainEnabled,
+                 globalAutogainMaxGain,
+                 globalAutogainTime,
+                 audioTimestamp=None):
         self.dt = dt
         self.audioBuffer = audioBuffer
+        # time.monotonic() of the capture of audioBuffer, see GlobalAudio.buffer_t
+        self.audioTimestamp = audioTimestamp
         self.chunkRate = chunkRate
         self.globalAutogainEnabled = globalAutogainEnabled
         self.globalAutogainMaxGain = globalAutogainMaxGain
@@ -108,8 +152,35 @@ class BrightnessMessage:
 
 
 class ShowMessage:
-    def __init(self):
-        pass
+    def __init__(self, presentation_t=None, audio_t=None):
+        # time.monotonic() at which the frame should light up on all devices, None to show immediately
+        self.presentation_t = presentation_t
+        # time.monotonic() of the capture of the audio the frame reacts to, None if unknown
+        self.audio_t = audio_t
+
+
+class LatencyHistory(object):
+    """Process-shared ring of the latest LATENCY_HISTORY end-to-end latencies of an output device
+
+    Written by the output process only, read by the project without lock.
+    """
+    def __init__(self, size=LATENCY_HISTORY):
+        self._values = mp.Array(ctypes.c_double, size, lock=False)
+        self._count = mp.Value(ctypes.c_int64, 0, lock=False)
+
+    def add(self, latency):
+        self._values[self._count.value % len(self._values)] = latency
+        self._count.value += 1
+
+    def getCount(self):
+        return self._count.value
+
+    def getPercentiles(self, percentiles=LATENCY_PERCENTILES):
+        """Returns the percentiles of the latest latencies in seconds, None if nothing was measured yet"""
+        n = min(self._count.value, len(self._values))
+        if n == 0:
+            return None
+        return np.percentile(np.ctypeslib.as_array(self._values)[:n], percentiles).tolist()
 
 
 class ReplaceFiltergraphMessage:
@@ -182,6 +253,25 @@ class ConnectionMessage:
             self.slotId, self.conUid, self.operation, self.params)
 
 
+class BatchMessage:
+    def __init__(self, slotId, messages):
+        self.slotId = slotId
+        self.messages = messages
+
+    def __str__(self):
+        return "BatchMessage - slotId: {}, {} messages".format(self.slotId, len(self.messages))
+
+
+class NodePreviewMessage:
+    def __init__(self, slotId, nodeUid, channel=0):
+        self.slotId = slotId
+        self.nodeUid = nodeUid
+        self.channel = channel
+
+    def __str__(self):
+        return "NodePreviewMessage - slotId: {}, uid: {}, channel: {}".format(self.slotId, self.nodeUid, self.channel)
+
+
 def worker_process_updateMessage(filtergraph: FilterGraph, outputDevice: audioled.devices.LEDController, slotId: int,
                                  event_loop, message: UpdateMessage):
     dt = message.dt
@@ -189,8 +279,8 @@ def worker_process_updateMessage(filtergraph: FilterGraph, outputDevice: audiole
     # logger.info("got item {} in process {}".format(dt, os.getpid()))
 
     # TODO: Hack to propagate audio?
-    audioled.audio.GlobalAudio.buffer = audioBuffer
     audioled.audio.GlobalAudio.chunk_rate = message.chunkRate
+    audioled.audio.GlobalAudio.receive(audioBuffer, message.audioTimestamp)
     audioled.audio.GlobalAudio.global_autogain_enabled = message.globalAutogainEnabled
     audioled.audio.GlobalAudio.global_autogain_maxgain = message.globalAutogainMaxGain
     audioled.audio.GlobalAudio.global_autogain_time = message.globalAutogainTime
@@ -277,8 +367,59 @@ def worker_process_connectionMessage(filtergraph: FilterGraph, outputDevice: aud
         filtergraph.removeConnection(message.conUid)
 
 
-def worker(q: PublishQueue, filtergraph: FilterGraph, outputDevice: audioled.devices.LEDController, deviceId: int,
-           slotId: int):
+def worker_process_batchMessage(filtergraph: FilterGraph, outputDevice: audioled.devices.LEDController, slotId: int,
+                                message: BatchMessage):
+    if message.slotId != slotId:
+        logger.info("Skipping batch message for slot {}".format(message.slotId))
+        return
+    logger.info("Process batch message: {}".format(message))
+    filtergraph.beginBatch()
+    try:
+        for m in message.messages:
+            if isinstance(m, NodeMessage):
+                worker_process_nodeMessage(filtergraph, outputDevice, slotId, m)
+            elif isinstance(m, ModulationMessage):
+                worker_process_modulationMessage(filtergraph, outputDevice, slotId, m)
+            elif isinstance(m, ModulationSourceMessage):
+                worker_process_modulationSourceMessage(filtergraph, outputDevice, slotId, m)
+            elif isinstance(m, ConnectionMessage):
+                worker_process_connectionMessage(filtergraph, outputDevice, slotId, m)
+            else:
+                logger.warning("Message not supported in batch: {}".format(m))
+    finally:
+        filtergraph.endBatch()
+
+
+def worker_process_nodePreview(filtergraph: FilterGraph, nodeUid: str, channel: int, previewArray: mp.Array,
+                               previewInfo: mp.Array):
+    """Copies the output buffer of a node to the shared preview array
+
+    previewArray holds interleaved RGB uint8 values, previewInfo holds [num_pixels, num_rows, frame].
+    The arrays are written without lock, readers may observe a partially written frame.
+    """
+    node = next((node for node in filtergraph.getNodes() if node.uid == nodeUid), None)
+    if node is None or channel >= len(node._outputBuffer):
+        previewInfo[0] = 0
+        return
+    buffer = node._outputBuffer[channel]
+    if buffer is None or buffer.ndim != 2 or buffer.shape[0] != 3:
+        previewInfo[0] = 0
+        return
+    npArray = np.ctypeslib.as_array(previewArray).reshape(-1, 3)
+    numPixels = min(buffer.shape[1], len(npArray))
+    np.clip(buffer[:, :numPixels].T, 0, 255, out=npArray[:numPixels], casting='unsafe')
+    previewInfo[0] = numPixels
+    previewInfo[1] = node.effect.getNumOutputRows()
+    previewInfo[2] += 1
+
+
+def worker(q: PublishQueue,
+           filtergraph: FilterGraph,
+           outputDevice: audioled.devices.LEDController,
+           deviceId: int,
+           slotId: int,
+           previewArray: mp.Array = None,
+           previewInfo: mp.Array = None):
     """Worker process for specific filtergraph for outputDevice
     
     Arguments:
@@ -286,6 +427,8 @@ def worker(q: PublishQueue, filtergraph: FilterGraph, outputDevice: audioled.dev
         filtergraph {FilterGraph} -- [description]
         outputDevice {audioled.devices.LEDController} -- [description]
         slotId {int} -- [description]
+        previewArray {mp.Array} -- Shared uint8 array receiving the output of the node selected for preview
+        previewInfo {mp.Array} -- Shared int64 array receiving [num_pixels, num_rows, frame] of the node preview
     """
     try:
         # Ignore sigint, needs to be handled inside parent and process must be joined
@@ -295,10 +438,16 @@ def worker(q: PublishQueue, filtergraph: FilterGraph, outputDevice: audioled.dev
         event_loop = asyncio.new_event_loop()
         asyncio.set_event_loop(event_loop)
         filtergraph.propagateNumPixels(outputDevice.getNumPixels(), outputDevice.getNumRows())
+        previewNode = None  # type: NodePreviewMessage
         for message in iter(q.get, None):
             try:
                 if isinstance(message, UpdateMessage):
                     worker_process_updateMessage(filtergraph, outputDevice, slotId, event_loop, message)
+                    if previewNode is not None and previewNode.slotId == slotId and previewArray is not None:
+                        worker_process_nodePreview(filtergraph, previewNode.nodeUid, previewNode.channel, previewArray,
+                                                   previewInfo)
+                elif isinstance(message, NodePreviewMessage):
+                    previewNode = message if message.nodeUid is not None else None
                 elif isinstance(message, NodeMessage):
                     worker_process_nodeMessage(filtergraph, outputDevice, slotId, message)
                 elif isinstance(message, ModulationMessage):
@@ -307,6 +456,8 @@ def worker(q: PublishQueue, filtergraph: FilterGraph, outputDevice: audioled.dev
                     worker_process_modulationSourceMessage(filtergraph, outputDevice, slotId, message)
                 elif isinstance(message, ConnectionMessage):
                     worker_process_connectionMessage(filtergraph, outputDevice, slotId, message)
+                elif isinstance(message, BatchMessage):
+                    worker_process_batchMessage(filtergraph, outputDevice, slotId, message)
                 elif isinstance(message, ReplaceFiltergraphMessage):
                     if message.deviceId == deviceId:
                         filtergraph = message.filtergraph
@@ -345,20 +496,85 @@ def worker(q: PublishQueue, filtergraph: FilterGraph, outputDevice: audioled.dev
         logger.info("filtergraph process interrupted")
 
 
-def output(q, outputDevice: audioled.devices.LEDController, virtualDevice: audioled.devices.VirtualOutput):
+def output(q,
+           outputDevice: audioled.devices.LEDController,
+           virtualDevice: audioled.devices.VirtualOutput,
+           latency=None,
+           endToEnd: LatencyHistory = None):
+    """Output process showing the frames of virtualDevice on outputDevice
+
+    Frames are held back until their presentation time minus the latency of the device.
+    Held frames are copied and the message is acknowledged right away, so holding a frame never keeps q busy
+    and the next frame is accepted while the previous one waits for its show time.
+    The latency is the calibrated latency of the device plus the measured time for show() and background transmission,
+    it is published in latency {mp.Value} if given.
+    For frames with an audio timestamp, the time from audio capture until the frame lights up is added to endToEnd.
+    """
     try:
         # Ignore sigint, needs to be handled inside parent and process must be joined
         signal.signal(signal.SIGINT, signal.SIG_IGN)
         threading.current_thread().name = 'OutputThread'
         logger.info("output process {} start".format(os.getpid()))
-        for message in iter(q.get, None):
+        # Last frame sent to the device, unchanged frames are only sent as keep-alive
+        lastFrame = None
+        lastShow_t = 0.
+        keepAlive = outputDevice.getKeepAliveInterval()
+        skipped = 0
+        showDuration = 0.
+        # Frames waiting for their show time: (show_t, pixels, audio_t, deviceLatency)
+        pending = deque()
+
+        def show(pixels, audio_t, deviceLatency):
+            nonlocal lastShow_t, showDuration
+            show_t = time.monotonic()
+            outputDevice.show(pixels)
+            lastShow_t = time.monotonic()
+            showDuration += 0.1 * (lastShow_t - show_t - showDuration)
+            if latency is not None:
+                latency.value = deviceLatency
+            if endToEnd is not None and audio_t is not None:
+                lightUp_t = lastShow_t + outputDevice.getLatency() + outputDevice.getTransmitLatency()
+                endToEnd.add(lightUp_t - audio_t)
+
+        while True:
+            try:
+                if pending:
+                    message = q.get(True, max(0., pending[0][0] - time.monotonic()))
+                else:
+                    message = q.get()
+            except queue.Empty:
+                message = False
+            if message is None:
+                break
             if isinstance(message, ShowMessage):
                 npArray = np.ctypeslib.as_array(virtualDevice._shared_array.get_obj()).reshape(3, -1)
-                outputDevice.show(npArray.reshape(3, -1, order='C'))
+                now = time.monotonic()
+                if (keepAlive != 0 and lastFrame is not None and (keepAlive is None or now - lastShow_t < keepAlive)
+                        and np.array_equal(npArray, lastFrame)):
+                    skipped += 1
+                else:
+                    lastFrame = npArray.copy()
+                    deviceLatency = outputDevice.getLatency() + showDuration + outputDevice.getTransmitLatency()
+                    show_t = now
+                    if message.presentation_t is not None:
+                        show_t += min(max(message.presentation_t - deviceLatency - now, 0.), MAX_PRESENTATION_DELAY)
+                    pending.append((show_t, lastFrame, message.audio_t, deviceLatency))
             elif isinstance(message, BrightnessMessage):
                 bm = message  # type: BrightnessMessage
                 outputDevice.setBrightness(bm.value)
-            q.task_done()
+                # Frame has to be sent again with the new brightness
+                lastFrame = None
+            if message is not False:
+                q.task_done()
+            while pending and pending[0][0] <= time.monotonic():
+                show(*pending.popleft()[1:])
+        # Frames already accepted are still shown in time
+        for show_t, pixels, audio_t, deviceLatency in pending:
+            delay = show_t - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            show(pixels, audio_t, deviceLatency)
+        logger.debug("output process {} skipped {} unchanged frames".format(os.getpid(), skipped))
         outputDevice.shutdown()
         logger.error("output process {} exit".format(os.getpid()))
     except Exception as e:
@@ -417,6 +633,9 @@ class Project(Updateable):
         self._outputProcesses = {}
         self._publishQueue = PublishQueue()
         self._showQueue = PublishQueue()
+        self._nodePreview = None
+        self._batchMessages = None
+        self._resetFrameState()
         self._lock = mp.Lock()
         self._handlerLock = mp.Lock()
         self._processingEnabled = True
@@ -486,36 +705,110 @@ class Project(Updateable):
             if not aquired:
                 logger.info("Skipping update, couldn't acquire lock")
                 return
+            restart = False
             try:
                 self._cur_t = self._cur_t + dt
-                self._sendUpdateCommand(dt)
+                updated = self._sendUpdateCommand(dt)
                 if (self._cur_t - self._last_t > 1):
                     # logger.debug("Updating preview device")
                     self._updatePreviewDevice(dt, event_loop)
                     self._last_t = self._cur_t
-                # Wait for previous show command done
+                # Wait for previous show command done, late output processes skip this frame
                 if self._showQueue is not None:
-                    self._showQueue.join(1)
-                # Wait for all updates
+                    self._showQueue.waitIdle(list(self._outputQueues.values()), FRAME_OVERRUN_TIMEOUT)
+                # Wait for updates of this frame, late workers keep their previous frame
+                late = []
                 if self._publishQueue is not None:
-                    self._publishQueue.join(1)
-                # Send show command and return
-                self._sendShowCommand()
-
-            except TimeoutError:
-                if self._processingEnabled and self._isActive:
-                    logger.error("Update timeout. Forcing reset")
-                    self._lock.release()
-                    self.stopProcessing()
-                    if self.activeSceneId is not None:
-                        logger.info("No scene active. Activating.")
-                        self.activateScene(self.activeSceneId)
-            else:
+                    late = self._publishQueue.waitIdle(updated, FRAME_OVERRUN_TIMEOUT)
+                    self._lateFrames += len(late)
+                # Send show command, end-to-end latency is only measured if all workers rendered the audio of this frame
+                audio_t = None
+                if len(updated) == len(self._workerQueues) and not late:
+                    audio_t = self._frameAudio_t
+                self._sendShowCommand(audio_t)
+                restart = self._unresponsiveProcesses()
+            finally:
                 self._lock.release()
+            if restart and self._processingEnabled and self._isActive:
+                logger.error("Processes unresponsive or crashed. Forcing reset")
+                self.stopProcessing()
+                if self.activeSceneId is not None:
+                    self.activateScene(self.activeSceneId)
         else:
             time.sleep(0.01)
             logger.debug("Waiting...")
 
+    def getFrameStats(self):
+        """Returns statistics about skipped frames
+
+        skippedUpdates: Per device, number of updates coalesced because the worker was still busy
+        skippedShows: Number of show commands skipped because the output process was still busy
+        lateFrames: Number of updates that did not finish within the frame
+        outputLatencies: Per output process, calibrated plus measured latency in seconds
+            and percentiles (LATENCY_PERCENTILES) of the end-to-end latency from audio capture until the frame lights up
+        presentationDelay: Time in seconds frames are held back to light up all devices at the same time
+        """
+        return {
+            "skippedUpdates": dict(self._skippedUpdates),
+            "skippedShows": self._skippedShows,
+            "lateFrames": self._lateFrames,
+            "outputLatencies": [{
+                "device": type(device).__name__,
+                "latency": latency.value,
+                "endToEnd": self._outputEndToEnd[device].getPercentiles() if device in self._outputEndToEnd else None,
+            } for device, latency in self._outputLatencies.items()],
+            "presentationDelay": self._getPresentationDelay(),
+        }
+
+    def getOutputPreview(self, dIdx):
+        """Returns the last frame written for the device with index dIdx
+
+        The shared output array is read without lock, so the frame may be partially updated.
+
+        Returns:
+            (num_rows, pixels) -- pixels as uint8 array of shape (num_pixels, 3) or None if device is not active
+        """
+        virtualDevice = self._outputPreviews.get(dIdx)
+        if virtualDevice is None:
+            return None
+        npArray = np.ctypeslib.as_array(virtualDevice._shared_array.get_obj()).reshape(3, -1)
+        start = virtualDevice.start_index
+        pixels = np.ascontiguousarray(npArray[:, start:start + virtualDevice.getNumPixels()].T)
+        return virtualDevice.getNumRows(), pixels
+
+    def setNodePreview(self, slotId, nodeUid, channel=0):
+        """Selects the node whose output is copied to the node preview buffers by the workers
+
+        Arguments:
+            slotId {int} -- Slot of the node
+            nodeUid {str} -- Uid of the node, None to disable node preview
+            channel {int} -- Output channel of the node
+        """
+        self._nodePreview = (slotId, nodeUid, channel) if nodeUid is not None else None
+        for nodePreview in self._nodePreviews.values():
+            nodePreview[1][0] = 0
+        if self._publishQueue is not None:
+            self._publishQueue.publish(NodePreviewMessage(slotId, nodeUid, channel))
+
+    def getNodePreview(self, slotId, nodeUid, channel=0):
+        """Returns the last output of the selected preview node
+
+        Returns:
+            (num_rows, pixels) -- pixels as uint8 array of shape (num_pixels, 3) or None if not available
+        """
+        if self._nodePreview != (slotId, nodeUid, channel):
+            return None
+        for dIdx, workerSlot in self._workerSlots.items():
+            if workerSlot != slotId or dIdx not in self._nodePreviews:
+                continue
+            previewArray, previewInfo = self._nodePreviews[dIdx]
+            numPixels = previewInfo[0]
+            if numPixels <= 0:
+                continue
+            pixels = np.ctypeslib.as_array(previewArray).reshape(-1, 3)[:numPixels].copy()
+            return max(1, previewInfo[1]), pixels
+        return None
+
     def process(self):
         """Process active FilterGraph
         """
@@ -648,6 +941,7 @@ class Project(Updateable):
                 self._outputProcesses = {}
                 self._publishQueue = None
                 self._showQueue = None
+                self._resetFrameState()
                 self._processingEnabled = True
                 self._lock.release()
             self._isActive = False
@@ -670,13 +964,20 @@ class Project(Updateable):
                 self._showQueue = None
             logger.debug("Ending processes")
             for p in self._filtergraphProcesses.values():
-                p.join()
+                p.join(PROCESS_UNRESPONSIVE_TIMEOUT)
+                if p.is_alive():
+                    logger.warning("Terminating unresponsive process {}".format(p.pid))
+                    p.terminate()
             logger.debug("Filtergraph processes joined")
             self._filtergraphProcesses = {}
             for p in self._outputProcesses.values():
-                p.join()
+                p.join(PROCESS_UNRESPONSIVE_TIMEOUT)
+                if p.is_alive():
+                    logger.warning("Terminating unresponsive process {}".format(p.pid))
+                    p.terminate()
             logger.debug("Output processes joined")
             self._outputProcesses = {}
+            self._resetFrameState()
             logger.debug('All processes joined')
         finally:
             logger.debug("stopped processing - releasing lock")
@@ -726,6 +1027,45 @@ class Project(Updateable):
         fg._onConnectionRemoved = self._handleConnectionRemoved
         return fg
 
+    def editSlotBatch(self, slotId, edit):
+        """Applies a batch of modifications to the filtergraph of a slot as one transaction
+
+        The modifications are applied to the preview filtergraph of the slot with a single process order update.
+        Workers receive all modifications within one BatchMessage. If edit raises, the filtergraph is
+        restored and no modification is sent to the workers.
+
+        Arguments:
+            slotId {int} -- Slot to modify
+            edit {function} -- Called with the filtergraph of the slot, performs the modifications
+
+        Returns:
+            Return value of edit
+        """
+        fg = self.previewSlot(slotId)  # type: FilterGraph
+        snapshot = jsonpickle.encode(fg)
+        self._batchMessages = []
+        fg.beginBatch()
+        try:
+            result = edit(fg)
+            fg.endBatch()
+        except Exception:
+            logger.warning("Error in batch for slot {}, restoring filtergraph".format(slotId))
+            restored = jsonpickle.decode(snapshot)
+            restored.setContentRoot(self._contentRoot)
+            self.slots[slotId] = restored
+            self.previewSlot(slotId)
+            raise
+        finally:
+            messages = self._batchMessages
+            self._batchMessages = None
+        if messages and self._publishQueue is not None:
+            self._handlerLock.acquire()
+            try:
+                self._publishQueue.publish(BatchMessage(slotId, messages))
+            finally:
+                self._handlerLock.release()
+        return result
+
     def getSlot(self, slotId):
         if self.slots[slotId] is None:
             logger.info("Initializing slot {}".format(slotId))
@@ -905,12 +1245,16 @@ class Project(Updateable):
             fgDevice = virtualDevice
             realDevice = device
 
+        # Shared buffers for node preview, written by the worker without lock
+        previewArray = mp.Array(ctypes.c_uint8, 3 * fgDevice.getNumPixels(), lock=False)
+        previewInfo = mp.Array(ctypes.c_int64, 3, lock=False)
+
         # Start filtergraph process
         successful = False
         sleepfact = 1.
         while not successful:
             q = self._publishQueue.register()
-            p = mp.Process(target=worker, args=(q, filterGraph, fgDevice, dIdx, slotId))
+            p = mp.Process(target=worker, args=(q, filterGraph, fgDevice, dIdx, slotId, previewArray, previewInfo))
             p.start()
             # Process sometimes doesn't start...
             q.put("check_is_processing")
@@ -925,15 +1269,25 @@ class Project(Updateable):
                 successful = True
             sleepfact = 2. * sleepfact
         self._filtergraphProcesses[dIdx] = p
+        self._workerQueues[dIdx] = q
+        self._workerSlots[dIdx] = slotId
+        # New worker starts with the latest chunk
+        self._audioPositions.pop(dIdx, None)
+        self._outputPreviews[dIdx] = virtualDevice
+        self._nodePreviews[dIdx] = (previewArray, previewInfo)
+        if self._nodePreview is not None:
+            q.put(NodePreviewMessage(*self._nodePreview))
         logger.debug('Started process for device {} with device {}'.format(dIdx, fgDevice))
 
         # Start output process
         sleepfact = 1.
         if outputDevice is not None:
             outSuccessful = False
+            latency = mp.Value(ctypes.c_double, outputDevice.getLatency(), lock=False)
+            endToEnd = LatencyHistory()
             while not outSuccessful:
                 q = self._showQueue.register()
-                p = mp.Process(target=output, args=(q, outputDevice, virtualDevice))
+                p = mp.Process(target=output, args=(q, outputDevice, virtualDevice, latency, endToEnd))
                 p.start()
                 # Make sure process starts
                 q.put(BrightnessMessage(self.getBrightnessActiveScene()))
@@ -941,7 +1295,7 @@ class Project(Updateable):
                 time.sleep(sleepfact * 0.1)
                 if not q._unfinished_tasks._semlock._is_zero():
                     logger.warning("Output process didn't respond in time!")
-                    self._showQueue.unregister(p)
+                    self._showQueue.unregister(q)
                     p.join(sleepfact * 0.1)
                     if p.is_alive():
                         p.terminate()
@@ -950,81 +1304,56 @@ class Project(Updateable):
                     q.put("first")
                 sleepfact = 2. * sleepfact
             self._outputProcesses[outputDevice] = p
+            self._outputQueues[outputDevice] = q
+            self._outputLatencies[outputDevice] = latency
+            self._outputEndToEnd[outputDevice] = endToEnd
             logger.info("Started output process for device {}".format(outputDevice))
 
     def _sendBrightnessCommand(self, value):
         self._showQueue.publish(BrightnessMessage(value))
 
-    def _handleNodeAdded(self, node: audioled.filtergraph.Node, niceness=0.0):
+    def _publishEditMessage(self, message, niceness):
+        if self._batchMessages is not None:
+            # Collected and sent as single BatchMessage
+            self._batchMessages.append(message)
+            return
         self._handlerLock.acquire()
         time.sleep(niceness)
         try:
-            self._publishQueue.publish(NodeMessage(self.previewSlotId, node.uid, 'add', node.effect))
+            self._publishQueue.publish(message)
         finally:
             self._handlerLock.release()
 
+    def _handleNodeAdded(self, node: audioled.filtergraph.Node, niceness=0.0):
+        self._publishEditMessage(NodeMessage(self.previewSlotId, node.uid, 'add', node.effect), niceness)
+
     def _handleNodeRemoved(self, node: audioled.filtergraph.Node, niceness=0.0):
-        self._handlerLock.acquire()
-        time.sleep(niceness)
-        try:
-            self._publishQueue.publish(NodeMessage(self.previewSlotId, node.uid, 'remove'))
-        finally:
-            self._handlerLock.release()
+        self._publishEditMessage(NodeMessage(self.previewSlotId, node.uid, 'remove'), niceness)
 
     def _handleNodeUpdate(self, node: audioled.filtergraph.Node, updateParameters, niceness=0.1):
         """
         updates can come rapidly, default niceness 0.1
         """
         logger.debug("Handling node update {}".format(updateParameters))
-        self._handlerLock.acquire()
-        time.sleep(niceness)
-        try:
-            self._publishQueue.publish(NodeMessage(self.previewSlotId, node.uid, 'update', updateParameters))
-        finally:
-            self._handlerLock.release()
+        self._publishEditMessage(NodeMessage(self.previewSlotId, node.uid, 'update', updateParameters), niceness)
 
     def _handleModulationAdded(self, mod: audioled.filtergraph.Modulation, niceness=0.0):
-        self._handlerLock.acquire()
-        time.sleep(niceness)
-        try:
-            self._publishQueue.publish(ModulationMessage(self.previewSlotId, mod.uid, 'add', mod))
-        finally:
-            self._handlerLock.release()
+        self._publishEditMessage(ModulationMessage(self.previewSlotId, mod.uid, 'add', mod), niceness)
 
     def _handleModulationRemoved(self, mod: audioled.filtergraph.Modulation, niceness=0.0):
-        self._handlerLock.acquire()
-        time.sleep(niceness)
-        try:
-            self._publishQueue.publish(ModulationMessage(self.previewSlotId, mod.uid, 'remove'))
-        finally:
-            self._handlerLock.release()
+        self._publishEditMessage(ModulationMessage(self.previewSlotId, mod.uid, 'remove'), niceness)
 
     def _handleModulationUpdate(self, mod: audioled.filtergraph.Modulation, updateParameters, niceness=0.1):
         """
         updates can come rapidly, default niceness 0.1
         """
-        self._handlerLock.acquire()
-        time.sleep(niceness)
-        try:
-            self._publishQueue.publish(ModulationMessage(self.previewSlotId, mod.uid, 'update', updateParameters))
-        finally:
-            self._handlerLock.release()
+        self._publishEditMessage(ModulationMessage(self.previewSlotId, mod.uid, 'update', updateParameters), niceness)
 
     def _handleModulationSourceAdded(self, modSource: audioled.filtergraph.ModulationSourceNode, niceness=0.0):
-        self._handlerLock.acquire()
-        time.sleep(niceness)
-        try:
-            self._publishQueue.publish(ModulationSourceMessage(self.previewSlotId, modSource.uid, 'add', modSource))
-        finally:
-            self._handlerLock.release()
+        self._publishEditMessage(ModulationSourceMessage(self.previewSlotId, modSource.uid, 'add', modSource), niceness)
 
     def _handleModulationSourceRemoved(self, modSource: audioled.filtergraph.ModulationSourceNode, niceness=0.0):
-        self._handlerLock.acquire()
-        time.sleep(niceness)
-        try:
-            self._publishQueue.publish(ModulationSourceMessage(self.previewSlotId, modSource.uid, 'remove'))
-        finally:
-            self._handlerLock.release()
+        self._publishEditMessage(ModulationSourceMessage(self.previewSlotId, modSource.uid, 'remove'), niceness)
 
     def _handleModulationSourceUpdate(self,
                                       modSource: audioled.filtergraph.ModulationSourceNode,
@@ -1033,50 +1362,113 @@ class Project(Updateable):
         """
         updates can come rapidly, default niceness 0.1
         """
-        self._handlerLock.acquire()
-        time.sleep(niceness)
-        try:
-            self._publishQueue.publish(ModulationSourceMessage(self.previewSlotId, modSource.uid, 'update', updateParameters))
-        finally:
-            self._handlerLock.release()
+        self._publishEditMessage(ModulationSourceMessage(self.previewSlotId, modSource.uid, 'update', updateParameters),
+                                 niceness)
 
     def _handleConnectionAdded(self, con: audioled.filtergraph.Connection, niceness=0.0):
-        self._handlerLock.acquire()
-        time.sleep(niceness)
-        try:
-            self._publishQueue.publish(ConnectionMessage(self.previewSlotId, con.uid, 'add', con.__getstate__()))
-        finally:
-            self._handlerLock.release()
+        self._publishEditMessage(ConnectionMessage(self.previewSlotId, con.uid, 'add', con.__getstate__()), niceness)
 
     def _handleConnectionRemoved(self, con: audioled.filtergraph.Connection, niceness=0.0):
-        self._handlerLock.acquire()
-        time.sleep(niceness)
-        try:
-            self._publishQueue.publish(ConnectionMessage(self.previewSlotId, con.uid, 'remove'))
-        finally:
-            self._handlerLock.release()
+        self._publishEditMessage(ConnectionMessage(self.previewSlotId, con.uid, 'remove'), niceness)
+
+    def _resetFrameState(self):
+        self._workerQueues = {}  # type: Dict[int, mp.JoinableQueue]
+        self._outputQueues = {}  # type: Dict[audioled.devices.LEDController, mp.JoinableQueue]
+        self._outputLatencies = {}  # type: Dict[audioled.devices.LEDController, mp.Value]
+        self._outputEndToEnd = {}  # type: Dict[audioled.devices.LEDController, LatencyHistory]
+        self._frameAudio_t = None
+        self._pendingDt = {}
+        # Per worker, ring position of the audio sent with the last update
+        self._audioPositions = {}
+        self._busySince = {}
+        self._skippedUpdates = {}
+        self._skippedShows = 0
+        self._lateFrames = 0
+        self._workerSlots = {}  # type: Dict[int, int]
+        self._outputPreviews = {}  # type: Dict[int, audioled.devices.VirtualOutput]
+        self._nodePreviews = {}
 
     def _sendUpdateCommand(self, dt):
+        """Sends update to all idle workers
+
+        Workers still busy with a previous frame are skipped. The skipped time is accumulated,
+        so the next update for that worker carries the coalesced dt instead of building up a backlog.
+        Likewise each update carries all audio captured since the previous update of that worker.
+
+        Returns the queues the update was sent to
+        """
         if self._publishQueue is None:
             logger.info("No publish queue. Possibly exiting")
-            return
-        self._publishQueue.publish(
-            UpdateMessage(
-                dt,
-                audioled.audio.GlobalAudio.buffer,
-                audioled.audio.GlobalAudio.chunk_rate,
-                audioled.audio.GlobalAudio.global_autogain_enabled,
-                audioled.audio.GlobalAudio.global_autogain_maxgain,
-                audioled.audio.GlobalAudio.global_autogain_time,
-            ))
-
-    def _sendShowCommand(self):
+            return []
+        updated = []
+        now = time.time()
+        # Sources that don't run in real-time deliver exactly one frame of audio per update
+        audioled.audio.GlobalAudio.pull()
+        # Timestamp of the latest chunk is carried to the show command
+        ring = audioled.audio.GlobalAudio.ring
+        audioBuffer = audioled.audio.GlobalAudio.buffer
+        self._frameAudio_t = audioled.audio.GlobalAudio.buffer_t
+        for dIdx, q in self._workerQueues.items():
+            pendingDt = self._pendingDt.get(dIdx, 0.) + dt
+            if self._publishQueue.isBusy(q):
+                self._pendingDt[dIdx] = pendingDt
+                self._skippedUpdates[dIdx] = self._skippedUpdates.get(dIdx, 0) + 1
+                self._busySince.setdefault(q, now)
+                continue
+            self._busySince.pop(q, None)
+            self._pendingDt[dIdx] = 0.
+            if ring is not None:
+                audioBuffer, self._audioPositions[dIdx] = ring.getSamplesSince(self._audioPositions.get(dIdx))
+            self._publishQueue.publishTo(
+                q,
+                UpdateMessage(
+                    pendingDt,
+                    audioBuffer,
+                    audioled.audio.GlobalAudio.chunk_rate,
+                    audioled.audio.GlobalAudio.global_autogain_enabled,
+                    audioled.audio.GlobalAudio.global_autogain_maxgain,
+                    audioled.audio.GlobalAudio.global_autogain_time,
+                    self._frameAudio_t,
+                ))
+            updated.append(q)
+        return updated
+
+    def _sendShowCommand(self, audio_t=None):
         if self._showQueue is None:
             logger.info("No show queue. Possibly exiting")
             return
-        self._showQueue.publish(ShowMessage())
+        now = time.time()
+        # All devices show the frame when the device with the highest latency can show it
+        message = ShowMessage(time.monotonic() + self._getPresentationDelay(), audio_t)
+        for q in self._outputQueues.values():
+            if self._showQueue.isBusy(q):
+                # Output still busy with previous frame, skip
+                self._skippedShows += 1
+                self._busySince.setdefault(q, now)
+                continue
+            self._busySince.pop(q, None)
+            self._showQueue.publishTo(q, message)
+
+    def _getPresentationDelay(self):
+        if not self._outputLatencies:
+            return 0.
+        return min(MAX_PRESENTATION_DELAY, max(latency.value for latency in self._outputLatencies.values()))
+
+    def _unresponsiveProcesses(self):
+        """Returns True if a process crashed or was busy for longer than PROCESS_UNRESPONSIVE_TIMEOUT"""
+        for p in list(self._filtergraphProcesses.values()) + list(self._outputProcesses.values()):
+            if not p.is_alive():
+                logger.error("Process {} is not alive".format(p.pid))
+                return True
+        now = time.time()
+        for q, since in self._busySince.items():
+            if now - since > PROCESS_UNRESPONSIVE_TIMEOUT:
+                logger.error("Process unresponsive for {:.1f} seconds".format(now - since))
+                return True
+        return False
 
     def _sendReplaceFiltergraphCommand(self, dIdx, slotId, filtergraph):
+        self._workerSlots[dIdx] = slotId
         if self._publishQueue is not None:
             self._publishQueue.publish(ReplaceFiltergraphMessage(dIdx, slotId, filtergraph))
 
@@ -0,0 +1,110 @@
+"""Memory-mapped ring files for recording and replaying rendered frames
+
+File layout:
+    header (64 bytes):  magic | version | num_pixels | num_rows | capacity | count
+    capacity slots:     timestamp (float64) | pixels (uint8, shape (3, num_pixels))
+count is the total number of frames written, the slot of frame i is i % capacity.
+The count is updated after the frame data, so readers never see partially written frames
+unless the writer overtakes them.
+"""
+import os
+
+import numpy as np
+
+import logging
+logger = logging.getLogger(__name__)
+
+MAGIC = b'MOLREC'
+VERSION = 1
+HEADER_SIZE = 64
+HEADER_DTYPE = np.dtype([('magic', 'S6'), ('version', '<u2'), ('num_pixels', '<u4'), ('num_rows', '<u4'),
+                         ('capacity', '<u4'), ('count', '<u8'), ('reserved', 'V36')])
+
+
+def _slotDtype(num_pixels):
+    return np.dtype([('t', '<f8'), ('pixels', 'u1', (3, num_pixels))])
+
+
+class FrameRing(object):
+    """Ring of frames stored in a memory-mapped file
+
+    Use FrameRing.create to create a new file for writing and FrameRing.open for reading.
+    """
+    def __init__(self, filename, mode):
+        self.filename = filename
+        self._mmap = np.memmap(filename, dtype=np.uint8, mode=mode)
+        self._header = self._mmap[:HEADER_SIZE].view(HEADER_DTYPE)
+        if self._header['magic'][0] != MAGIC or self._header['version'][0] != VERSION:
+            raise ValueError("{} is not a frame recording".format(filename))
+        self.num_pixels = int(self._header['num_pixels'][0])
+        self.num_rows = int(self._header['num_rows'][0])
+        self.capacity = int(self._header['capacity'][0])
+        slotDtype = _slotDtype(self.num_pixels)
+        self._slots = self._mmap[HEADER_SIZE:HEADER_SIZE + self.capacity * slotDtype.itemsize].view(slotDtype)
+
+    @classmethod
+    def create(cls, filename, num_pixels, num_rows=1, capacity=1000):
+        """Creates and preallocates a ring file, an existing file is overwritten"""
+        size = HEADER_SIZE + capacity * _slotDtype(num_pixels).itemsize
+        directory = os.path.dirname(os.path.abspath(filename))
+        os.makedirs(directory, exist_ok=True)
+        header = np.zeros(1, dtype=HEADER_DTYPE)
+        header['magic'] = MAGIC
+        header['version'] = VERSION
+        header['num_pixels'] = num_pixels
+        header['num_rows'] = num_rows
+        header['capacity'] = capacity
+        with open(filename, 'wb') as f:
+            f.write(header.tobytes())
+            f.truncate(size)
+        return cls(filename, 'r+')
+
+    @classmethod
+    def open(cls, filename):
+        """Opens a ring file for reading
+
+        Frames are mapped copy-on-write, so they can be modified without changing the file.
+        """
+        return cls(filename, 'c')
+
+    def getCount(self):
+        """Returns the total number of frames written"""
+        return int(self._header['count'][0])
+
+    def __len__(self):
+        return min(self.getCount(), self.capacity)
+
+    def append(self, pixels, t):
+        """Appends a frame
+
+        Arguments:
+            pixels {np.ndarray} -- Pixels of shape (3, num_pixels), values are clipped to 0..255
+            t {float} -- Timestamp of the frame
+        """
+        count = self.getCount()
+        slot = count % self.capacity
+        n = min(pixels.shape[1], self.num_pixels)
+        np.clip(pixels[:, :n], 0, 255, out=self._slots['pixels'][slot, :, :n], casting='unsafe')
+        self._slots['t'][slot] = t
+        self._header['count'] = count + 1
+
+    def getFrame(self, index):
+        """Returns (timestamp, pixels) of a frame, index 0 being the oldest frame in the ring
+
+        pixels is a view into the mapped file.
+        """
+        count = self.getCount()
+        if index < 0 or index >= min(count, self.capacity):
+            raise IndexError("Frame {} not in recording".format(index))
+        slot = (max(0, count - self.capacity) + index) % self.capacity
+        return float(self._slots['t'][slot]), self._slots['pixels'][slot]
+
+    def flush(self):
+        if self._mmap.mode != 'c':
+            self._mmap.flush()
+
+    def close(self):
+        self.flush()
+        self._mmap = None
+        self._header = None
+        self._slots = None
@@ -0,0 +1,171 @@
+"""Registry of available effects and modulation sources
+
+The registry holds class names, constructor arguments, parameter definitions and help texts
+of all effects and modulation sources that can be created via the server.
+It is built once by importing all effect modules and cached on disk, so later starts can answer
+catalog requests without importing the effect modules.
+The cache is rebuilt if one of the modules of the package changed.
+"""
+import hashlib
+import importlib
+import inspect
+import json
+import os
+from collections import OrderedDict
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Modules effects and modulation sources can be created from
+EFFECT_MODULES = [
+    "audioled.audio", "audioled.effects", "audioled.devices", "audioled.colors", "audioled.audioreactive",
+    "audioled.generative", "audioled.input", "audioled.panelize", "audioled.modulation"
+]
+
+# Classes with parameter definitions depending on the system (e.g. available MIDI ports),
+# their parameter definitions have to be queried on each request
+DYNAMIC_PARAMETER_CLASSES = ["audioled.generative.MidiKeyboard"]
+
+REGISTRY_FORMAT = 1
+
+
+def modulesFingerprint(packageDir=None):
+    """Returns a fingerprint of the source files of the audioled package
+
+    All modules are included, since effects inherit parameter definitions and defaults from modules
+    not listed in EFFECT_MODULES.
+
+    Arguments:
+        packageDir {str} -- Directory of the package, defaults to the audioled package
+    """
+    if packageDir is None:
+        packageDir = os.path.dirname(os.path.abspath(__file__))
+    entries = [str(REGISTRY_FORMAT)]
+    try:
+        fileNames = sorted(f for f in os.listdir(packageDir) if f.endswith('.py'))
+    except OSError:
+        fileNames = []
+    for fileName in fileNames:
+        try:
+            stat = os.stat(os.path.join(packageDir, fileName))
+            entries.append("{}:{}:{}".format(fileName, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            entries.append("{}:missing".format(fileName))
+    return hashlib.md5(";".join(entries).encode('utf-8')).hexdigest()
+
+
+def constructorArgs(cls):
+    """Returns constructor arguments of a class with their default value, None for arguments without default"""
+    argspec = inspect.getfullargspec(cls.__init__)
+    if argspec.defaults is not None:
+        argsWithDefaults = dict(zip(argspec.args[-len(argspec.defaults):], argspec.defaults))
+    else:
+        argsWithDefaults = dict()
+    result = argsWithDefaults.copy()
+    if argspec.defaults is not None:
+        result.update({key: None for key in argspec.args[1:len(argspec.args) - len(argspec.defaults)]})  # 1 removes self
+    return result
+
+
+def _inheritors(klass):
+    subclasses = set()
+    work = [klass]
+    while work:
+        parent = work.pop()
+        for child in parent.__subclasses__():
+            if child not in subclasses:
+                subclasses.add(child)
+                work.append(child)
+    return subclasses
+
+
+def _call(func):
+    try:
+        return func()
+    except Exception:
+        return None
+
+
+def buildEntries():
+    """Imports all effect modules and collects the registry entries"""
+    for module_name in EFFECT_MODULES:
+        importlib.import_module(module_name)
+    from audioled import effect, modulation
+    classes = _inheritors(effect.Effect) | _inheritors(modulation.ModulationSource)
+    entries = OrderedDict()
+    for cls in sorted(classes, key=lambda c: (c.__module__, c.__name__)):
+        if cls.__module__ not in EFFECT_MODULES:
+            continue
+        full_class_name = cls.__module__ + "." + cls.__name__
+        dynamicParameters = full_class_name in DYNAMIC_PARAMETER_CLASSES
+        entries[full_class_name] = {
+            "module": cls.__module__,
+            "name": cls.__name__,
+            "isModulationSource": issubclass(cls, modulation.ModulationSource),
+            "description": _call(cls.getEffectDescription) if hasattr(cls, 'getEffectDescription') else None,
+            "args": constructorArgs(cls),
+            "dynamicParameters": dynamicParameters,
+            "parameters": None if dynamicParameters else _call(cls.getParameterDefinition),
+            "parameterHelp": _call(cls.getParameterHelp) if hasattr(cls, 'getParameterHelp') else None,
+        }
+    return entries
+
+
+class EffectRegistry(object):
+    """Registry of effects and modulation sources, cached on disk
+
+    Entries are loaded on first access, either from cacheFile or by importing all effect modules.
+    """
+    def __init__(self, cacheFile=None):
+        """Constructor for the registry
+
+        Arguments:
+            cacheFile {str} -- Location of the cache file, None disables the cache
+        """
+        self._cacheFile = cacheFile
+        self._entries = None
+
+    def getClassNames(self):
+        """Returns the full class names of all effects and modulation sources"""
+        return list(self._getEntries().keys())
+
+    def get(self, full_class_name):
+        """Returns the registry entry for the given full class name or None"""
+        return self._getEntries().get(full_class_name)
+
+    def _getEntries(self):
+        if self._entries is None:
+            fingerprint = modulesFingerprint()
+            self._entries = self._loadCache(fingerprint)
+            if self._entries is None:
+                logger.info("Building effect registry")
+                self._entries = buildEntries()
+                self._storeCache(fingerprint)
+        return self._entries
+
+    def _loadCache(self, fingerprint):
+        if self._cacheFile is None or not os.path.exists(self._cacheFile):
+            return None
+        try:
+            with open(self._cacheFile, "r") as f:
+                cache = json.load(f, object_pairs_hook=OrderedDict)
+            if cache.get("fingerprint") != fingerprint:
+                logger.info("Effect registry cache outdated")
+                return None
+            return cache["entries"]
+        except Exception as e:
+            logger.warning("Error loading effect registry cache {}: {}".format(self._cacheFile, e))
+            return None
+
+    def _storeCache(self, fingerprint):
+        if self._cacheFile is None:
+            return
+        try:
+            data = json.dumps({"fingerprint": fingerprint, "entries": self._entries})
+            os.makedirs(os.path.dirname(os.path.abspath(self._cacheFile)), exist_ok=True)
+            tmpFile = self._cacheFile + ".tmp"
+            with open(tmpFile, "w") as f:
+                f.write(data)
+            os.replace(tmpFile, self._cacheFile)
+        except Exception as e:
+            logger.warning("Error storing effect registry cache {}: {}".format(self._cacheFile, e))
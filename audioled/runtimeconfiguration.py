@@ -40,6 +40,26 @@ def commonRuntimeArgumentParser():
                         type=int,
                         default=None,
                         help='Audio device index to use')
+    parser.add_argument(
+        '--audio_block_size',
+        dest='audio_block_size',
+        type=int,
+        default=None,
+        help='Samples per audio block (e.g. 256 for low latency), defaults to one frame of audio',
+    )
+    parser.add_argument(
+        '--audio_source',
+        dest='audio_source',
+        default=None,
+        help='Use an audio source instead of an audio device: '
+        'null, sine, sweep, noise, kick or the path of a WAV/raw float32 file',
+    )
+    parser.add_argument(
+        '--audio_no_realtime',
+        dest='audio_no_realtime',
+        action='store_true',
+        help='Deliver exactly one frame of audio of --audio_source per frame instead of in real-time',
+    )
 
     return parser
 
@@ -91,6 +111,20 @@ def addServerRuntimeArguments(parser: argparse.ArgumentParser):
                         action='store_true',
                         default=False,
                         help='Print process timing')
+    parser.add_argument(
+        '--fps',
+        dest='fps',
+        type=float,
+        default=None,
+        help='Target frame rate of the LED thread (default: 100)',
+    )
+    parser.add_argument(
+        '--preview_port',
+        dest='preview_port',
+        type=int,
+        default=5002,
+        help='Port of the WebSocket live preview (default: 5002)',
+    )
     parser.add_argument(
         '--strand',
         dest='strand',
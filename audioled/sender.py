@@ -0,0 +1,191 @@
+"""Background sender for network output devices
+
+Network devices hand their encoded frames to a FrameSender instead of doing socket I/O in show().
+The sender keeps only the newest pending frame (latest frame wins), sends it from a dedicated thread
+and reconnects in the background with exponential back-off.
+"""
+import threading
+import time
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class FrameSender(object):
+    """Sends frames from a background thread, dropping frames that were replaced before they could be sent
+
+    Arguments:
+        send {callable} -- Called with a frame, must return False or raise OSError if the frame could not be sent
+        connect {callable} -- Optional, called before sending if not connected, must return True on success
+        disconnect {callable} -- Optional, called after a failed send
+        name {str} -- Name of the sender thread, used for logging
+        min_backoff {float} -- Initial delay in seconds before reconnecting
+        max_backoff {float} -- Maximum delay in seconds before reconnecting
+        stats_interval {float} -- Interval in seconds for logging send statistics
+    """
+    def __init__(self,
+                 send,
+                 connect=None,
+                 disconnect=None,
+                 name='FrameSender',
+                 min_backoff=0.1,
+                 max_backoff=5.0,
+                 stats_interval=30.0):
+        self._send = send
+        self._connect = connect
+        self._disconnect = disconnect
+        self._name = name
+        self._min_backoff = min_backoff
+        self._max_backoff = max_backoff
+        self._stats_interval = stats_interval
+        self._cond = threading.Condition()
+        self._frame = None
+        self._frame_t = None
+        self._connected = connect is None
+        self._stopSignal = False
+        self._thread = None  # type: threading.Thread
+        self.reconnects = 0
+        # Moving average, read by getTransmitLatency of devices and kept across stats intervals
+        self.latency_avg = 0.
+        self._resetStats()
+
+    def _resetStats(self):
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+        self.latency_max = 0.
+
+    def start(self):
+        """Start the sender thread"""
+        if self._thread is not None:
+            return
+        self._stopSignal = False
+        self._thread = threading.Thread(target=self._process_thread, name=self._name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=1):
+        """Stop the sender thread
+        Raises TimeoutError """
+        with self._cond:
+            self._stopSignal = True
+            self._cond.notify()
+        if self._thread is None:
+            return
+        self._thread.join(timeout=timeout)
+        if self._thread.is_alive():
+            raise TimeoutError("thread.join timed out")
+        self._thread = None
+
+    def isAlive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def isConnected(self):
+        return self._connected
+
+    def submit(self, frame):
+        """Hand a frame to the sender, never blocks on the network
+
+        A pending frame that wasn't sent yet is replaced and counted as dropped.
+        """
+        with self._cond:
+            if self._frame is not None:
+                self.dropped += 1
+            self._frame = frame
+            self._frame_t = time.monotonic()
+            self._cond.notify()
+
+    def getStats(self):
+        """Returns send statistics, latency is measured from submit until the send returned"""
+        return {
+            "connected": self._connected,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "reconnects": self.reconnects,
+            "latency_avg": self.latency_avg,
+            "latency_max": self.latency_max,
+        }
+
+    def _take(self, timeout):
+        with self._cond:
+            if self._frame is None and not self._stopSignal:
+                self._cond.wait(timeout)
+            frame, frame_t = self._frame, self._frame_t
+            self._frame = None
+            return frame, frame_t
+
+    def _wait(self, delay):
+        # Wait without consuming pending frames, returns early on stop
+        with self._cond:
+            if not self._stopSignal:
+                self._cond.wait_for(lambda: self._stopSignal, timeout=delay)
+
+    def _process_thread(self):
+        backoff = self._min_backoff
+        last_stats_t = time.monotonic()
+        while not self._stopSignal:
+            if not self._connected:
+                try:
+                    self._connected = bool(self._connect())
+                except Exception as e:
+                    logger.debug("{}: connect failed: {}".format(self._name, e))
+                    self._connected = False
+                if self._connected:
+                    logger.info("{}: connected".format(self._name))
+                    self.reconnects += 1
+                    backoff = self._min_backoff
+                else:
+                    self._wait(backoff)
+                    backoff = min(self._max_backoff, backoff * 2)
+                    continue
+            frame, frame_t = self._take(timeout=0.5)
+            if frame is not None:
+                try:
+                    ok = self._send(frame) is not False
+                except OSError as e:
+                    logger.debug("{}: send failed: {}".format(self._name, e))
+                    ok = False
+                except Exception as e:
+                    # Keep the thread alive, e.g. for frames that cannot be encoded
+                    logger.error("{}: error sending frame: {}".format(self._name, e))
+                    ok = False
+                if ok:
+                    latency = time.monotonic() - frame_t
+                    self.sent += 1
+                    self.latency_avg += 0.1 * (latency - self.latency_avg)
+                    self.latency_max = max(self.latency_max, latency)
+                    backoff = self._min_backoff
+                else:
+                    self.failed += 1
+                    self._onSendFailed(backoff)
+                    backoff = min(self._max_backoff, backoff * 2)
+            now = time.monotonic()
+            if now - last_stats_t > self._stats_interval:
+                last_stats_t = now
+                self._logStats()
+
+    def _onSendFailed(self, backoff):
+        logger.warning("{}: sending failed, retrying in {:.1f}s".format(self._name, backoff))
+        if self._disconnect is not None:
+            try:
+                self._disconnect()
+            except Exception as e:
+                logger.debug("{}: disconnect failed: {}".format(self._name, e))
+        if self._connect is not None:
+            self._connected = False
+        self._wait(backoff)
+
+    def _logStats(self):
+        stats = self.getStats()
+        message = "{}: sent {sent}, dropped {dropped}, failed {failed}, latency avg {avg:.1f} ms max {max:.1f} ms".format(
+            self._name,
+            avg=stats['latency_avg'] * 1000,
+            max=stats['latency_max'] * 1000,
+            **stats)
+        if stats['dropped'] > 0 or stats['failed'] > 0:
+            logger.info(message)
+        else:
+            logger.debug(message)
+        with self._cond:
+            self._resetStats()
@@ -1,4 +1,4 @@
-from audioled import project, configs, devices, audio
+from audioled import project, devices, audio
 import uuid
 import jsonpickle
 import json
@@ -7,6 +7,7 @@ import hashlib
 import io
 import multiprocessing
 import ctypes
+from collections import OrderedDict
 
 from audioled.devices import MultiOutputWrapper
 
@@ -43,9 +44,20 @@ restriced_values = [
 ]
 
 allowed_devices = [
-    'FadeCandy', 'RaspberryPi'
+    'FadeCandy', 'RaspberryPi', 'DMXOutput'
 ]
 
+# Device config keys for DMXOutput and the corresponding constructor arguments
+DMX_CONFIG_ARGS = OrderedDict([
+    ('device.dmx.protocol', ('protocol', str)),
+    ('device.dmx.host', ('host', str)),
+    ('device.dmx.port', ('port', int)),
+    ('device.dmx.start_universe', ('start_universe', int)),
+    ('device.dmx.channel_order', ('channel_order', str)),
+    ('device.dmx.sync', ('sync', bool)),
+    ('device.dmx.sync_universe', ('sync_universe', int)),
+])
+
 
 class ServerConfiguration:
     def __init__(self):
@@ -198,6 +210,8 @@ class ServerConfiguration:
         Initializes a new project
         Returns project
         """
+        # Default graphs pull in all effect modules, only import them when needed
+        from audioled import configs
         # Initialize default project
         proj = project.Project("Default project", "This is the default project.", self._createOrReuseOutputDevice())
         # Initialize filtergraph
@@ -336,7 +350,18 @@ class ServerConfiguration:
                 self.setConfigurationValue(CONFIG_ACTIVE_DEVICE_CONFIGURATION, deviceConfigName)
             return self.createOutputDeviceFromConfig(deviceConfig, deviceConfigs)
 
-    def createSingleDevice(self, deviceName, numPixels, numRows, candyServer=None, panelMapping=None, raspberryGpio=None):
+    def createSingleDevice(self,
+                           deviceName,
+                           numPixels,
+                           numRows,
+                           candyServer=None,
+                           panelMapping=None,
+                           raspberryGpio=None,
+                           candyChannels=None,
+                           dmxArgs=None,
+                           recordFile=None,
+                           recordCapacity=None,
+                           latency=None):
         # Single device legacy implementation, TODO: Deprecate or adjust
         logger.info("Creating device: {}".format(deviceName))
         if deviceName == devices.RaspberryPi.__name__:
@@ -345,22 +370,37 @@ class ServerConfiguration:
             else:
                 device = devices.RaspberryPi(numPixels, numRows, pin=raspberryGpio)
         elif deviceName == devices.FadeCandy.__name__:
-            device = devices.FadeCandy(numPixels, numRows, candyServer)
+            device = devices.FadeCandy(numPixels, numRows, candyServer, channels=candyChannels)
+        elif deviceName == devices.DMXOutput.__name__:
+            device = devices.DMXOutput(numPixels, numRows, **(dmxArgs or {}))
         else:
             logger.info("Unknown device: {}".format(deviceName))
             return None
+        if latency is not None:
+            device.setLatency(latency)
+
+        if recordFile:
+            if recordCapacity is None:
+                device = devices.RecordingOutput(device, recordFile)
+            else:
+                device = devices.RecordingOutput(device, recordFile, capacity=recordCapacity)
+            logger.info("Recording output of {} to {}".format(deviceName, recordFile))
 
         if panelMapping and panelMapping:
             mappingFile = panelMapping
             if os.path.exists(mappingFile):
                 with open(mappingFile, "r", encoding='utf-8') as f:
                     mapping = json.loads(f.read())
-                    device = devices.PanelWrapper(device, mapping)
+                    device = devices.PanelWrapper(device, mapping, cacheDir=self.getPanelMappingCacheDir())
                     logger.info("Active pixel mapping on real device: {}".format(mappingFile))
             else:
                 raise FileNotFoundError("Mapping file {} does not exist.".format(mappingFile))
         return device
 
+    def getPanelMappingCacheDir(self):
+        """Returns the directory for compiled panel mappings, None if not cached on disk"""
+        return None
+
     def createVirtualOutput(self, num_pixels, num_rows, real_device, shared_array, shared_lock, start_index, panelMapping):
         device = devices.VirtualOutput(num_pixels=num_pixels,
                                        num_rows=num_rows,
@@ -373,7 +413,7 @@ class ServerConfiguration:
             if os.path.exists(mappingFile):
                 with open(mappingFile, "r", encoding='utf-8') as f:
                     mapping = json.loads(f.read())
-                    device = devices.PanelWrapper(device, mapping)
+                    device = devices.PanelWrapper(device, mapping, cacheDir=self.getPanelMappingCacheDir())
                     logger.info("Active pixel mapping on virtual device: {}".format(mappingFile))
             else:
                 raise FileNotFoundError("Mapping file {} does not exist.".format(mappingFile))
@@ -394,9 +434,21 @@ class ServerConfiguration:
             {
                 "device": "FadeCandy",
                 "device.candy.server": "raspberrypi.local:7894",
+                "device.candy.channels": [64, 64, 64, 8],
+                "device.latency": 12.5,
                 "device.panel.mapping": "",
                 "device.num_pixels": 200,
                 "device.num_rows": 1
+            },
+            {
+                "device": "DMXOutput",
+                "device.dmx.protocol": "e131",
+                "device.dmx.host": "",
+                "device.dmx.start_universe": 1,
+                "device.dmx.sync": true,
+                "device.panel.mapping": "",
+                "device.num_pixels": 1000,
+                "device.num_rows": 1
             }
         ]
 
@@ -420,6 +472,14 @@ class ServerConfiguration:
             }
         ]
         where fullConfig must contain a device called 'oneStrip'
+
+        "device.latency" is the calibrated latency of the device in milliseconds,
+        frames on devices with lower latency are held back to light up all devices at the same time.
+
+        "device.record.file" records every frame shown on the device to the given file, see RecordingOutput.
+        The file is overwritten when the server starts. "device.record.capacity" is the number of frames kept
+        (default 3000), older frames are overwritten.
+        Recordings ending with .rec can be uploaded as project asset and played back with a ReplayInput.
         """
         outputDevices = []
         multiDevices = {}
@@ -436,6 +496,20 @@ class ServerConfiguration:
             candyServer = None
             if 'device.candy.server' in entry:
                 candyServer = entry['device.candy.server']
+            candyChannels = None
+            if 'device.candy.channels' in entry:
+                candyChannels = [int(c) for c in entry['device.candy.channels']]
+            recordFile = entry.get('device.record.file')
+            recordCapacity = None
+            if entry.get('device.record.capacity') is not None:
+                recordCapacity = int(entry['device.record.capacity'])
+            latency = None
+            if entry.get('device.latency') not in [None, '']:
+                latency = float(entry['device.latency']) / 1000.
+            dmxArgs = {}
+            for key, (arg, type_) in DMX_CONFIG_ARGS.items():
+                if entry.get(key) not in [None, '']:
+                    dmxArgs[arg] = type_(entry[key])
             raspberryGpio = None
             if 'device.raspberrypi.gpio' in entry:
                 raspberryGpio = entry['device.raspberrypi.gpio']
@@ -470,7 +544,17 @@ class ServerConfiguration:
                                                   start_index=start_index,
                                                   panelMapping=panelMapping)
             else:
-                device = self.createSingleDevice(deviceName, pixels, rows, candyServer=candyServer, panelMapping=panelMapping, raspberryGpio=raspberryGpio)
+                device = self.createSingleDevice(deviceName,
+                                                 pixels,
+                                                 rows,
+                                                 candyServer=candyServer,
+                                                 panelMapping=panelMapping,
+                                                 raspberryGpio=raspberryGpio,
+                                                 candyChannels=candyChannels,
+                                                 dmxArgs=dmxArgs,
+                                                 recordFile=recordFile,
+                                                 recordCapacity=recordCapacity,
+                                                 latency=latency)
             outputDevices.append(device)
         return MultiOutputWrapper(outputDevices)
 
@@ -570,6 +654,8 @@ class ServerConfiguration:
             mimetype = None
             if filename.endswith('.gif'):
                 mimetype = 'image/gif'
+            elif filename.endswith('.rec'):
+                mimetype = 'application/octet-stream'
             with open(location, 'rb') as b:
                 return [io.BytesIO(b.read()), filename, mimetype]
         logger.info("Cannot find project asset {}".format(location))
@@ -601,6 +687,11 @@ class PersistentConfiguration(ServerConfiguration):
     def _store(self):
         self.need_write = True
 
+    def getPanelMappingCacheDir(self):
+        if self.no_store:
+            return None
+        return os.path.join(self.storageLocation, 'panel_mappings')
+
     def deleteProject(self, uid):
         """Overrides deleteProject and deletes the corresponding project file from disk
         """
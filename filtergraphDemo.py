@@ -6,7 +6,7 @@ from timeit import default_timer as timer
 
 import jsonpickle
 
-from audioled import configs, devices, filtergraph, audio, runtimeconfiguration, serverconfiguration
+from audioled import configs, devices, filtergraph, audio, audiosource, runtimeconfiguration, serverconfiguration
 
 num_pixels = 300
 device = None
@@ -117,13 +117,18 @@ if args.audio_device_index is not None:
 # select config to show
 config = args.config
 
-print("The following audio devices are available:")
-audio.print_audio_devices()
-
-if args.audio_device_index is not None:
-    globalAudio = audio.GlobalAudio(args.audio_device_index)
+if args.audio_source is not None:
+    globalAudio = audio.GlobalAudio(
+        source=audiosource.createAudioSource(args.audio_source, realtime=not args.audio_no_realtime),
+        block_size=args.audio_block_size)
 else:
-    globalAudio = audio.GlobalAudio()
+    print("The following audio devices are available:")
+    audio.print_audio_devices()
+
+    if args.audio_device_index is not None:
+        globalAudio = audio.GlobalAudio(args.audio_device_index, block_size=args.audio_block_size)
+    else:
+        globalAudio = audio.GlobalAudio(block_size=args.audio_block_size)
 
 
 def createFilterGraph(config, num_pixels):
@@ -225,6 +230,7 @@ while True:
         config_idx = config_idx + 1
         last_switch_time = current_time
 
+    audio.GlobalAudio.pull()
     cur_graph.update(dt)
     cur_graph.process()
     totalTiming.update(timer() - current_time)
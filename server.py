@@ -1,8 +1,8 @@
 #!flask/bin/python
 import asyncio
 import colorsys
+import hashlib
 import importlib
-import inspect
 import json
 import os.path
 import sys
@@ -11,7 +11,7 @@ import time
 import psutil
 import multiprocessing
 import traceback
-from timeit import default_timer as timer
+import uuid
 import logging
 import mido
 import signal
@@ -19,13 +19,17 @@ from functools import wraps
 
 import jsonpickle
 import numpy as np
-from flask import Flask, abort, jsonify, request, send_from_directory, redirect, send_file
+from flask import Flask, abort, jsonify, request, send_from_directory, redirect, send_file, make_response
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers import interval
 from werkzeug.serving import is_running_from_reloader
 
-from audioled import audio, effects, filtergraph, serverconfiguration, runtimeconfiguration, modulation, project, version
-from audioled_controller import midi_full, grpc_server
+from audioled import audio, audiosource, filtergraph, serverconfiguration, runtimeconfiguration, project, registry, version
+from audioled.frameclock import FrameClock
+from audioled.preview import PreviewServer
+
+# Filtergraph versions restart with every server start, ETags carry this id so cached versions of a previous run never match
+BOOT_ID = uuid.uuid4().hex
 
 # configure logging here
 orig_factory = logging.getLogRecordFactory()
@@ -84,33 +88,23 @@ for key, value in levelPerModule.items():
 logging.getLogger('apscheduler').setLevel("ERROR")
 logger = logging.getLogger(__name__)
 
-libnames = ['audioled_controller.bluetooth']
-for libname in libnames:
-    try:
-        lib = __import__(libname)
-    except Exception as e:
-        logger.error("Import for bluetooth failed. {}".format(e))
-        logger.debug("Error importing bluetooth", exc_info=1)
-    else:
-        globals()[libname] = lib
-
 proj = None  # type: project.Project
+effectRegistry = None  # type: registry.EffectRegistry
 default_values = {}
 record_timings = False
 serverconfig = None
 
-POOL_TIME = 0.0  # Seconds
+# Target frame rate of the LED thread
+target_fps = 100
 
 # lock to control access to variable
 dataLock = threading.Lock()
 # thread handler
-ledThread = threading.Thread()
+ledThread = None  # type: FrameClock
+previewServer = None  # type: PreviewServer
 midiThread = threading.Thread()
 stop_signal = False
 event_loop = None
-# timing
-current_time = None
-last_time = None
 # errors
 errors = []
 # count
@@ -239,14 +233,20 @@ def create_app():
 
             try:
                 app.logger.warning("Shutting down LED Thread")
-                ledThread.join(2)
-                if ledThread.is_alive():
-                    logger.warning("LED thread not joined. Terminating")
-                    ledThread.terminate()
+                if ledThread is not None:
+                    ledThread.stop(2)
                 app.logger.warning("Shutdown LED Thread complete")
             except Exception as e:
                 app.logger.error("Error shutting down LED thread: {}".format(e))
 
+            try:
+                if previewServer is not None:
+                    app.logger.warning("Shutting down preview server")
+                    previewServer.stop(2)
+                    app.logger.warning("Shutdown preview server complete")
+            except Exception as e:
+                app.logger.error("Error shutting down preview server: {}".format(e))
+
             try:
                 app.logger.warning("Stopping processing of current project")
                 proj.stopProcessing()
@@ -278,9 +278,62 @@ def create_app():
         os.kill(os.getpid(), signal.SIGTERM)
         sys.exit(1)
 
+    # Encoded responses by request path: path -> (etag, body, mimetype)
+    responseCache = {}
+    responseCacheLock = threading.Lock()
+    RESPONSE_CACHE_SIZE = 512
+
+    def cachedResponse(etag, encode, mimetype=None):
+        """Returns cached response body for the current request path as long as etag matches
+
+        Answers with 304 if the client already has the current version.
+
+        Arguments:
+            etag {str} -- Version of the resource
+            encode {function} -- Returns the encoded body, only called if no cached body for etag exists
+            mimetype {str} -- Mimetype of the response
+        """
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+        key = request.full_path
+        with responseCacheLock:
+            cached = responseCache.get(key)
+        if cached is None or cached[0] != etag:
+            cached = (etag, encode(), mimetype)
+            with responseCacheLock:
+                if len(responseCache) >= RESPONSE_CACHE_SIZE:
+                    responseCache.clear()
+                responseCache[key] = cached
+        response = make_response(cached[1])
+        if cached[2] is not None:
+            response.mimetype = cached[2]
+        response.set_etag(etag)
+        return response
+
+    def slotResponse(fg, encode, mimetype=None):
+        return cachedResponse("fg{}-{}".format(BOOT_ID, fg.getVersion()), encode, mimetype)
+
+    def catalogResponse(encode, mimetype=None):
+        """Returns response for effect catalog data, which doesn't change while the server is running"""
+        key = request.full_path
+        with responseCacheLock:
+            cached = responseCache.get(key)
+        if cached is not None:
+            etag = cached[0]
+        else:
+            body = encode()
+            etag = hashlib.md5(body.encode('utf-8')).hexdigest()
+            with responseCacheLock:
+                responseCache[key] = (etag, body, mimetype)
+        return cachedResponse(etag, encode, mimetype)
+
     @app.after_request
     def add_header(response):
-        response.cache_control.max_age = 0
+        if response.get_etag()[0] is not None:
+            # Clients have to revalidate, which is cheap thanks to the ETag
+            response.cache_control.no_cache = True
         return response
 
     @app.route('/')
@@ -296,8 +349,7 @@ def create_app():
     def slot_slotId_nodes_get(slotId):
         global proj
         fg = proj.previewSlot(slotId)  # type: filtergraph.FilterGraph
-        nodes = [node for node in fg.getNodes()]
-        return jsonpickle.encode(nodes)
+        return slotResponse(fg, lambda: jsonpickle.encode([node for node in fg.getNodes()]))
 
     @app.route('/slot/<int:slotId>/node/<nodeUid>', methods=['GET'])
     # @lock_preview
@@ -401,8 +453,7 @@ def create_app():
     def slot_slotId_connections_get(slotId):
         global proj
         fg = proj.previewSlot(slotId)  # type: filtergraph.FilterGraph
-        connections = [con for con in fg.getConnections()]
-        return jsonpickle.encode(connections)
+        return slotResponse(fg, lambda: jsonpickle.encode([con for con in fg.getConnections()]))
 
     @app.route('/slot/<int:slotId>/connection', methods=['POST'])
     @lock_preview
@@ -438,8 +489,7 @@ def create_app():
     def slot_slotId_modulationSources_get(slotId):
         global proj
         fg = proj.previewSlot(slotId)  # type: filtergraph.FilterGraph
-        mods = [mod for mod in fg.getModulationSources()]
-        return jsonpickle.encode(mods)
+        return slotResponse(fg, lambda: jsonpickle.encode([mod for mod in fg.getModulationSources()]))
 
     @app.route('/slot/<int:slotId>/modulationSource/<modulationSourceUid>', methods=['DELETE'])
     @lock_preview
@@ -485,15 +535,18 @@ def create_app():
         fg = proj.previewSlot(slotId)  # type: filtergraph.FilterGraph
         modSourceId = request.args.get('modulationSourceUid', None)
         modDestinationId = request.args.get('modulationDestinationUid', None)
-        mods = [mod for mod in fg.getModulations()]
-        if modSourceId is not None:
-            # for specific modulation source
-            mods = [mod for mod in mods if mod.modulationSource.uid == modSourceId]
-        if modDestinationId is not None:
-            # for specific modulation destination".format(modDestinationId))
-            mods = [mod for mod in mods if mod.targetNode.uid == modDestinationId]
-        encVal = jsonpickle.encode(mods)
-        return encVal
+
+        def encode():
+            mods = [mod for mod in fg.getModulations()]
+            if modSourceId is not None:
+                # for specific modulation source
+                mods = [mod for mod in mods if mod.modulationSource.uid == modSourceId]
+            if modDestinationId is not None:
+                # for specific modulation destination".format(modDestinationId))
+                mods = [mod for mod in mods if mod.targetNode.uid == modDestinationId]
+            return jsonpickle.encode(mods)
+
+        return slotResponse(fg, encode)
 
     @app.route('/slot/<int:slotId>/modulation', methods=['POST'])
     @lock_preview
@@ -551,8 +604,89 @@ def create_app():
     def slot_slotId_configuration_get(slotId):
         global proj
         fg = proj.previewSlot(slotId)  # type: filtergraph.FilterGraph
-        config = jsonpickle.encode(fg)
-        return config
+        return slotResponse(fg, lambda: jsonpickle.encode(fg))
+
+    @app.route('/slot/<int:slotId>/batch', methods=['POST'])
+    def slot_slotId_batch_post(slotId):
+        """Applies a list of operations to the slot as one transaction
+
+        Each operation is an object with the key 'op' and the arguments of the corresponding single endpoint:
+            addNode: effect, parameters
+            updateNode: uid, parameters
+            removeNode: uid
+            addConnection: from_node_uid, from_node_channel, to_node_uid, to_node_channel
+            removeConnection: uid
+            addModulation: modulationsource_uid, target_uid
+            updateModulation: uid, parameters
+            removeModulation: uid
+            updateModulationSource: uid, parameters
+            removeModulationSource: uid
+        Add operations may specify a 'ref', which can be used instead of the uid in later operations of the batch.
+        If one operation fails, none of the operations is applied.
+        Returns the list of created or updated objects, null for removals.
+        """
+        global proj
+        if not isinstance(request.json, list):
+            abort(400)
+        operations = request.json
+
+        def edit(fg):
+            refs = {}
+
+            def uid(key):
+                value = op[key]
+                return refs.get(value, value)
+
+            results = []
+            for op in operations:
+                opName = op.get('op')
+                result = None
+                if opName == 'addNode':
+                    try:
+                        module_name, class_name = getModuleAndClassName(op['effect'])
+                    except RuntimeError:
+                        abort(403)
+                    class_ = getattr(importlib.import_module(module_name), class_name)
+                    instance = class_(**op.get('parameters', {}))
+                    if module_name == 'audioled.modulation':
+                        result = fg.addModulationSource(instance)
+                    else:
+                        result = fg.addEffectNode(instance)
+                elif opName == 'updateNode':
+                    result = fg.updateNodeParameter(uid('uid'), op['parameters'])
+                elif opName == 'removeNode':
+                    fg.removeEffectNode(uid('uid'))
+                elif opName == 'addConnection':
+                    result = fg.addNodeConnection(uid('from_node_uid'), int(op['from_node_channel']), uid('to_node_uid'),
+                                                  int(op['to_node_channel']))
+                elif opName == 'removeConnection':
+                    fg.removeConnection(uid('uid'))
+                elif opName == 'addModulation':
+                    result = fg.addModulation(uid('modulationsource_uid'), uid('target_uid'))
+                elif opName == 'updateModulation':
+                    result = fg.updateModulationParameter(uid('uid'), op['parameters'])
+                elif opName == 'removeModulation':
+                    fg.removeModulation(uid('uid'))
+                elif opName == 'updateModulationSource':
+                    result = fg.updateModulationSourceParameter(uid('uid'), op['parameters'])
+                elif opName == 'removeModulationSource':
+                    fg.removeModulationSource(uid('uid'))
+                else:
+                    abort(400, "Unknown operation {}".format(opName))
+                if result is not None and 'ref' in op:
+                    refs[op['ref']] = result.uid
+                results.append(result)
+            return results
+
+        # Lock explicitly instead of lock_preview, so errors are reported to the client
+        with preview_lock:
+            try:
+                results = proj.editSlotBatch(slotId, edit)
+            except StopIteration:
+                abort(404, "Not found")
+            except (KeyError, TypeError, ValueError, RuntimeError) as e:
+                abort(400, "{}".format(e))
+        return jsonpickle.encode(results)
 
     @app.route('/slot/<int:slotId>/configuration', methods=['POST'])
     def slot_slotId_configuration_post(slotId):
@@ -570,68 +704,51 @@ def create_app():
     def effects_get():
         """Returns all effects and modulators
         """
-        childclasses = []
-        childclasses.extend(inheritors(effects.Effect))
-        childclasses.extend(inheritors(modulation.ModulationSource))
-        return jsonpickle.encode([child for child in childclasses])
+        return catalogResponse(lambda: json.dumps([{"py/type": name} for name in effectRegistry.getClassNames()]))
 
     @app.route('/effect/<full_class_name>/description', methods=['GET'])
     def effect_effectname_description_get(full_class_name):
-        module_name, class_name = None, None
-        try:
-            module_name, class_name = getModuleAndClassName(full_class_name)
-        except RuntimeError:
-            abort(403)
-        class_ = getattr(importlib.import_module(module_name), class_name)
-        return class_.getEffectDescription()
+        entry = getRegistryEntry(full_class_name)
+        return catalogResponse(lambda: entry['description'])
 
     @app.route('/effect/<full_class_name>/args', methods=['GET'])
     def effect_effectname_args_get(full_class_name):
-        module_name, class_name = None, None
-        try:
-            module_name, class_name = getModuleAndClassName(full_class_name)
-        except RuntimeError:
-            abort(403)
-        class_ = getattr(importlib.import_module(module_name), class_name)
-        argspec = inspect.getfullargspec(class_.__init__)
-        if argspec.defaults is not None:
-            argsWithDefaults = dict(zip(argspec.args[-len(argspec.defaults):], argspec.defaults))
-        else:
-            argsWithDefaults = dict()
-        result = argsWithDefaults.copy()
-        if argspec.defaults is not None:
-            result.update({key: None for key in argspec.args[1:len(argspec.args) - len(argspec.defaults)]})  # 1 removes self
+        entry = getRegistryEntry(full_class_name)
 
-        result.update({key: default_values[key] for key in default_values if key in result})
-        app.logger.debug(result)
-        return jsonify(result)
+        def encode():
+            result = dict(entry['args'])
+            result.update({key: default_values[key] for key in default_values if key in result})
+            app.logger.debug(result)
+            return json.dumps(result)
+
+        return catalogResponse(encode, mimetype='application/json')
 
     @app.route('/effect/<full_class_name>/parameter', methods=['GET'])
     def effect_effectname_parameters_get(full_class_name):
-        module_name, class_name = None, None
-        try:
-            module_name, class_name = getModuleAndClassName(full_class_name)
-        except RuntimeError:
-            abort(403)
-        class_ = getattr(importlib.import_module(module_name), class_name)
-        return json.dumps(class_.getParameterDefinition())
+        entry = getRegistryEntry(full_class_name)
+        if entry['dynamicParameters']:
+            class_ = getattr(importlib.import_module(entry['module']), entry['name'])
+            return json.dumps(class_.getParameterDefinition())
+        return catalogResponse(lambda: json.dumps(entry['parameters']))
 
     @app.route('/effect/<full_class_name>/parameterHelp', methods=['GET'])
     def effect_effectname_parameterhelp_get(full_class_name):
-        module_name, class_name = None, None
+        entry = getRegistryEntry(full_class_name)
+        return catalogResponse(lambda: json.dumps(entry['parameterHelp']))
+
+    def getRegistryEntry(full_class_name):
         try:
-            module_name, class_name = getModuleAndClassName(full_class_name)
+            getModuleAndClassName(full_class_name)
         except RuntimeError:
             abort(403)
-        class_ = getattr(importlib.import_module(module_name), class_name)
-        return json.dumps(class_.getParameterHelp())
+        entry = effectRegistry.get(full_class_name)
+        if entry is None:
+            abort(404, "Effect not found")
+        return entry
 
     def getModuleAndClassName(full_class_name):
         module_name, class_name = full_class_name.rsplit(".", 1)
-        if (module_name != "audioled.audio" and module_name != "audioled.effects" and module_name != "audioled.devices"
-                and module_name != "audioled.colors" and module_name != "audioled.audioreactive"
-                and module_name != "audioled.generative" and module_name != "audioled.input"
-                and module_name != "audioled.panelize" and module_name != "audioled.modulation"):
+        if module_name not in registry.EFFECT_MODULES:
             raise RuntimeError("Not allowed")
         return module_name, class_name
 
@@ -642,17 +759,6 @@ def create_app():
         else:
             return module + '.' + o.__class__.__name__
 
-    def inheritors(klass):
-        subclasses = set()
-        work = [klass]
-        while work:
-            parent = work.pop()
-            for child in parent.__subclasses__():
-                if child not in subclasses:
-                    subclasses.add(child)
-                    work.append(child)
-        return subclasses
-
     @app.route('/errors', methods=['GET'])
     def errors_get():
         result = {}
@@ -725,7 +831,7 @@ def create_app():
         if file.filename == '':
             app.logger.warn("File has no filename")
             abort(400)
-        if file and '.' in file.filename and file.filename.rsplit('.', 1)[1].lower() in ['gif']:
+        if file and '.' in file.filename and file.filename.rsplit('.', 1)[1].lower() in ['gif', 'rec']:
             app.logger.info("Adding asset to proj {}".format(proj.id))
             filename = serverconfig.addProjectAsset(proj.id, file)
             return jsonify({'filename': filename})
@@ -834,24 +940,16 @@ def create_app():
 
         abort(404)
 
-    def processLED():
+    def processLED(dt):
         global proj
-        global ledThread
-        global stop_signal
         global event_loop
-        global last_time
-        global current_time
         global errors
         global count
         global record_timings
-        dt = 0
         if stop_signal:
             return
         try:
             with dataLock:
-                last_time = current_time
-                current_time = timer()
-                dt = current_time - last_time
                 count = count + 1
                 if event_loop is None:
                     event_loop = asyncio.new_event_loop()
@@ -872,31 +970,28 @@ def create_app():
             app.logger.error("Unknown error: {}".format(e))
             traceback.print_tb(e.__traceback__)
         finally:
-            # Set the next thread to happen
-            real_process_time = timer() - current_time
-            timeToWait = max(POOL_TIME, 0.01 - real_process_time)
             if count == 100:
                 if record_timings:
                     # proj.previewSlot(proj.activeSlotId).printProcessTimings() # TODO:
                     # proj.previewSlot(proj.activeSlotId).printUpdateTimings() # TODO:
-                    app.logger.info("Process time: {}".format(real_process_time))
-                    app.logger.info("Waiting {}".format(timeToWait))
+                    app.logger.info("Frame timing: {}".format(ledThread.getStats()))
                 count = 0
-            if not stop_signal:
-                ledThread = threading.Timer(timeToWait, processLED, ())
-                ledThread.start()
 
     def startLEDThread():
-        # Do initialisation stuff here
         global ledThread
-        global last_time
-        global current_time
-        # Create your thread
-        current_time = timer()
-        ledThread = threading.Timer(POOL_TIME, processLED, ())
-        app.logger.info('starting LED thread')
+        ledThread = FrameClock(processLED, fps=target_fps)
+        app.logger.info('starting LED thread with {} fps'.format(target_fps))
         ledThread.start()
-    
+
+    @app.route('/timing', methods=['GET'])
+    def timing_get():
+        stats = {}
+        if ledThread is not None:
+            stats = ledThread.getStats()
+        if proj is not None:
+            stats.update(proj.getFrameStats())
+        return jsonify(stats)
+
     # Initiate
     if is_running_from_reloader() is False:
         startLEDThread()
@@ -907,6 +1002,34 @@ def create_app():
     return app
 
 
+def previewFrame(stream):
+    if proj is None:
+        return None
+    if stream[0] == 'output':
+        return proj.getOutputPreview(stream[1])
+    return proj.getNodePreview(*stream[1:])
+
+
+def previewSubscribe(stream):
+    if proj is not None and stream[0] == 'node':
+        proj.setNodePreview(*stream[1:])
+
+
+def previewUnsubscribe(stream):
+    if proj is None or stream[0] != 'node':
+        return
+    streams = previewServer.getStreams() if previewServer is not None else set()
+    if stream in streams:
+        # Other clients still watch this node
+        return
+    nodeStreams = [s for s in streams if s[0] == 'node']
+    if nodeStreams:
+        proj.setNodePreview(*nodeStreams[0][1:])
+    else:
+        # Stop copying node output in the workers
+        proj.setNodePreview(stream[1], None)
+
+
 def strandTest(dev, num_pixels):
     pixels = np.zeros(int(num_pixels / 2)) * np.array([[255.0], [255.0], [255.0]])
     t = 0.0
@@ -968,11 +1091,12 @@ if __name__ == '__main__':
     )
     runtimeconfiguration.addServerRuntimeArguments(parser)
 
-    # print audio information
-    logger.info("The following audio devices are available:")
-    audio.print_audio_devices()
-
     args = parser.parse_args()
+
+    if args.audio_source is None:
+        # print audio information
+        logger.info("The following audio devices are available:")
+        audio.print_audio_devices()
     config_location = None
     if args.config_location is None:
         config_location = os.path.join(os.path.expanduser("~"), '.ledserver')
@@ -1015,6 +1139,9 @@ if __name__ == '__main__':
     if args.process_timing:
         record_timings = True
 
+    if args.fps is not None:
+        target_fps = args.fps
+
     # Adjust from configuration
 
     # Audio
@@ -1022,16 +1149,23 @@ if __name__ == '__main__':
     if serverconfig.getConfiguration(serverconfiguration.CONFIG_AUDIO_MAX_CHANNELS) is not None:
         maxChannels = serverconfig.getConfiguration(serverconfiguration.CONFIG_AUDIO_MAX_CHANNELS)
 
-    if serverconfig.getConfiguration(serverconfiguration.CONFIG_AUDIO_DEVICE_INDEX) is not None:
+    if args.audio_source is not None:
+        globalAudio = audio.GlobalAudio(source=audiosource.createAudioSource(
+            args.audio_source, num_channels=maxChannels, realtime=not args.audio_no_realtime),
+                                        chunk_rate=target_fps,
+                                        block_size=args.audio_block_size)
+    elif serverconfig.getConfiguration(serverconfiguration.CONFIG_AUDIO_DEVICE_INDEX) is not None:
         logger.info("Overriding Audio device with device index {}".format(
             serverconfig.getConfiguration(serverconfiguration.CONFIG_AUDIO_DEVICE_INDEX)))
         audio.AudioInput.overrideDeviceIndex = serverconfig.getConfiguration(serverconfiguration.CONFIG_AUDIO_DEVICE_INDEX)
         # Initialize global audio
         globalAudio = audio.GlobalAudio(
             serverconfig.getConfiguration(serverconfiguration.CONFIG_AUDIO_DEVICE_INDEX),
-            num_channels=maxChannels)
+            chunk_rate=target_fps,
+            num_channels=maxChannels,
+            block_size=args.audio_block_size)
     else:
-        globalAudio = audio.GlobalAudio(num_channels=maxChannels)
+        globalAudio = audio.GlobalAudio(chunk_rate=target_fps, num_channels=maxChannels, block_size=args.audio_block_size)
     
     if serverconfig.getConfiguration(serverconfiguration.CONFIG_AUDIO_AUTOADJUST_ENABLED) is not None:
         audio.GlobalAudio.global_autogain_enabled = serverconfig.getConfiguration(
@@ -1047,6 +1181,12 @@ if __name__ == '__main__':
     if args.strand:
         strandTest(serverconfig.createOutputDevice(), serverconfig.getConfiguration(serverconfiguration.CONFIG_NUM_PIXELS))
 
+    # Effect registry, cached next to the configuration
+    if args.no_store:
+        effectRegistry = registry.EffectRegistry()
+    else:
+        effectRegistry = registry.EffectRegistry(os.path.join(config_location, 'effect_registry.json'))
+
     # Initialize project
     proj = serverconfig.getActiveProjectOrDefault()
     proj.activate()
@@ -1059,7 +1199,7 @@ if __name__ == '__main__':
         midiAdvertiseName = serverconfig.getConfiguration(serverconfiguration.CONFIG_ADVERTISE_BLUETOOTH_NAME)
         logger.info("Starting Bluetooth advertise as '{}'".format(midiAdvertiseName))
         try:
-            from audioled_controller import bluetooth
+            from audioled_controller import bluetooth, midi_full
             fullMidiController = midi_full.MidiProjectController(callback=handleMidiOut)
             midiController.append(fullMidiController)
             midiBluetooth = bluetooth.MidiBluetoothService(
@@ -1078,6 +1218,7 @@ if __name__ == '__main__':
         outPortName = serverconfig.getConfiguration(serverconfiguration.CONFIG_MIDI_CTRL_PORT_OUT)
         logger.info("Starting Virtual Port Controller on {} and {}".format(inPortName, outPortName))
         if inPortName:
+            from audioled_controller import midi_full
             fullMidiController = midi_full.MidiProjectController(callback=handleMidiOut)
             midiController.append(fullMidiController)
             midiCtrlPortIn = mido.open_input(
@@ -1094,6 +1235,7 @@ if __name__ == '__main__':
         logger.info("Virtual Port Controller is disabled")
 
     if serverconfig.getConfiguration(serverconfiguration.CONFIG_GRPC_ENABLED):
+        from audioled_controller import grpc_server, midi_full
         fullMidiController = midi_full.MidiProjectController(callback=handleMidiOut)
         logger.info("Creating GRPC server for {}".format(fullMidiController))
         midiController.append(fullMidiController)
@@ -1104,6 +1246,15 @@ if __name__ == '__main__':
     else:
         logger.info("GRPC server is disabled")
 
+    if args.preview_port is not None:
+        previewHost = "0.0.0.0" if serverconfig.getConfiguration(serverconfiguration.CONFIG_SERVER_EXPOSE) else "localhost"
+        previewServer = PreviewServer(previewHost,
+                                      args.preview_port,
+                                      previewFrame,
+                                      on_subscribe=previewSubscribe,
+                                      on_unsubscribe=previewUnsubscribe)
+        previewServer.start()
+
     if serverconfig.getConfiguration(serverconfiguration.CONFIG_SERVER_EXPOSE):
         app = create_app()
         app.run(debug=False, host="0.0.0.0", port=args.port)
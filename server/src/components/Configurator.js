@@ -95,7 +95,7 @@ class Configurator extends Component {
         </React.Fragment>
     }
 
-    handleGifUpload = async (event, parameterName) => {
+    handleAssetUpload = async (event, parameterName) => {
         await ProjectService.uploadProjectAsset(event).then( res => this.handleParameterChange(res['filename'], parameterName)).catch(err => {
             console.error("Error uploading asset:", err);
             this.props.enqueueSnackbar("Error uploading asset. Check console for details.", { variant: 'error' })
@@ -109,7 +109,7 @@ class Configurator extends Component {
             </Grid>
             <Grid item sm={2} xs={2}>
             <Typography>
-            <input type="file" id="gif-input" onChange={(e) => this.handleGifUpload(e, parameterName)} style={{ display: 'none' }} />
+            <input type="file" id="gif-input" onChange={(e) => this.handleAssetUpload(e, parameterName)} style={{ display: 'none' }} />
                   <label htmlFor="gif-input">
                   
                   <Button component="span" variant="contained" size="small">
@@ -122,6 +122,27 @@ class Configurator extends Component {
         </React.Fragment>
     }
 
+    domCreateParameterRec = (parameters, values, parameterName) => {
+        let inputId = "rec-input-" + parameterName;
+        return <React.Fragment>
+            <Grid item sm={7} xs={10}>
+            <Typography noWrap>
+                {values[parameterName] !== null ? values[parameterName] : "No recording"}
+            </Typography>
+            </Grid>
+            <Grid item sm={2} xs={2}>
+            <Typography>
+            <input type="file" accept=".rec" id={inputId} onChange={(e) => this.handleAssetUpload(e, parameterName)} style={{ display: 'none' }} />
+                  <label htmlFor={inputId}>
+                  <Button component="span" variant="contained" size="small">
+                  Upload
+                    </Button>
+                  </label>
+            </Typography>
+            </Grid>
+        </React.Fragment>
+    }
+
     domCreateConfigList = (parameters, values, parameterHelp) => {
         if (parameters) {
             return Object.keys(parameters).map((parameterName, index) => {
@@ -131,6 +152,9 @@ class Configurator extends Component {
                         if (parameters[parameterName].length >= 2 && parameters[parameterName][0] == 'gif') {
                             control = this.domCreateParameterGif(parameters, values, parameterName);
                         }
+                        else if (parameters[parameterName].length >= 2 && parameters[parameterName][0] == 'rec') {
+                            control = this.domCreateParameterRec(parameters, values, parameterName);
+                        }
                         else if (parameters[parameterName].length == 4 && !parameters[parameterName].some(isNaN)) {
                             // Array of numbers -> Slider
                             control = this.domCreateParameterSlider(parameters, values, parameterName);
@@ -0,0 +1,103 @@
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+
+import unittest
+from unittest import mock
+
+import numpy as np
+from scipy.signal import sosfilt
+
+from audioled import dsp
+from audioled.audio import AudioRing
+from audioled.effect import AudioBuffer
+
+FS = 44100
+CHUNK = 735
+
+
+def chunks(num_chunks):
+    rng = np.random.RandomState(0)
+    return [rng.uniform(-1, 1, CHUNK) for _ in range(num_chunks)]
+
+
+class Test_AudioAnalysis(unittest.TestCase):
+    def test_filtered_features_match_continuous_filter(self):
+        buffer = AudioBuffer(FS)
+        data = chunks(5)
+        sos, zi = dsp.design_sos(100, 1000, FS, 3)
+        filtered, _ = sosfilt(sos.copy(), np.concatenate(data), zi=zi * data[0][0])
+        for i, chunk in enumerate(data):
+            buffer.audio = chunk
+            y = filtered[i * CHUNK:(i + 1) * CHUNK]
+            analysis = buffer.getAnalysis()
+            self.assertAlmostEqual(analysis.peak(100, 1000), np.max(y))
+            self.assertAlmostEqual(analysis.rms(100, 1000), dsp.rms(y))
+            self.assertAlmostEqual(analysis.peak(), np.max(chunk))
+            self.assertIs(analysis.filtered(), chunk)
+
+    def test_features_are_computed_once_per_chunk(self):
+        buffer = AudioBuffer(FS)
+        with mock.patch('audioled.dsp.sosfilt', side_effect=sosfilt) as f:
+            for chunk in chunks(3):
+                buffer.audio = chunk
+                # Several effects requesting the same band
+                for _ in range(4):
+                    buffer.getAnalysis().peak(100, 1000)
+                    buffer.getAnalysis().rms(100, 1000)
+                buffer.getAnalysis().peak(20, 200)
+            self.assertEqual(f.call_count, 6)
+        with self.assertRaises(ValueError):
+            buffer.getAnalysis().filtered(100, 1000)[0] = 1.
+
+    def test_modulated_band_is_replaced(self):
+        buffer = AudioBuffer(FS)
+        owner, other = object(), object()
+        with mock.patch('audioled.dsp.sosfilt', side_effect=sosfilt) as f:
+            for i, chunk in enumerate(chunks(30)):
+                buffer.audio = chunk
+                buffer.getAnalysis().peak(100 + i, 1000, owner=owner)
+                buffer.getAnalysis().rms(20, 200, owner=other)
+                self.assertEqual(len(buffer.getAnalysis()._filterBank.getBands()), 2)
+            # Only the requested bands are filtered
+            self.assertEqual(f.call_count, 60)
+        # Modulated cutoffs without owner only keep the bands of the last chunk
+        buffer = AudioBuffer(FS)
+        for i, chunk in enumerate(chunks(30)):
+            buffer.audio = chunk
+            buffer.getAnalysis().peak(300 + i, 1000)
+            self.assertLessEqual(len(buffer.getAnalysis()._filterBank.getBands()), 2)
+        # Bands not requested in the last chunk are dropped
+        buffer.audio = chunks(1)[0]
+        buffer.audio = chunks(1)[0]
+        self.assertEqual(buffer.getAnalysis()._filterBank.getBands(), [])
+
+    def test_band_energies_match_sliding_window(self):
+        data = chunks(6)
+        buffer = AudioBuffer(FS)
+        history = np.zeros(4 * CHUNK)
+        for chunk in data:
+            buffer.audio = chunk
+            # Last 4 chunks, downsampled by 3 for fmax 6000, hanning windowed and padded to 1024
+            history = np.r_[history[CHUNK:], chunk]
+            y = history[::3] * np.hanning(980)
+            expected = dsp.warped_psd(np.r_[y, np.zeros(44)], 64, FS // 3, [261.0, 6000], 'bark')
+            bands = buffer.getAnalysis().bandEnergies(64, 261.0, 6000, 'bark', fmax=6000, n_overlaps=4)
+            np.testing.assert_allclose(bands, expected, rtol=1e-4, atol=1e-9)
+            # Shares the FFT with other bands
+            buffer.getAnalysis().bandEnergies(64, 32.7, 261.0, 'bark', fmax=6000, n_overlaps=4)
+
+    def test_window_is_read_from_history(self):
+        ring = AudioRing(2, 4 * CHUNK)
+        buffer = AudioBuffer(FS)
+        data = chunks(8)
+        for left, right in zip(data[::2], data[1::2]):
+            # Frames of varying length, the window spans the nominal frame length
+            frame = np.array([np.r_[left, right], -np.r_[left, right]])
+            ring.writeChannels(frame, 0.)
+            buffer.setHistory(ring, 1, gain=2., frame_length=CHUNK)
+            buffer.audio = 2. * frame[1]
+            y, fs = buffer.getAnalysis().windowed(6000, 2)
+            self.assertEqual(fs, FS // 3)
+            self.assertEqual(len(y), 512)
+            expected = -2. * np.r_[left, right][::3] * np.hanning(490)
+            np.testing.assert_allclose(y[:490], expected, rtol=1e-5, atol=1e-6)
+            np.testing.assert_array_equal(y[490:], 0.)
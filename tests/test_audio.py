@@ -0,0 +1,132 @@
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+
+import asyncio
+import time
+import unittest
+
+import numpy as np
+
+from audioled.audio import AudioInput, AudioRing, GlobalAudio
+
+
+def interleaved(chunk):
+    return np.ascontiguousarray(chunk.T, dtype=np.float32).tobytes()
+
+
+class Test_AudioRing(unittest.TestCase):
+    def test_latest_chunk_is_deinterleaved(self):
+        ring = AudioRing(2, 16)
+        chunk = np.array([np.arange(4), -np.arange(4)], dtype=np.float32)
+        ring.write(interleaved(chunk), 1.5)
+        latest = ring.getLatestChunk()
+        self.assertEqual(latest.dtype, np.float32)
+        np.testing.assert_array_equal(latest, chunk)
+        self.assertEqual(ring.getTimestamp(), 1.5)
+        self.assertIsNone(ring.getTimestamp(1))
+        with self.assertRaises(ValueError):
+            latest[0, 0] = 1.
+
+    def test_window_wraps_around(self):
+        ring = AudioRing(2, 10)
+        samples = np.array([np.arange(40), 100 + np.arange(40)], dtype=np.float32)
+        for i in range(0, 40, 6):
+            ring.write(interleaved(samples[:, i:i + 6]), float(i))
+            end = min(i + 6, 40)
+            np.testing.assert_array_equal(ring.getWindow(10)[:, 10 - min(end, 10):], samples[:, max(0, end - 10):end])
+            np.testing.assert_array_equal(ring.getLatestChunk(), samples[:, i:end])
+        self.assertEqual(ring.num_samples, 40)
+        self.assertEqual(ring.getTimestamp(2), 24.)
+        # Window is a view, no copy
+        self.assertTrue(np.shares_memory(ring.getWindow(10), ring._data))
+        with self.assertRaises(ValueError):
+            ring.getWindow(11)
+
+    def test_chunk_larger_than_capacity(self):
+        ring = AudioRing(1, 4)
+        ring.write(np.arange(6, dtype=np.float32).tobytes(), 0.)
+        np.testing.assert_array_equal(ring.getWindow(4), [[2, 3, 4, 5]])
+
+    def test_samples_since(self):
+        ring = AudioRing(1, 8)
+        ring.write(np.arange(3, dtype=np.float32).tobytes(), 0.)
+        window, position = ring.getSamplesSince(None)
+        np.testing.assert_array_equal(window, [[0, 1, 2]])
+        # Nothing new
+        window, position = ring.getSamplesSince(position)
+        self.assertEqual(window.shape, (1, 0))
+        # Several chunks arrived
+        ring.write(np.arange(3, 5, dtype=np.float32).tobytes(), 1.)
+        ring.write(np.arange(5, 9, dtype=np.float32).tobytes(), 2.)
+        window, position = ring.getSamplesSince(position)
+        np.testing.assert_array_equal(window, [[3, 4, 5, 6, 7, 8]])
+        # Samples older than capacity are lost
+        ring.write(np.arange(9, 19, dtype=np.float32).tobytes(), 3.)
+        window, position = ring.getSamplesSince(position)
+        np.testing.assert_array_equal(window, [np.arange(11, 19)])
+        self.assertEqual(position, ring.num_samples)
+        # Returned samples are a copy, later writes don't change them
+        self.assertFalse(np.shares_memory(window, ring._data))
+        ring.write(np.arange(19, 27, dtype=np.float32).tobytes(), 4.)
+        np.testing.assert_array_equal(window, [np.arange(11, 19)])
+
+    def test_samples_since_retries_during_write(self):
+        ring = AudioRing(1, 8)
+        ring.write(np.arange(4, dtype=np.float32).tobytes(), 0.)
+        copy = ring._copySamplesSince
+        calls = []
+
+        def concurrentWrite(position):
+            # Another thread writes while the first copy is taken
+            result = copy(position)
+            if not calls:
+                ring.write(np.arange(4, 8, dtype=np.float32).tobytes(), 1.)
+            calls.append(result)
+            return result
+
+        ring._copySamplesSince = concurrentWrite
+        window, position = ring.getSamplesSince(0)
+        self.assertEqual(len(calls), 2)
+        np.testing.assert_array_equal(window, [np.arange(8)])
+        self.assertEqual(position, 8)
+
+
+class Test_GlobalAudio(unittest.TestCase):
+    def test_receive_frames(self):
+        state = (GlobalAudio.frame_ring, GlobalAudio.sample_rate, GlobalAudio.chunk_rate, GlobalAudio.buffer)
+        try:
+            GlobalAudio.frame_ring = None
+            GlobalAudio.sample_rate = 100
+            GlobalAudio.chunk_rate = 10
+            audioInput = AudioInput(num_channels=2)
+            audioInput.setOutputBuffer([None, None])
+            audioInput.setInputBuffer([])
+            for frame in [np.ones((2, 10)), np.full((2, 15), 2.), np.zeros((2, 0))]:
+                GlobalAudio.receive(frame, 1.)
+                asyncio.get_event_loop().run_until_complete(audioInput.update(0.1))
+                audioInput.process()
+            # Frame without audio keeps the previous chunk
+            buffer = audioInput._outputBuffer[0]
+            np.testing.assert_array_equal(buffer.audio, np.full(15, 2.))
+            self.assertEqual(GlobalAudio.frame_ring.num_samples, 25)
+            # Windows span previous frames
+            y, fs = buffer.getAnalysis().windowed(50, 2)
+            self.assertEqual(fs, 100)
+            np.testing.assert_allclose(y[:20], np.r_[np.ones(5), np.full(15, 2.)] * np.hanning(20))
+        finally:
+            GlobalAudio.frame_ring, GlobalAudio.sample_rate, GlobalAudio.chunk_rate, GlobalAudio.buffer = state
+
+    def test_capture_time(self):
+        sample_rate = GlobalAudio.sample_rate
+        try:
+            GlobalAudio.sample_rate = 1000
+            now = time.monotonic()
+            # ADC time of the first sample from PortAudio
+            t = GlobalAudio._capture_time(100, {'input_buffer_adc_time': 10.0, 'current_time': 10.25})
+            self.assertAlmostEqual(t, now - 0.25, places=2)
+            # Without timing information the chunk is assumed to be complete right now
+            for time_info in [None, {'input_buffer_adc_time': 0., 'current_time': 0.}]:
+                t = GlobalAudio._capture_time(100, time_info)
+                self.assertAlmostEqual(t, now - 0.1, places=2)
+        finally:
+            GlobalAudio.sample_rate = sample_rate
+
@@ -0,0 +1,104 @@
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import wave
+
+import numpy as np
+
+from audioled import audio, audiosource
+
+
+class Test_AudioSource(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir)
+
+    def test_synthetic_is_independent_of_chunking(self):
+        for signal in audiosource.SYNTHETIC_SIGNALS:
+            a = audiosource.SyntheticAudioSource(signal, num_channels=2)
+            b = audiosource.SyntheticAudioSource(signal, num_channels=2)
+            whole = a.read(1000)
+            chunked = np.concatenate([b.read(n) for n in [100, 250, 650]])
+            self.assertEqual(whole.dtype, np.float32)
+            self.assertEqual(whole.shape, (2000, ))
+            np.testing.assert_allclose(whole, chunked, atol=1e-6)
+            # Interleaved, same signal in all channels
+            np.testing.assert_array_equal(whole[0::2], whole[1::2])
+            self.assertLessEqual(np.max(np.abs(whole)), 0.5 + 1e-6)
+        with self.assertRaises(ValueError):
+            audiosource.SyntheticAudioSource('unknown')
+
+    def test_wav_file_loops(self):
+        filename = os.path.join(self._tmpdir, 'test.wav')
+        samples = (np.arange(-50, 50) * 100).astype(np.int16).reshape(-1, 2)
+        with wave.open(filename, 'wb') as f:
+            f.setnchannels(2)
+            f.setsampwidth(2)
+            f.setframerate(22050)
+            f.writeframes(samples.tobytes())
+        source = audiosource.createAudioSource(filename)
+        self.assertIsInstance(source, audiosource.FileAudioSource)
+        self.assertEqual(source.sample_rate, 22050)
+        self.assertEqual(source.num_channels, 2)
+        expected = samples.reshape(-1) / 2**15
+        np.testing.assert_allclose(source.read(50), expected)
+        np.testing.assert_allclose(source.read(10), expected[:20])
+
+        source = audiosource.FileAudioSource(filename, looping=False)
+        source.read(45)
+        chunk = source.read(10)
+        np.testing.assert_allclose(chunk[:10], expected[-10:])
+        np.testing.assert_array_equal(chunk[10:], 0)
+
+    def test_raw_file(self):
+        filename = os.path.join(self._tmpdir, 'test.raw')
+        samples = np.linspace(-1, 1, 30, dtype=np.float32)
+        samples.tofile(filename)
+        source = audiosource.FileAudioSource(filename, sample_rate=8000, num_channels=3)
+        self.assertEqual(source.num_channels, 3)
+        np.testing.assert_array_equal(source.read(10), samples)
+        with self.assertRaises(FileNotFoundError):
+            audiosource.createAudioSource(os.path.join(self._tmpdir, 'missing.wav'))
+
+    def test_global_audio_streams_source_into_ring(self):
+        source = audiosource.createAudioSource('sine', sample_rate=6000, num_channels=2, realtime=True)
+        try:
+            globalAudio = audio.GlobalAudio(chunk_rate=60, source=source)
+            self.assertEqual(globalAudio.num_channels, 2)
+            self.assertEqual(audio.GlobalAudio.sample_rate, 6000)
+            t0 = time.monotonic()
+            while audio.GlobalAudio.ring.num_chunks < 3 and time.monotonic() - t0 < 5:
+                time.sleep(0.01)
+        finally:
+            source.stop()
+        self.assertFalse(source.isAlive())
+        self.assertGreaterEqual(audio.GlobalAudio.ring.num_chunks, 3)
+        self.assertEqual(audio.GlobalAudio.buffer.shape, (2, 100))
+
+    def test_non_realtime_source_is_pulled_per_frame(self):
+        source = audiosource.createAudioSource('sine', sample_rate=6000, num_channels=2, realtime=False)
+        audio.GlobalAudio(chunk_rate=60, source=source, block_size=50)
+        # No thread, audio is only delivered when pulled
+        self.assertFalse(source.isAlive())
+        time.sleep(0.05)
+        ring = audio.GlobalAudio.ring
+        self.assertEqual(ring.num_chunks, 0)
+        for _ in range(10):
+            audio.GlobalAudio.pull()
+        # One frame of audio per pull, in blocks of 50 samples
+        self.assertEqual(ring.num_samples, 1000)
+        self.assertEqual(ring.num_chunks, 20)
+        expected = audiosource.SyntheticAudioSource('sine', sample_rate=6000, num_channels=2)
+        np.testing.assert_allclose(ring.getWindow(1000), expected.read(1000).reshape(-1, 2).T, atol=1e-6)
+        source.stop()
+        audio.GlobalAudio.pull()
+        self.assertEqual(ring.num_samples, 1000)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,225 @@
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+
+import ctypes
+import json
+import multiprocessing
+import os
+import socket
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+
+from audioled import devices, serverconfiguration
+
+
+class FakeStrip(object):
+    def __init__(self, num_pixels):
+        self._led_data = [0] * num_pixels
+        self.shown = 0
+
+    def show(self):
+        self.shown += 1
+
+
+def _reference(pixels, brightness):
+    # Per-pixel packing as done by the previous implementation
+    pixels = devices._GAMMA_TABLE[(pixels * brightness).clip(0, 255).astype(int)]
+    return [(int(pixels[0, i]) << 16) | (int(pixels[1, i]) << 8) | int(pixels[2, i]) for i in range(pixels.shape[1])]
+
+
+class Test_RaspberryPi(unittest.TestCase):
+    def setUp(self):
+        self.num_pixels = 300
+        self.dev = devices.RaspberryPi(self.num_pixels)
+        self.dev._strip = FakeStrip(self.num_pixels)
+        self.pixels = np.random.RandomState(0).randint(0, 256, (3, self.num_pixels)).astype(np.float64)
+
+    def test_show_matches_reference(self):
+        self.dev.show(self.pixels)
+        self.assertEqual(self.dev._strip._led_data, _reference(self.pixels, 1.0))
+        self.assertEqual(self.dev._strip.shown, 1)
+
+    def test_brightness_change(self):
+        self.dev.show(self.pixels)
+        lut = self.dev._lut
+        self.dev.setBrightness(0.5)
+        self.dev.show(self.pixels)
+        self.assertIs(self.dev._lut, lut)
+        self.assertEqual(self.dev._strip._led_data, _reference(self.pixels, 0.5))
+
+    def test_float_pixels_match_reference(self):
+        # Brightness is applied before truncating fractional values
+        pixels = np.random.RandomState(1).uniform(0, 255, (3, self.num_pixels))
+        for brightness in [1.0, 0.5, 0.37]:
+            self.dev.setBrightness(brightness)
+            self.dev.show(pixels)
+            self.assertEqual(self.dev._strip._led_data, _reference(pixels, brightness))
+
+    def test_bulk_buffer_write(self):
+        self.dev._ledBuffer = np.zeros(self.num_pixels, dtype=np.uint32)
+        self.dev.show(self.pixels)
+        self.assertEqual(self.dev._ledBuffer.tolist(), _reference(self.pixels, 1.0))
+        # Strip data is not touched when writing to the buffer directly
+        self.assertEqual(self.dev._strip._led_data, [0] * self.num_pixels)
+
+    def test_show_clips_values(self):
+        pixels = np.array([[-10., 300., 128.]] * 3)
+        self.dev._strip = FakeStrip(3)
+        self.dev.num_pixels = 3
+        self.dev.show(pixels)
+        self.assertEqual(self.dev._strip._led_data, _reference(pixels.clip(0, 255), 1.0))
+
+
+def _referenceMapping(mappingJson):
+    # Two-level mapping as built by the previous implementation
+    num_cols = mappingJson['num_cols']
+    mapping = np.zeros((3, mappingJson['num_rows'] * num_cols, 2), dtype=np.int64)
+    for substrip in mappingJson['substrips']:
+        cur_row = substrip['row']
+        cur_col = substrip['col']
+        for i in range(substrip['num_pixels']):
+            for c in range(3):
+                mapping[c, substrip['start_index'] + i, :] = [c, cur_row * num_cols + cur_col]
+            if substrip['dir'] == 'L':
+                cur_col = cur_col - 1
+            elif substrip['dir'] == 'R':
+                cur_col = cur_col + 1
+            elif substrip['dir'] == 'U':
+                cur_row = cur_row - 1
+            else:
+                cur_row = cur_row + 1
+    return mapping
+
+
+class CaptureDevice(devices.LEDController):
+    def show(self, pixels):
+        self.pixels = pixels.copy()
+
+
+class Test_PanelWrapper(unittest.TestCase):
+    def setUp(self):
+        path = os.path.join(os.path.dirname(__file__), '..', 'panel_mappings', 'wall_44x22.json')
+        with open(path, "r", encoding='utf-8') as f:
+            self.mappingJson = json.loads(f.read())
+        self.num_pixels = self.mappingJson['num_rows'] * self.mappingJson['num_cols']
+        self.pixels = np.random.RandomState(0).rand(3, self.num_pixels) * 255
+
+    def test_mapping_matches_reference(self):
+        device = CaptureDevice(self.num_pixels)
+        wrapper = devices.PanelWrapper(device, self.mappingJson)
+        self.assertEqual(wrapper.pixel_mapping.dtype, np.int32)
+        wrapper.show(self.pixels)
+        reference = _referenceMapping(self.mappingJson)
+        np.testing.assert_array_equal(device.pixels, self.pixels[reference[:, :, 0], reference[:, :, 1]])
+
+    def test_unmapped_pixels_read_own_channel(self):
+        mappingJson = {
+            'num_rows': 2,
+            'num_cols': 3,
+            'substrips': [{'start_index': 0, 'num_pixels': 3, 'row': 1, 'col': 2, 'dir': 'L'}],
+        }
+        pixels = np.arange(18, dtype=np.float64).reshape(3, 6)
+        device = CaptureDevice(6)
+        devices.PanelWrapper(device, mappingJson).show(pixels)
+        np.testing.assert_array_equal(device.pixels, pixels[:, [5, 4, 3, 0, 0, 0]])
+
+    def test_mapping_cached_on_disk(self):
+        with tempfile.TemporaryDirectory() as cacheDir:
+            mapping = devices.loadPanelMapping(self.mappingJson, cacheDir)
+            files = os.listdir(cacheDir)
+            self.assertEqual(len(files), 1)
+            self.assertTrue(files[0].startswith('panel_mapping_v{}_'.format(devices.PANEL_MAPPING_VERSION)))
+            cached = devices.loadPanelMapping(self.mappingJson, cacheDir)
+            np.testing.assert_array_equal(mapping, cached)
+            self.assertEqual(os.listdir(cacheDir), files)
+
+    def test_mapping_composed_with_virtual_output(self):
+        start_index = 10
+        total = self.num_pixels + 20
+        shared = multiprocessing.Array(ctypes.c_uint8, 3 * total)
+        virtual = devices.VirtualOutput(CaptureDevice(total), self.num_pixels, shared, None, start_index=start_index)
+        wrapper = devices.PanelWrapper(virtual, self.mappingJson)
+        wrapper.show(self.pixels)
+        reference = _referenceMapping(self.mappingJson)
+        expected = np.zeros((3, total), dtype=np.uint8)
+        expected[:, start_index:start_index + self.num_pixels] = self.pixels[reference[:, :, 0], reference[:, :, 1]]
+        np.testing.assert_array_equal(np.ctypeslib.as_array(shared.get_obj()).reshape(3, -1), expected)
+
+
+class Test_DMXOutput(unittest.TestCase):
+    def setUp(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.settimeout(2)
+        self.port = self.sock.getsockname()[1]
+        self.num_pixels = 400
+        self.pixels = np.random.RandomState(0).randint(0, 256, (3, self.num_pixels)).astype(np.float64)
+
+    def tearDown(self):
+        self.sock.close()
+
+    def _receive(self, count):
+        return [self.sock.recvfrom(1024)[0] for i in range(count)]
+
+    def test_e131(self):
+        device = devices.DMXOutput(self.num_pixels, host='127.0.0.1', port=self.port, start_universe=5, sync=True)
+        self.assertEqual(device.getUniverses(), [5, 6, 7])
+        device.show(self.pixels)
+        packets = self._receive(4)
+        device.shutdown()
+        data = b''
+        for i, packet in enumerate(packets[:3]):
+            self.assertEqual(packet[4:16], b'ASC-E1.17\x00\x00\x00')
+            self.assertEqual(struct.unpack('>I', packet[18:22])[0], 0x00000004)
+            self.assertEqual(struct.unpack('>H', packet[109:111])[0], 5)  # sync address
+            self.assertEqual(packet[111], 1)  # sequence
+            self.assertEqual(struct.unpack('>H', packet[113:115])[0], 5 + i)
+            num_slots = struct.unpack('>H', packet[123:125])[0] - 1
+            self.assertEqual(struct.unpack('>H', packet[16:18])[0] & 0x0FFF, len(packet) - 16)
+            self.assertEqual(len(packet), 126 + num_slots)
+            data += packet[126:]
+        self.assertEqual(len(data), 3 * self.num_pixels)
+        np.testing.assert_array_equal(np.frombuffer(data, dtype=np.uint8), self.pixels.T.ravel())
+        # Sync packet
+        self.assertEqual(len(packets[3]), 49)
+        self.assertEqual(struct.unpack('>I', packets[3][40:44])[0], 0x00000001)
+        self.assertEqual(struct.unpack('>H', packets[3][45:47])[0], 5)
+
+    def test_artnet(self):
+        num_pixels = 171
+        device = devices.DMXOutput(num_pixels, protocol='artnet', host='127.0.0.1', port=self.port, channel_order='GRB')
+        device.show(self.pixels[:, :num_pixels])
+        packets = self._receive(2)
+        device.shutdown()
+        for i, packet in enumerate(packets):
+            self.assertEqual(packet[:8], b'Art-Net\x00')
+            self.assertEqual(struct.unpack('<H', packet[8:10])[0], 0x5000)
+            self.assertEqual(packet[12], 1)  # sequence
+            self.assertEqual(packet[14], 1 + i)  # universe
+        # Art-Net data length must be even
+        self.assertEqual(struct.unpack('>H', packets[1][16:18])[0], 4)
+        data = packets[0][18:] + packets[1][18:21]
+        np.testing.assert_array_equal(np.frombuffer(data, dtype=np.uint8),
+                                      self.pixels[[1, 0, 2], :num_pixels].T.ravel())
+
+    def test_created_from_config(self):
+        config = serverconfiguration.ServerConfiguration()
+        wrapper = config.createOutputDeviceFromConfig([{
+            "device": "DMXOutput",
+            "device.dmx.protocol": "artnet",
+            "device.dmx.host": "127.0.0.1",
+            "device.dmx.port": self.port,
+            "device.dmx.start_universe": 3,
+            "device.num_pixels": 10,
+            "device.num_rows": 1
+        }], {})
+        device = wrapper._devices[0]
+        self.assertIsInstance(device, devices.DMXOutput)
+        self.assertEqual(device.protocol, 'artnet')
+        self.assertEqual(device.getUniverses(), [3])
+        device.show(np.zeros((3, 10)))
+        packet = self._receive(1)[0]
+        self.assertEqual(packet[14], 3)
+        device.shutdown()
@@ -39,6 +39,58 @@ class TestDSP(unittest.TestCase):
     #     plt.plot(bins, energy)
     #     plt.show()
 
+    def test_sparse_filter_bank(self):
+        """Verify sparse filter bank against triangular filters built per bin"""
+        for n_filters, n_fft, fs, fmin, fmax, scale in [(64, 1024, 11025, 32.7, 261.0, 'bark'),
+                                                         (32, 4096, 44100, 0, 22050, 'mel')]:
+            f_hz = dsp._filter_bank_points(n_filters, fmin, fmax, scale)
+            bins = np.floor((n_fft + 1.) * f_hz / fs)
+            expected = np.zeros((n_filters, n_fft // 2 + 1))
+            for m in range(1, n_filters + 1):
+                for k in range(int(bins[m - 1]), int(bins[m])):
+                    expected[m - 1, k] = (k - bins[m - 1]) / (bins[m] - bins[m - 1])
+                for k in range(int(bins[m]), int(bins[m + 1])):
+                    expected[m - 1, k] = (bins[m + 1] - k) / (bins[m + 1] - bins[m])
+            filters, _ = dsp.filter_bank(n_filters, n_fft, fs, fmin, fmax, scale)
+            np.testing.assert_allclose(filters, expected, rtol=1e-6)
+            pow_spectrum = dsp.power_spectrum(np.random.normal(size=n_fft))
+            output = dsp.warp_power_spectrum(pow_spectrum, n_fft, n_filters, fs, [fmin, fmax], scale)
+            self.assertEqual(output.dtype, np.float32)
+            np.testing.assert_allclose(output, expected.dot(pow_spectrum), rtol=1e-4)
+
+    def test_power_spectrum_out(self):
+        y = np.random.normal(size=256)
+        out = np.empty(129, dtype=np.float32)
+        result = dsp.power_spectrum(y, out=out)
+        self.assertIs(result, out)
+        np.testing.assert_allclose(out, np.abs(np.fft.rfft(y))**2 * (2 / 256), rtol=1e-5)
+
+    def test_filter_bank_sos(self):
+        """Verify chunked multi-channel FilterBank output against continuous filtering"""
+        from scipy.signal import sosfilt
+        bank = dsp.FilterBank(44100)
+        self.assertEqual(bank.addBand(100, 1000), 0)
+        self.assertEqual(bank.addBand(1.0, 22000.0), 1)
+        self.assertEqual(bank.addBand(100, 1000), 0)
+        x = np.random.uniform(-1, 1, (2, 4 * 735))
+        output = np.concatenate([bank.filter(x[:, i:i + 735]) for i in range(0, x.shape[1], 735)], axis=-1)
+        self.assertEqual(output.shape, (2, 2, x.shape[1]))
+        for band, (lowcut, highcut) in enumerate(bank.getBands()):
+            sos, zi = dsp.design_sos(lowcut, highcut, 44100, 3)
+            expected, _ = sosfilt(sos.copy(), x, zi=zi[:, None, :] * x[None, :, 0, None])
+            np.testing.assert_allclose(output[band], expected)
+        # Replaced band keeps its index and state
+        state = bank._state[0]
+        self.assertEqual(bank.replaceBand((100, 1000), 120, 1000), 0)
+        self.assertEqual(bank.getBands(), [(120, 1000), (1.0, 22000.0)])
+        self.assertIs(bank._state[0], state)
+        np.testing.assert_array_equal(bank._sos[0], dsp.design_sos(120, 1000, 44100, 3)[0])
+        bank.removeBand(120, 1000)
+        self.assertEqual(bank.getBands(), [(1.0, 22000.0)])
+        self.assertEqual(bank.filter(x[0]).shape, (1, x.shape[1]))
+        # Design is cached
+        self.assertIs(dsp.design_sos(100, 1000, 44100, 3), dsp.design_sos(100, 1000, 44100, 3))
+
     # def test_rollwin_output(self):
     #     """Verify correct rolling window output for rollwin generator"""
     #     # Verify output with an even window length
@@ -114,5 +166,36 @@ class TestDSP(unittest.TestCase):
         self.assertTrue((signal == 0).all())
 
 
+    def test_rms(self):
+        values = [0.5, -0.25, 1.]
+        expected = np.sqrt(sum(v**2 for v in values) / (len(values) / 2))
+        self.assertAlmostEqual(dsp.rms(values), expected)
+        self.assertAlmostEqual(dsp.rms(np.array(values, dtype=np.float32)), expected, places=6)
+        self.assertEqual(dsp.rms([]), 0.)
+
+    def test_ring_buffer(self):
+        rng = np.random.RandomState(0)
+        ring = dsp.RingBuffer(5)
+        history = []
+        for value in rng.uniform(-1, 1, 3000):
+            ring.push(value)
+            history.append(value)
+            window = history[-5:]
+            self.assertEqual(len(ring), len(window))
+            self.assertEqual(ring.max(), max(window))
+            self.assertAlmostEqual(ring.mean(), np.mean(window))
+            self.assertAlmostEqual(ring.rms(), dsp.rms(window))
+        np.testing.assert_array_equal(ring.getValues(), history[-5:])
+        # Shrinking and growing keeps the latest values
+        ring.setCapacity(2)
+        np.testing.assert_array_equal(ring.getValues(), history[-2:])
+        ring.setCapacity(4)
+        ring.push(2.)
+        np.testing.assert_array_equal(ring.getValues(), history[-2:] + [2.])
+        self.assertEqual(ring.max(), 2.)
+        with self.assertRaises(ValueError):
+            dsp.RingBuffer(3).max()
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,238 @@
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+
+import socket
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from audioled import devices, esp_protocol
+
+
+class Receiver(object):
+    """Model of the receiving side of the ESP8266 firmware"""
+    def __init__(self, num_pixels):
+        self.pixels = np.zeros((num_pixels, 3), dtype=np.uint8)
+        self.shown = []
+        self.seq = None
+
+    def receive(self, packet):
+        flags, seq, runs = esp_protocol.decodePacket(packet)
+        if self.seq is not None and -64 < ((seq - self.seq + 0x8000) & 0xFFFF) - 0x8000 < 0:
+            return
+        self.seq = seq
+        for offset, rgb in runs:
+            data = np.frombuffer(rgb, dtype=np.uint8).reshape(-1, 3)
+            self.pixels[offset:offset + len(data)] = data
+        if flags & esp_protocol.FLAG_END_OF_FRAME:
+            self.shown.append(self.pixels.copy())
+
+
+class Test_ESPProtocol(unittest.TestCase):
+    def setUp(self):
+        self.num_pixels = 1000
+        self.random = np.random.RandomState(0)
+
+    def _frame(self):
+        return self.random.randint(0, 256, (self.num_pixels, 3)).astype(np.uint8)
+
+    def test_parseDiscoveryReply(self):
+        self.assertEqual(esp_protocol.parseDiscoveryReply(b"ESP8266 ACK LEDS 60"), (60, 1))
+        self.assertEqual(esp_protocol.parseDiscoveryReply(b"ESP8266 ACK LEDS 1000 PROTO 2"), (1000, 2))
+        self.assertIsNone(esp_protocol.parseDiscoveryReply(b"ERR BUFFER OVF"))
+
+    def test_keyframe_split_into_packets(self):
+        encoder = esp_protocol.FrameEncoder(max_packet_size=1400)
+        receiver = Receiver(self.num_pixels)
+        frame = self._frame()
+        packets = encoder.encode(frame)
+        self.assertEqual(len(packets), 3)
+        for packet in packets:
+            self.assertLessEqual(len(packet), 1400)
+            self.assertTrue(esp_protocol.decodePacket(packet)[0] & esp_protocol.FLAG_KEYFRAME)
+        for packet in packets:
+            receiver.receive(packet)
+        self.assertEqual(len(receiver.shown), 1)
+        np.testing.assert_array_equal(receiver.shown[0], frame)
+
+    def test_delta_sends_changed_runs(self):
+        encoder = esp_protocol.FrameEncoder()
+        receiver = Receiver(self.num_pixels)
+        frame = self._frame()
+        for packet in encoder.encode(frame):
+            receiver.receive(packet)
+        frame = frame.copy()
+        frame[10:20] = 0
+        frame[500] = 1
+        packets = encoder.encode(frame)
+        self.assertEqual(len(packets), 1)
+        flags, _, runs = esp_protocol.decodePacket(packets[0])
+        self.assertFalse(flags & esp_protocol.FLAG_KEYFRAME)
+        self.assertEqual([offset for offset, _ in runs], [10, 500])
+        receiver.receive(packets[0])
+        np.testing.assert_array_equal(receiver.shown[-1], frame)
+        # Nothing changed
+        self.assertEqual(encoder.encode(frame), [])
+        # Forced keyframe, e.g. as keep-alive
+        packets = encoder.encode(frame, keyframe=True)
+        self.assertTrue(esp_protocol.decodePacket(packets[0])[0] & esp_protocol.FLAG_KEYFRAME)
+
+    def test_keyframe_interval(self):
+        encoder = esp_protocol.FrameEncoder(keyframe_interval=3)
+        frame = self._frame()
+        keyframes = []
+        for i in range(8):
+            frame = frame.copy()
+            frame[i] += 1
+            packets = encoder.encode(frame)
+            keyframes.append(bool(esp_protocol.decodePacket(packets[0])[0] & esp_protocol.FLAG_KEYFRAME))
+        self.assertEqual(keyframes, [True, False, False, False, True, False, False, False])
+
+    def test_stale_packets_dropped(self):
+        encoder = esp_protocol.FrameEncoder(delta=False)
+        receiver = Receiver(self.num_pixels)
+        first = encoder.encode(self._frame())
+        second_frame = self._frame()
+        second = encoder.encode(second_frame)
+        for packet in second + first:
+            receiver.receive(packet)
+        self.assertEqual(len(receiver.shown), 1)
+        np.testing.assert_array_equal(receiver.shown[0], second_frame)
+
+
+class Test_ESP8266(unittest.TestCase):
+    def test_negotiates_protocol_and_sends_frames(self):
+        num_pixels = 600
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(('127.0.0.1', 0))
+        sock.settimeout(2)
+        receiver = Receiver(num_pixels)
+
+        def serve():
+            try:
+                while len(receiver.shown) < 1:
+                    data, addr = sock.recvfrom(2048)
+                    if data == esp_protocol.DISCOVERY:
+                        sock.sendto("ESP8266 ACK LEDS {} PROTO 2".format(num_pixels).encode('ascii'), addr)
+                    else:
+                        receiver.receive(data)
+            except socket.timeout:
+                pass
+
+        thread = threading.Thread(target=serve)
+        thread.start()
+        device = devices.ESP8266(num_pixels, ip='127.0.0.1', port=sock.getsockname()[1])
+        pixels = np.tile(np.arange(num_pixels) % 256, (3, 1)).astype(np.float64)
+        start = time.time()
+        while not receiver.shown and time.time() - start < 2:
+            device.show(pixels)
+            time.sleep(0.02)
+        thread.join()
+        device.shutdown()
+        sock.close()
+        self.assertEqual(device._protocol, 2)
+        self.assertEqual(len(receiver.shown), 1)
+        np.testing.assert_array_equal(receiver.shown[0], pixels.T)
+
+    def test_keep_alive_sends_keyframe_in_delta_mode(self):
+        class FakeSocket(object):
+            def __init__(self):
+                self.packets = []
+
+            def sendto(self, data, address):
+                self.packets.append(data)
+
+        num_pixels = 100
+        device = devices.ESP8266(num_pixels, ip='127.0.0.1', delta=True)
+        device._sock.close()
+        device._sock = FakeSocket()
+        device._protocol = 2
+        frame = np.zeros((num_pixels, 3), dtype=np.uint8)
+        device._send(frame)
+        self.assertEqual(len(device._sock.packets), 1)
+        # Unchanged frame right after is an empty delta
+        device._send(frame)
+        self.assertEqual(len(device._sock.packets), 1)
+        # Unchanged frame as keep-alive is sent in full
+        device._lastPacket_t -= device.getKeepAliveInterval()
+        device._send(frame)
+        self.assertEqual(len(device._sock.packets), 2)
+        flags, _, runs = esp_protocol.decodePacket(device._sock.packets[1])
+        self.assertTrue(flags & esp_protocol.FLAG_KEYFRAME)
+        self.assertEqual(runs[0][0], 0)
+
+    def test_falls_back_to_protocol_1_without_discovery_reply(self):
+        num_pixels = 60
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(('127.0.0.1', 0))
+        sock.settimeout(3)
+        frames = []
+        probes = []
+
+        def serve():
+            # Old firmware, discovery packets are never answered
+            try:
+                while len(frames) < 3:
+                    data, addr = sock.recvfrom(2048)
+                    if data == esp_protocol.DISCOVERY:
+                        probes.append(time.time())
+                    else:
+                        frames.append(data)
+            except socket.timeout:
+                pass
+
+        thread = threading.Thread(target=serve)
+        thread.start()
+        device = devices.ESP8266(num_pixels, ip='127.0.0.1', port=sock.getsockname()[1])
+        device.REPROBE_INTERVAL = 0.
+        pixels = np.tile(np.arange(num_pixels) % 256, (3, 1)).astype(np.float64)
+        start = time.time()
+        while len(frames) < 3 and time.time() - start < 3:
+            device.show(pixels)
+            time.sleep(0.02)
+        thread.join()
+        device.shutdown()
+        sock.close()
+        self.assertEqual(device._protocol, 1)
+        self.assertEqual(len(frames), 3)
+        self.assertEqual(frames[0], pixels.T.astype(np.uint8).tobytes())
+        # Discovery is repeated while sending
+        self.assertGreater(len(probes), 1)
+
+    def test_switches_to_protocol_2_on_late_discovery_reply(self):
+        num_pixels = 60
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(('127.0.0.1', 0))
+        sock.settimeout(3)
+        receiver = Receiver(num_pixels)
+        probes = []
+
+        def serve():
+            # Node answers only from the second discovery packet on, e.g. after a firmware update
+            try:
+                while len(receiver.shown) < 1:
+                    data, addr = sock.recvfrom(2048)
+                    if data == esp_protocol.DISCOVERY:
+                        probes.append(addr)
+                        if len(probes) > 1:
+                            sock.sendto("ESP8266 ACK LEDS {} PROTO 2".format(num_pixels).encode('ascii'), addr)
+                    elif data[:2] == esp_protocol.MAGIC:
+                        receiver.receive(data)
+            except socket.timeout:
+                pass
+
+        thread = threading.Thread(target=serve)
+        thread.start()
+        device = devices.ESP8266(num_pixels, ip='127.0.0.1', port=sock.getsockname()[1])
+        device.REPROBE_INTERVAL = 0.05
+        pixels = np.tile(np.arange(num_pixels) % 256, (3, 1)).astype(np.float64)
+        start = time.time()
+        while not receiver.shown and time.time() - start < 3:
+            device.show(pixels)
+            time.sleep(0.02)
+        thread.join()
+        device.shutdown()
+        sock.close()
+        self.assertEqual(device._protocol, 2)
+        np.testing.assert_array_equal(receiver.shown[0], pixels.T)
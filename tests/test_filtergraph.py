@@ -130,6 +130,42 @@ class Test_FilterGraph(unittest.TestCase):
         self.assertEqual(n1._outputBuffer[0], 'test')
         self.assertEqual(n2._outputBuffer[1], 'test')
 
+    def test_batch_defers_process_order(self):
+        fg = filtergraph.FilterGraph()
+        ef1 = MockEffect()
+        led = devices.LEDOutput()
+        led.setNumOutputPixels(100)
+        fg.addEffectNode(led)
+        fg.beginBatch()
+        fg.addEffectNode(ef1)
+        fg.addConnection(ef1, 0, led, 0)
+        self.assertEqual(len(fg._getNodesInOrder()), 1)
+        fg.endBatch()
+        self.assertEqual(len(fg._getNodesInOrder()), 2)
+
+    def test_version_changes_on_modification(self):
+        fg = filtergraph.FilterGraph()
+        other = filtergraph.FilterGraph()
+        self.assertNotEqual(fg.getVersion(), other.getVersion())
+        versions = [fg.getVersion()]
+        ef1 = MockEffect()
+        ef2 = MockEffect()
+        n1 = fg.addEffectNode(ef1)
+        versions.append(fg.getVersion())
+        fg.addEffectNode(ef2)
+        versions.append(fg.getVersion())
+        con = fg.addConnection(ef1, 0, ef2, 0)
+        versions.append(fg.getVersion())
+        fg.removeConnection(con.uid)
+        versions.append(fg.getVersion())
+        fg.removeEffectNode(n1.uid)
+        versions.append(fg.getVersion())
+        self.assertEqual(len(set(versions)), len(versions))
+        # Reading doesn't change the version
+        fg.getNodes()
+        fg.getConnections()
+        self.assertEqual(fg.getVersion(), versions[-1])
+
 
 class MockEffect(effect.Effect):
     def __init__(self, outputValue=None):
@@ -0,0 +1,47 @@
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+
+import threading
+import time
+import unittest
+
+from audioled.frameclock import FrameClock
+
+
+class Test_FrameClock(unittest.TestCase):
+    def test_frames_at_target_rate(self):
+        dts = []
+        clock = FrameClock(lambda dt: dts.append(dt), fps=100)
+        clock.start()
+        time.sleep(0.5)
+        clock.stop()
+        self.assertFalse(clock.isAlive())
+        # Roughly 50 frames in 0.5 seconds, allow slack for loaded machines
+        self.assertGreater(len(dts), 25)
+        self.assertLess(len(dts), 60)
+        stats = clock.getStats()
+        self.assertEqual(stats['target_fps'], 100)
+        self.assertIn('jitter_p95', stats)
+        self.assertAlmostEqual(stats['frame_time_mean'], 10., delta=5.)
+
+    def test_overrun_reanchors(self):
+        def slow(dt):
+            time.sleep(0.05)
+
+        clock = FrameClock(slow, fps=100)
+        clock.start()
+        time.sleep(0.3)
+        clock.stop()
+        self.assertGreater(clock.getStats()['overruns'], 0)
+
+    def test_stop_interrupts_wait(self):
+        event = threading.Event()
+        clock = FrameClock(lambda dt: event.set(), fps=0.5)
+        clock.start()
+        start = time.time()
+        clock.stop(1)
+        self.assertLess(time.time() - start, 0.5)
+        self.assertFalse(event.is_set())
+
+    def test_invalid_fps(self):
+        with self.assertRaises(ValueError):
+            FrameClock(lambda dt: None, fps=0)
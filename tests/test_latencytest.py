@@ -0,0 +1,36 @@
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+
+import unittest
+
+from audioled import latencytest
+
+
+class Test_LatencyTest(unittest.TestCase):
+    def test_matchClicks(self):
+        clicks = [1., 2., 3.]
+        lightUps = [0.5, 1.05, 2.3, 3.02]
+        latencies = latencytest.matchClicks(clicks, lightUps, 0.25)
+        self.assertEqual(len(latencies), 2)
+        self.assertAlmostEqual(latencies[0], 0.05)
+        self.assertAlmostEqual(latencies[1], 0.02)
+
+    def test_click_times(self):
+        source = latencytest.ClickSource(sample_rate=1000, bpm=600.)
+        for _ in range(5):
+            chunk = source.read(30)
+        # Clicks at samples 0 and 100, in the first and fourth chunk
+        self.assertEqual(len(source.clickTimes), 2)
+        self.assertLess(source.clickTimes[0], source.clickTimes[1])
+        self.assertEqual(chunk[0], 0.)
+
+    def test_selfTest(self):
+        result = latencytest.runSelfTest(duration=2., bpm=240., block_size=256)
+        self.assertGreater(result["clicks"], 0)
+        self.assertGreater(result["detected"], 0)
+        self.assertLessEqual(result["detected"], result["clicks"])
+        self.assertTrue(all(0 < latency < 0.25 for latency in result["latencies"]))
+        self.assertIsNotNone(result["pipeline"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -163,3 +163,32 @@ class Test_OPC_Server(unittest.TestCase):
             pixels_out = serverB.get_pixels(block=False)
             print("Checking output serverB")
             np.testing.assert_array_equal(pixels_in, pixels_out)
+
+
+class Test_OPC_Client(unittest.TestCase):
+    def test_encodeArray(self):
+        client = opc.Client('127.0.0.1:7893')
+        pixels = np.array([[-1., 0.5, 300.], [1., 2., 3.]])
+        message = bytes(client._encode([(0, pixels)]))
+        self.assertEqual(message, bytes([0, 0, 0, 6, 0, 0, 255, 1, 2, 3]))
+
+    def test_encodeMultipleChannels(self):
+        client = opc.Client('127.0.0.1:7893')
+        pixels = np.arange(3 * 5, dtype=np.uint8).reshape(5, 3)
+        message = bytes(client._encode([(1, pixels[:2]), (2, pixels[2:])]))
+        self.assertEqual(message[:4], bytes([1, 0, 0, 6]))
+        self.assertEqual(message[4:10], pixels[:2].tobytes())
+        self.assertEqual(message[10:14], bytes([2, 0, 0, 9]))
+        self.assertEqual(message[14:], pixels[2:].tobytes())
+
+    def test_putArrayMatchesPutPixels(self):
+        server = opc_server.Server('127.0.0.1', 7893)
+        server.get_pixels(block=False)
+        client = opc.Client('127.0.0.1:7893', long_connection=True)
+        pixels_in = np.random.randint(0, 256, (3, 10))
+        # Planar float data as rendered by the effects, transposed without copy
+        for i in range(2):
+            client.put_array((pixels_in + 0.5).T)
+            time.sleep(0.1)
+        pixels_out = server.get_pixels(block=False)
+        np.testing.assert_array_equal(pixels_in, pixels_out)
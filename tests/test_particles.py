@@ -0,0 +1,42 @@
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+
+import math
+import unittest
+
+import numpy as np
+
+from audioled import particles
+
+
+class Test_ParticleSystem(unittest.TestCase):
+    def test_render_matches_per_particle_sum(self):
+        rng = np.random.RandomState(0)
+        num_pixels = 50
+        for thickness in [1, 4]:
+            system = particles.ParticleSystem(10)
+            stars = []
+            for i in range(25):
+                star = (0.1 * i, rng.randint(0, num_pixels - 2), rng.uniform(0.1, 1.))
+                system.spawn(*star)
+                stars.append(star)
+            # Oldest particles are replaced
+            self.assertEqual(len(system), 10)
+            expected = np.zeros(num_pixels)
+            for t0, position, brightness in stars[-10:]:
+                for index in range(position, min(position + thickness, num_pixels)):
+                    expected[index] += math.exp(-2. * (3. - t0)) * brightness
+            output = system.render(3., 2., thickness, num_pixels)
+            np.testing.assert_allclose(output, expected, atol=1e-12)
+
+    def test_render_without_particles(self):
+        system = particles.ParticleSystem(5)
+        np.testing.assert_array_equal(system.render(0., 1., 3, 8), np.zeros(8))
+        system.spawn(0., 2)
+        self.assertEqual(system.render(0., 1., 1, 8)[2], 1.)
+        system.clear()
+        self.assertEqual(len(system), 0)
+        np.testing.assert_array_equal(system.render(1., 1., 1, 8), np.zeros(8))
+
+
+if __name__ == '__main__':
+    unittest.main()
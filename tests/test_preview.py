@@ -0,0 +1,166 @@
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+
+import base64
+import hashlib
+import socket
+import struct
+import time
+import unittest
+
+import numpy as np
+
+from audioled import preview
+
+
+def _handshake(port, path):
+    sock = socket.create_connection(('127.0.0.1', port), timeout=2)
+    key = base64.b64encode(b'0123456789abcdef')
+    sock.sendall(b"GET " + path.encode() + b" HTTP/1.1\r\n"
+                 b"Host: localhost\r\n"
+                 b"Upgrade: websocket\r\n"
+                 b"Connection: Upgrade\r\n"
+                 b"Sec-WebSocket-Key: " + key + b"\r\n"
+                 b"Sec-WebSocket-Version: 13\r\n\r\n")
+    response = b""
+    while b"\r\n\r\n" not in response:
+        data = sock.recv(1024)
+        if not data:
+            break
+        response += data
+    head, _, rest = response.partition(b"\r\n\r\n")
+    return sock, head, key, rest
+
+
+def _recvExact(sock, num, buffer):
+    while len(buffer) < num:
+        buffer += sock.recv(4096)
+    return buffer[:num], buffer[num:]
+
+
+def _readMessage(sock, buffer):
+    header, buffer = _recvExact(sock, 2, buffer)
+    opcode = header[0] & 0x0F
+    length = header[1] & 0x7F
+    if length == 126:
+        ext, buffer = _recvExact(sock, 2, buffer)
+        length = struct.unpack('!H', ext)[0]
+    elif length == 127:
+        ext, buffer = _recvExact(sock, 8, buffer)
+        length = struct.unpack('!Q', ext)[0]
+    payload, buffer = _recvExact(sock, length, buffer)
+    return opcode, payload, buffer
+
+
+class Test_Preview(unittest.TestCase):
+    def setUp(self):
+        self.requested = []
+        self.subscribed = []
+        self.unsubscribed = []
+        self.pixels = np.arange(3 * 100, dtype=np.uint8).reshape(3, 100).T.copy()
+
+        def source(stream):
+            self.requested.append(stream)
+            return (2, self.pixels)
+
+        self.server = preview.PreviewServer('127.0.0.1',
+                                            0,
+                                            source,
+                                            max_fps=50,
+                                            on_subscribe=self.subscribed.append,
+                                            on_unsubscribe=self.unsubscribed.append)
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop(2)
+
+    def test_encode_decode(self):
+        message = preview.encodeFrame(preview.KIND_NODE, 2, self.pixels, 7)
+        kind, num_rows, num_pixels, seq, rgb = preview.decodeFrame(message)
+        self.assertEqual(kind, preview.KIND_NODE)
+        self.assertEqual(num_rows, 2)
+        self.assertEqual(num_pixels, 100)
+        self.assertEqual(seq, 7)
+        np.testing.assert_array_equal(np.frombuffer(rgb, dtype=np.uint8).reshape(-1, 3), self.pixels)
+
+    def test_output_stream(self):
+        sock, head, key, buffer = _handshake(self.server.getPort(), '/output/0?fps=20')
+        self.assertTrue(head.startswith(b"HTTP/1.1 101"))
+        accept = base64.b64encode(hashlib.sha1(key + b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11').digest())
+        self.assertIn(b"Sec-WebSocket-Accept: " + accept, head)
+        opcode, payload, buffer = _readMessage(sock, buffer)
+        self.assertEqual(opcode, 0x2)
+        kind, num_rows, num_pixels, seq, rgb = preview.decodeFrame(payload)
+        self.assertEqual(kind, preview.KIND_OUTPUT)
+        self.assertEqual(num_rows, 2)
+        self.assertEqual(num_pixels, 100)
+        self.assertEqual(seq, 0)
+        np.testing.assert_array_equal(np.frombuffer(rgb, dtype=np.uint8).reshape(-1, 3), self.pixels)
+        opcode, payload, buffer = _readMessage(sock, buffer)
+        self.assertEqual(preview.decodeFrame(payload)[3], 1)
+        self.assertEqual(self.subscribed, [('output', 0)])
+        # Masked close frame from client
+        sock.sendall(b'\x88\x80\x00\x00\x00\x00')
+        start = time.time()
+        while not self.unsubscribed and time.time() - start < 2:
+            time.sleep(0.01)
+        self.assertEqual(self.unsubscribed, [('output', 0)])
+        sock.close()
+
+    def test_node_stream(self):
+        sock, head, _, buffer = _handshake(self.server.getPort(), '/node/1/abc/2')
+        self.assertTrue(head.startswith(b"HTTP/1.1 101"))
+        _, payload, _ = _readMessage(sock, buffer)
+        self.assertEqual(preview.decodeFrame(payload)[0], preview.KIND_NODE)
+        self.assertIn(('node', 1, 'abc', 2), self.requested)
+        sock.close()
+
+    def test_streams_of_connected_clients(self):
+        first, _, _, _ = _handshake(self.server.getPort(), '/node/1/abc/0')
+        second, _, _, _ = _handshake(self.server.getPort(), '/node/1/abc/0')
+        start = time.time()
+        while len(self.subscribed) < 2 and time.time() - start < 2:
+            time.sleep(0.01)
+        self.assertEqual(self.server.getStreams(), {('node', 1, 'abc', 0)})
+        first.close()
+        while not self.unsubscribed and time.time() - start < 2:
+            time.sleep(0.01)
+        # Still watched by the second client
+        self.assertEqual(self.server.getStreams(), {('node', 1, 'abc', 0)})
+        second.close()
+        while len(self.unsubscribed) < 2 and time.time() - start < 2:
+            time.sleep(0.01)
+        self.assertEqual(self.server.getStreams(), set())
+
+    def test_handshake_under_back_pressure(self):
+        class SlowSocket(object):
+            """Non-blocking socket accepting 16 bytes per send after the first send would block"""
+            def __init__(self):
+                self.data = b""
+                self.blocked = True
+
+            def send(self, data):
+                if self.blocked:
+                    self.blocked = False
+                    raise BlockingIOError()
+                self.data += bytes(data[:16])
+                return min(len(data), 16)
+
+        sock = SlowSocket()
+        client = preview.PreviewClient(sock, ('127.0.0.1', 0))
+        server = preview.PreviewServer('127.0.0.1', 0, lambda stream: None)
+        server._clients[sock] = client
+        client._recv_buffer = (b"GET /output/0 HTTP/1.1\r\nUpgrade: websocket\r\n"
+                               b"Sec-WebSocket-Key: MDEyMzQ1Njc4OWFiY2RlZg==\r\n\r\n")
+        server._handshake(client)
+        self.assertTrue(client.isOpen)
+        self.assertIn(sock, server._clients)
+        while client.isSending():
+            client.flush()
+        self.assertTrue(sock.data.startswith(b"HTTP/1.1 101"))
+        self.assertTrue(sock.data.endswith(b"\r\n\r\n"))
+        server.sel.close()
+
+    def test_invalid_path(self):
+        sock, head, _, _ = _handshake(self.server.getPort(), '/unknown')
+        self.assertTrue(head.startswith(b"HTTP/1.1 400"))
+        sock.close()
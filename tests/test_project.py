@@ -0,0 +1,367 @@
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+
+import asyncio
+import ctypes
+import multiprocessing as mp
+import time
+import unittest
+
+import numpy as np
+
+from audioled import audio, audiosource, colors, devices
+from audioled.devices import VirtualOutput
+from audioled.filtergraph import FilterGraph
+from audioled.project import (MAX_PRESENTATION_DELAY, LatencyHistory, Project, UpdateMessage, ShowMessage, BatchMessage,
+                              BrightnessMessage, output, worker_process_nodePreview, worker_process_batchMessage)
+
+
+class CountingDevice(devices.LEDController):
+    KEEP_ALIVE_INTERVAL = None
+
+    def __init__(self, num_pixels):
+        super().__init__(num_pixels)
+        self.frames = []
+        self.show_t = []
+
+    def show(self, pixels):
+        self.frames.append(pixels.copy())
+        self.show_t.append(time.monotonic())
+
+
+class SharedCountingDevice(devices.LEDController):
+    """Counts shown frames across processes"""
+    def __init__(self, num_pixels):
+        super().__init__(num_pixels)
+        self.count = mp.Value(ctypes.c_int64, 0)
+
+    def show(self, pixels):
+        with self.count.get_lock():
+            self.count.value += 1
+
+
+class ListQueue(object):
+    def __init__(self, messages):
+        self._messages = list(messages) + [None]
+
+    def get(self, block=True, timeout=None):
+        message = self._messages.pop(0)
+        if callable(message):
+            message()
+            message = self._messages.pop(0)
+        return message
+
+    def task_done(self):
+        pass
+
+
+class Test_Project(unittest.TestCase):
+    def test_publishQueue_busy(self):
+        proj = Project()
+        q = proj._publishQueue.register()
+        self.assertFalse(proj._publishQueue.isBusy(q))
+        proj._publishQueue.publishTo(q, "test")
+        self.assertTrue(proj._publishQueue.isBusy(q))
+        self.assertEqual(proj._publishQueue.waitIdle([q], 0.01), [q])
+        self.assertEqual(q.get(True, 1), "test")
+        q.task_done()
+        self.assertFalse(proj._publishQueue.isBusy(q))
+        self.assertEqual(proj._publishQueue.waitIdle([q], 0.01), [])
+
+    def test_update_coalesced_for_busy_worker(self):
+        proj = Project()
+        q = proj._publishQueue.register()
+        proj._workerQueues[0] = q
+        # First update is sent
+        self.assertEqual(proj._sendUpdateCommand(0.1), [q])
+        # Worker still busy, following updates are skipped
+        self.assertEqual(proj._sendUpdateCommand(0.1), [])
+        self.assertEqual(proj._sendUpdateCommand(0.2), [])
+        self.assertEqual(proj.getFrameStats()["skippedUpdates"], {0: 2})
+        message = q.get(True, 1)
+        q.task_done()
+        self.assertIsInstance(message, UpdateMessage)
+        self.assertAlmostEqual(message.dt, 0.1)
+        # Next update carries the skipped time
+        self.assertEqual(proj._sendUpdateCommand(0.1), [q])
+        message = q.get(True, 1)
+        q.task_done()
+        self.assertAlmostEqual(message.dt, 0.4)
+        self.assertTrue(q.empty())
+
+    def test_show_skipped_for_busy_output(self):
+        proj = Project()
+        q = proj._showQueue.register()
+        proj._outputQueues['device'] = q
+        proj._sendShowCommand()
+        proj._sendShowCommand()
+        self.assertEqual(proj.getFrameStats()["skippedShows"], 1)
+        self.assertIsInstance(q.get(True, 1), ShowMessage)
+        q.task_done()
+        self.assertFalse(proj._unresponsiveProcesses())
+
+    def test_unresponsive_after_timeout(self):
+        proj = Project()
+        q = proj._publishQueue.register()
+        proj._workerQueues[0] = q
+        proj._sendUpdateCommand(0.1)
+        proj._sendUpdateCommand(0.1)
+        self.assertFalse(proj._unresponsiveProcesses())
+        proj._busySince[q] -= 10.
+        self.assertTrue(proj._unresponsiveProcesses())
+
+    def test_output_preview(self):
+        proj = Project()
+        lock = mp.Lock()
+        array = mp.Array(ctypes.c_uint8, 3 * 10, lock=lock)
+        device = VirtualOutput(device=None, num_pixels=4, shared_array=array, shared_lock=lock, start_index=2)
+        pixels = np.array([[1, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11, 12]])
+        device.show(pixels)
+        self.assertIsNone(proj.getOutputPreview(0))
+        proj._outputPreviews[0] = device
+        num_rows, preview = proj.getOutputPreview(0)
+        self.assertEqual(num_rows, 1)
+        np.testing.assert_array_equal(preview, pixels.T)
+
+    def test_node_preview(self):
+        fg = FilterGraph()
+        node = fg.addEffectNode(colors.StaticRGBColor(r=255, g=128, b=0))
+        node.effect.setNumOutputPixels(5)
+        asyncio.get_event_loop().run_until_complete(node.update(0.1))
+        node.process()
+        previewArray = mp.Array(ctypes.c_uint8, 3 * 10, lock=False)
+        previewInfo = mp.Array(ctypes.c_int64, 3, lock=False)
+        worker_process_nodePreview(fg, node.uid, 0, previewArray, previewInfo)
+        self.assertEqual(list(previewInfo), [5, 1, 1])
+        proj = Project()
+        proj._workerSlots[1] = 3
+        proj._nodePreviews[1] = (previewArray, previewInfo)
+        self.assertIsNone(proj.getNodePreview(3, node.uid))
+        proj.setNodePreview(3, node.uid)
+        # Selecting a node invalidates the current preview until the worker has processed a frame
+        self.assertIsNone(proj.getNodePreview(3, node.uid))
+        worker_process_nodePreview(fg, node.uid, 0, previewArray, previewInfo)
+        num_rows, preview = proj.getNodePreview(3, node.uid)
+        self.assertEqual(num_rows, 1)
+        np.testing.assert_array_equal(preview, np.tile([255, 128, 0], (5, 1)))
+
+    def test_editSlotBatch_sends_single_message(self):
+        proj = Project()
+        q = proj._publishQueue.register()
+
+        def edit(fg):
+            out = fg.addEffectNode(devices.LEDOutput())
+            color = fg.addEffectNode(colors.StaticRGBColor())
+            fg.addNodeConnection(color.uid, 0, out.uid, 0)
+            fg.updateNodeParameter(color.uid, {'r': 10})
+            return color
+
+        color = proj.editSlotBatch(2, edit)
+        message = q.get(True, 1)
+        q.task_done()
+        self.assertIsInstance(message, BatchMessage)
+        self.assertEqual(len(message.messages), 4)
+        self.assertTrue(q.empty())
+        # Worker applies the batch to its own filtergraph
+        workerFg = FilterGraph()
+        worker_process_batchMessage(workerFg, None, 2, message)
+        self.assertEqual(len(workerFg.getNodes()), 2)
+        self.assertEqual(len(workerFg.getConnections()), 1)
+        self.assertEqual(next(n for n in workerFg.getNodes() if n.uid == color.uid).effect.r, 10)
+
+    def test_editSlotBatch_rollback(self):
+        proj = Project()
+        fg = proj.previewSlot(2)
+        fg.addEffectNode(colors.StaticRGBColor())
+        q = proj._publishQueue.register()
+        version = fg.getVersion()
+
+        def edit(fg):
+            fg.addEffectNode(colors.StaticRGBColor())
+            fg.removeEffectNode('unknown')
+
+        with self.assertRaises(StopIteration):
+            proj.editSlotBatch(2, edit)
+        restored = proj.getSlot(2)
+        self.assertEqual(len(restored.getNodes()), 1)
+        self.assertNotEqual(restored.getVersion(), version)
+        self.assertIsNotNone(restored._onNodeAdded)
+        self.assertTrue(q.empty())
+
+    def test_output_skips_unchanged_frames(self):
+        def write(value):
+            def f():
+                np.ctypeslib.as_array(array.get_obj())[:] = value
+            return f
+
+        num_pixels = 10
+        array = mp.Array(ctypes.c_uint8, 3 * num_pixels)
+        device = CountingDevice(num_pixels)
+        virtual = VirtualOutput(device, num_pixels, array, None)
+        messages = [
+            write(1), ShowMessage(), ShowMessage(), ShowMessage(),
+            write(2), ShowMessage(), ShowMessage(),
+            BrightnessMessage(0.5), ShowMessage()
+        ]
+        output(ListQueue(messages), device, virtual)
+        self.assertEqual([int(f[0, 0]) for f in device.frames], [1, 2, 2])
+
+        # Keep-alive
+        device = CountingDevice(num_pixels)
+        device.KEEP_ALIVE_INTERVAL = 0
+        output(ListQueue([write(3), ShowMessage(), ShowMessage()]), device, virtual)
+        self.assertEqual(len(device.frames), 2)
+
+    def test_output_holds_frame_until_presentation_time(self):
+        num_pixels = 10
+        array = mp.Array(ctypes.c_uint8, 3 * num_pixels)
+        virtual = VirtualOutput(None, num_pixels, array, None)
+        latency = mp.Value(ctypes.c_double, 0., lock=False)
+        fast = CountingDevice(num_pixels)
+        slow = CountingDevice(num_pixels)
+        slow.setLatency(0.03)
+        presentation_t = time.monotonic() + 0.04
+        # Each device is shown its latency ahead of the presentation time
+        output(ListQueue([ShowMessage(presentation_t)]), slow, virtual, latency)
+        self.assertGreaterEqual(slow.show_t[0], presentation_t - 0.03)
+        self.assertLess(slow.show_t[0], presentation_t)
+        self.assertAlmostEqual(latency.value, 0.03)
+        output(ListQueue([ShowMessage(presentation_t)]), fast, virtual, latency)
+        self.assertGreaterEqual(fast.show_t[0], presentation_t)
+
+    def test_held_frames_dont_block_low_latency_output(self):
+        fps = 60
+        num_pixels = 10
+        array = mp.Array(ctypes.c_uint8, 3 * num_pixels)
+        virtual = VirtualOutput(None, num_pixels, array, None)
+        fast = SharedCountingDevice(num_pixels)
+        slow = SharedCountingDevice(num_pixels)
+        # Fast device holds its frames for more than one frame period
+        slow.setLatency(2.5 / fps)
+        proj = Project()
+        processes = []
+        for device in [fast, slow]:
+            q = proj._showQueue.register()
+            proj._outputQueues[device] = q
+            proj._outputLatencies[device] = mp.Value(ctypes.c_double, 0., lock=False)
+            p = mp.Process(target=output, args=(q, device, virtual, proj._outputLatencies[device]))
+            p.start()
+            processes.append(p)
+        try:
+            for q in proj._outputQueues.values():
+                q.put("check_is_processing")
+                q.join()
+            for i in range(30):
+                np.ctypeslib.as_array(array.get_obj())[:] = i + 1
+                proj._sendShowCommand()
+                time.sleep(1 / fps)
+        finally:
+            for q in proj._outputQueues.values():
+                q.put(None)
+            for p in processes:
+                p.join(2)
+        self.assertAlmostEqual(proj._getPresentationDelay(), 2.5 / fps, places=3)
+        self.assertLessEqual(proj.getFrameStats()["skippedShows"], 2)
+        self.assertGreaterEqual(fast.count.value, 29)
+        self.assertGreaterEqual(slow.count.value, 29)
+
+    def test_presentation_delay(self):
+        proj = Project()
+        self.assertEqual(proj.getFrameStats()["presentationDelay"], 0.)
+        fast = CountingDevice(10)
+        slow = CountingDevice(10)
+        proj._outputLatencies[fast] = mp.Value(ctypes.c_double, 0.002, lock=False)
+        proj._outputLatencies[slow] = mp.Value(ctypes.c_double, 0.02, lock=False)
+        stats = proj.getFrameStats()
+        self.assertAlmostEqual(stats["presentationDelay"], 0.02)
+        self.assertEqual([entry["device"] for entry in stats["outputLatencies"]], ["CountingDevice", "CountingDevice"])
+        proj._outputLatencies[slow].value = 1.
+        self.assertAlmostEqual(proj.getFrameStats()["presentationDelay"], MAX_PRESENTATION_DELAY)
+
+    def test_output_measures_end_to_end_latency(self):
+        num_pixels = 10
+        array = mp.Array(ctypes.c_uint8, 3 * num_pixels)
+        device = CountingDevice(num_pixels)
+        device.setLatency(0.01)
+        virtual = VirtualOutput(device, num_pixels, array, None)
+        endToEnd = LatencyHistory(size=4)
+        self.assertIsNone(endToEnd.getPercentiles())
+        audio_t = time.monotonic() - 0.1
+
+        def write():
+            np.ctypeslib.as_array(array.get_obj())[:] = 1
+
+        # Frames without audio timestamp aren't measured
+        output(ListQueue([ShowMessage(), write, ShowMessage(None, audio_t)]), device, virtual, None, endToEnd)
+        self.assertEqual(endToEnd.getCount(), 1)
+        p50, p90, p99 = endToEnd.getPercentiles()
+        self.assertAlmostEqual(p50, device.show_t[1] + 0.01 - audio_t, places=2)
+
+        # Ring keeps the latest latencies
+        for latency in [1., 2., 3., 4., 5.]:
+            endToEnd.add(latency)
+        self.assertEqual(endToEnd.getCount(), 6)
+        self.assertEqual(endToEnd.getPercentiles([0, 100]), [2., 5.])
+
+    def test_audio_timestamp_carried_to_show(self):
+        proj = Project()
+        q = proj._publishQueue.register()
+        proj._workerQueues[0] = q
+        showQueue = proj._showQueue.register()
+        proj._outputQueues[CountingDevice(10)] = showQueue
+        buffer_t = audio.GlobalAudio.buffer_t
+        try:
+            audio.GlobalAudio.buffer_t = 12.5
+            proj._sendUpdateCommand(0.1)
+            audio.GlobalAudio.buffer_t = 13.
+        finally:
+            audio.GlobalAudio.buffer_t = buffer_t
+        message = q.get(True, 1)
+        q.task_done()
+        self.assertEqual(message.audioTimestamp, 12.5)
+        proj._sendShowCommand(proj._frameAudio_t)
+        message = showQueue.get(True, 1)
+        showQueue.task_done()
+        self.assertEqual(message.audio_t, 12.5)
+
+    def test_update_carries_audio_since_previous_update(self):
+        proj = Project()
+        q = proj._publishQueue.register()
+        proj._workerQueues[0] = q
+        state = (audio.GlobalAudio.ring, audio.GlobalAudio.buffer)
+        try:
+            audio.GlobalAudio.ring = audio.AudioRing(1, 100)
+            audio.GlobalAudio.ring.writeChannels(np.ones((1, 10)), 0.)
+            proj._sendUpdateCommand(0.1)
+            audio.GlobalAudio.ring.writeChannels(np.full((1, 5), 2.), 0.)
+            # Worker busy, audio is kept for the next update
+            proj._sendUpdateCommand(0.1)
+            audio.GlobalAudio.ring.writeChannels(np.full((1, 5), 3.), 0.)
+            first = q.get(True, 1)
+            q.task_done()
+            proj._sendUpdateCommand(0.1)
+            second = q.get(True, 1)
+            q.task_done()
+        finally:
+            audio.GlobalAudio.ring, audio.GlobalAudio.buffer = state
+        np.testing.assert_array_equal(first.audioBuffer, np.ones((1, 10)))
+        np.testing.assert_array_equal(second.audioBuffer, [[2.] * 5 + [3.] * 5])
+
+    def test_update_pulls_one_frame_from_non_realtime_source(self):
+        proj = Project()
+        q = proj._publishQueue.register()
+        proj._workerQueues[0] = q
+        source = audiosource.SyntheticAudioSource('noise', sample_rate=6000, num_channels=1, realtime=False)
+        audio.GlobalAudio(chunk_rate=60, source=source)
+        try:
+            for _ in range(3):
+                proj._sendUpdateCommand(1 / 60)
+                message = q.get(True, 1)
+                q.task_done()
+                self.assertEqual(message.audioBuffer.shape, (1, 100))
+        finally:
+            source.stop()
+            audio.GlobalAudio.source = None
+        expected = audiosource.SyntheticAudioSource('noise', sample_rate=6000, num_channels=1)
+        expected.read(200)
+        np.testing.assert_allclose(message.audioBuffer[0], expected.read(100), atol=1e-6)
+
@@ -0,0 +1,119 @@
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+
+import asyncio
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from audioled import devices, effects, input, recording, serverconfiguration
+
+
+class CaptureDevice(devices.LEDController):
+    def show(self, pixels):
+        self.pixels = pixels
+
+
+class Test_Recording(unittest.TestCase):
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpDir.name, 'show.rec')
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    def test_ring_wraps(self):
+        ring = recording.FrameRing.create(self.filename, 4, capacity=3)
+        for i in range(5):
+            ring.append(np.full((3, 4), 100. * i), float(i))
+        self.assertEqual(ring.getCount(), 5)
+        self.assertEqual(len(ring), 3)
+        self.assertEqual([ring.getFrame(i)[0] for i in range(3)], [2.0, 3.0, 4.0])
+        # Values are clipped
+        np.testing.assert_array_equal(ring.getFrame(2)[1], np.full((3, 4), 255))
+        self.assertRaises(IndexError, ring.getFrame, 3)
+        ring.close()
+        reader = recording.FrameRing.open(self.filename)
+        self.assertEqual(reader.num_pixels, 4)
+        self.assertEqual(len(reader), 3)
+
+    def test_invalid_file(self):
+        with open(self.filename, 'wb') as f:
+            f.write(b'\x00' * 128)
+        self.assertRaises(ValueError, recording.FrameRing.open, self.filename)
+
+    def test_record_and_replay(self):
+        num_pixels = 10
+        capture = CaptureDevice(num_pixels)
+        device = devices.RecordingOutput(capture, self.filename, capacity=10)
+        frames = [np.full((3, num_pixels), float(i)) for i in range(5)]
+        for frame in frames:
+            device.show(frame)
+        self.assertIs(capture.pixels, frames[-1])
+        device.shutdown()
+
+        replay = input.ReplayInput(file=self.filename)
+        replay.setNumOutputPixels(num_pixels)
+        replay.setOutputBuffer([None])
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(replay.update(0.))
+        loop.run_until_complete(replay.update(0.))
+        replay.process()
+        np.testing.assert_array_equal(replay._outputBuffer[0], frames[0])
+        self.assertEqual(replay._outputBuffer[0].dtype, np.float32)
+        # Jump to the end of the recording
+        timestamps = [replay._ring.getFrame(i)[0] for i in range(5)]
+        loop.run_until_complete(replay.update(timestamps[-1] - timestamps[0]))
+        replay.process()
+        np.testing.assert_array_equal(replay._outputBuffer[0], frames[-1])
+        loop.close()
+
+    def test_replay_into_combine(self):
+        num_pixels = 4
+        device = devices.RecordingOutput(CaptureDevice(num_pixels), self.filename, capacity=10)
+        device.show(np.full((3, num_pixels), 200.))
+        device.shutdown()
+        replay = input.ReplayInput(file=self.filename)
+        replay.setNumOutputPixels(num_pixels)
+        replay.setOutputBuffer([None])
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(replay.update(0.))
+        loop.run_until_complete(replay.update(0.))
+        loop.close()
+        replay.process()
+        combine = effects.Combine(mode='addition')
+        combine.setInputBuffer([replay._outputBuffer[0], replay._outputBuffer[0]])
+        combine.setOutputBuffer([None])
+        combine.process()
+        # No uint8 wrap-around
+        np.testing.assert_array_equal(combine._outputBuffer[0], np.full((3, num_pixels), 400.))
+
+    def test_file_parameter(self):
+        replay = input.ReplayInput(file=self.filename)
+        self.assertEqual(replay.getParameter()['parameters']['file'][0], self.filename)
+        self.assertNotIn('file', replay.getModulateableParameters())
+        device = devices.RecordingOutput(CaptureDevice(2), self.filename, capacity=10)
+        device.show(np.full((3, 2), 10.))
+        device.shutdown()
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(replay.update(0.))
+        self.assertIsNotNone(replay._ring)
+        replay.updateParameter({'file': 'other.rec'})
+        self.assertIsNone(replay._ring)
+        loop.close()
+
+    def test_created_from_config(self):
+        config = serverconfiguration.ServerConfiguration()
+        wrapper = config.createOutputDeviceFromConfig([{
+            "device": "DMXOutput",
+            "device.dmx.host": "127.0.0.1",
+            "device.record.file": self.filename,
+            "device.record.capacity": 50,
+            "device.num_pixels": 10,
+            "device.num_rows": 1
+        }], {})
+        device = wrapper._devices[0]
+        self.assertIsInstance(device, devices.RecordingOutput)
+        self.assertIsInstance(device.device, devices.DMXOutput)
+        self.assertEqual(device.capacity, 50)
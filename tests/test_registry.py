@@ -0,0 +1,75 @@
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+
+import json
+import os
+import tempfile
+import unittest
+
+from audioled import effect, registry
+
+
+class Test_Registry(unittest.TestCase):
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.cacheFile = os.path.join(self.tmpDir.name, 'effect_registry.json')
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    def test_build_writes_cache(self):
+        reg = registry.EffectRegistry(self.cacheFile)
+        names = reg.getClassNames()
+        self.assertIn("audioled.colors.StaticRGBColor", names)
+        self.assertIn("audioled.modulation.ExternalLinearController", names)
+        self.assertTrue(os.path.exists(self.cacheFile))
+        entry = reg.get("audioled.colors.StaticRGBColor")
+        self.assertEqual(entry['module'], "audioled.colors")
+        self.assertFalse(entry['isModulationSource'])
+        self.assertIn('r', entry['args'])
+        self.assertIsNotNone(entry['parameters'])
+        self.assertIsNone(reg.get("audioled.colors.DoesNotExist"))
+
+    def test_cache_is_reused(self):
+        reg = registry.EffectRegistry(self.cacheFile)
+        names = reg.getClassNames()
+        with open(self.cacheFile, "r") as f:
+            cache = json.load(f)
+        # Mark cache to see whether it is used
+        cache['entries']["audioled.colors.StaticRGBColor"]['description'] = "from cache"
+        with open(self.cacheFile, "w") as f:
+            json.dump(cache, f)
+        reg = registry.EffectRegistry(self.cacheFile)
+        self.assertEqual(reg.getClassNames(), names)
+        self.assertEqual(reg.get("audioled.colors.StaticRGBColor")['description'], "from cache")
+
+    def test_outdated_cache_is_rebuilt(self):
+        with open(self.cacheFile, "w") as f:
+            json.dump({"fingerprint": "outdated", "entries": {}}, f)
+        reg = registry.EffectRegistry(self.cacheFile)
+        self.assertIn("audioled.colors.StaticRGBColor", reg.getClassNames())
+        with open(self.cacheFile, "r") as f:
+            self.assertEqual(json.load(f)['fingerprint'], registry.modulesFingerprint())
+
+    def test_fingerprint_covers_all_modules(self):
+        with tempfile.TemporaryDirectory() as packageDir:
+            for fileName in ['effects.py', 'shifter.py']:
+                with open(os.path.join(packageDir, fileName), "w") as f:
+                    f.write("# module\n")
+            fingerprint = registry.modulesFingerprint(packageDir)
+            self.assertEqual(registry.modulesFingerprint(packageDir), fingerprint)
+            # Changing a module not listed in EFFECT_MODULES invalidates the cache
+            with open(os.path.join(packageDir, 'shifter.py'), "a") as f:
+                f.write("QUALITIES = []\n")
+            self.assertNotEqual(registry.modulesFingerprint(packageDir), fingerprint)
+
+    def test_dynamic_parameters_not_cached(self):
+        reg = registry.EffectRegistry()
+        entry = reg.get("audioled.generative.MidiKeyboard")
+        self.assertTrue(entry['dynamicParameters'])
+        self.assertIsNone(entry['parameters'])
+
+    def test_args_with_defaults_cached(self):
+        from audioled import colors
+        args = effect.getArgsWithDefaults(colors.StaticRGBColor)
+        self.assertIs(effect.getArgsWithDefaults(colors.StaticRGBColor), args)
+        self.assertEqual(args['r'], 255.0)
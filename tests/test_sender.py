@@ -0,0 +1,117 @@
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+
+import threading
+import time
+import unittest
+
+from audioled import devices, sender
+
+
+def _waitFor(condition, timeout=2.):
+    start = time.time()
+    while not condition() and time.time() - start < timeout:
+        time.sleep(0.01)
+    return condition()
+
+
+class Test_FrameSender(unittest.TestCase):
+    def test_latest_frame_wins(self):
+        sent = []
+        release = threading.Event()
+
+        def send(frame):
+            release.wait(2)
+            sent.append(frame)
+
+        s = sender.FrameSender(send)
+        s.start()
+        s.submit(0)
+        self.assertTrue(_waitFor(lambda: s._frame is None))
+        # Sender is busy with frame 0, only the newest of the following frames is sent
+        for i in range(1, 5):
+            s.submit(i)
+        release.set()
+        self.assertTrue(_waitFor(lambda: len(sent) == 2))
+        s.stop()
+        self.assertEqual(sent, [0, 4])
+        stats = s.getStats()
+        self.assertEqual(stats['sent'], 2)
+        self.assertEqual(stats['dropped'], 3)
+
+    def test_reconnect_with_backoff(self):
+        attempts = []
+        sent = []
+
+        def connect():
+            attempts.append(time.monotonic())
+            return len(attempts) > 2
+
+        s = sender.FrameSender(sent.append, connect=connect, min_backoff=0.05)
+        s.start()
+        s.submit('frame')
+        self.assertTrue(_waitFor(lambda: sent == ['frame']))
+        s.stop()
+        self.assertEqual(len(attempts), 3)
+        # Back-off doubles between attempts
+        self.assertGreater(attempts[2] - attempts[1], attempts[1] - attempts[0])
+        self.assertEqual(s.getStats()['reconnects'], 1)
+
+    def test_send_failure_reconnects(self):
+        connects = []
+        disconnects = []
+        results = [False, True]
+
+        def send(frame):
+            return results.pop(0)
+
+        s = sender.FrameSender(send,
+                               connect=lambda: connects.append(1) or True,
+                               disconnect=lambda: disconnects.append(1),
+                               min_backoff=0.01)
+        s.start()
+        s.submit('a')
+        self.assertTrue(_waitFor(lambda: len(connects) == 2))
+        s.submit('b')
+        self.assertTrue(_waitFor(lambda: s.getStats()['sent'] == 1))
+        s.stop()
+        self.assertEqual(len(disconnects), 1)
+        self.assertEqual(s.getStats()['failed'], 1)
+
+    def test_send_error_keeps_thread_alive(self):
+        sent = []
+
+        def send(frame):
+            if frame == 'bad':
+                raise ValueError("cannot encode frame")
+            sent.append(frame)
+
+        s = sender.FrameSender(send, min_backoff=0.01)
+        s.start()
+        s.submit('bad')
+        self.assertTrue(_waitFor(lambda: s.getStats()['failed'] == 1))
+        s.submit('good')
+        self.assertTrue(_waitFor(lambda: sent == ['good']))
+        self.assertTrue(s.isAlive())
+        s.stop()
+
+    def test_stats_reset_keeps_latency_average(self):
+        s = sender.FrameSender(lambda frame: None)
+        s.sent = 5
+        s.failed = 1
+        s.latency_avg = 0.02
+        s.latency_max = 0.05
+        s._logStats()
+        stats = s.getStats()
+        self.assertEqual(stats['sent'], 0)
+        self.assertEqual(stats['failed'], 0)
+        self.assertEqual(stats['latency_max'], 0.)
+        self.assertEqual(stats['latency_avg'], 0.02)
+
+    def test_fadecandy_show_does_not_block(self):
+        # Nothing is listening on this port
+        device = devices.FadeCandy(10, server='127.0.0.1:7899')
+        start = time.monotonic()
+        for i in range(10):
+            device.show(None)
+        self.assertLess(time.monotonic() - start, 0.5)
+        device.shutdown()
@@ -0,0 +1,55 @@
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+
+import unittest
+from unittest import mock
+
+import numpy as np
+from scipy import ndimage
+
+from audioled import shifter
+
+
+class Test_Shifter(unittest.TestCase):
+    def test_shift_matches_periodic_spline(self):
+        x = np.random.RandomState(0).uniform(0, 255, (3, 50))
+        for quality, order in [('cubic', 3), ('linear', 1)]:
+            s = shifter.Shifter(quality)
+            for shift in [0., 1., 2.3, -7.6, 49.5, 1000.25]:
+                expected = ndimage.shift(x, [0, shift], order=order, mode='grid-wrap')
+                np.testing.assert_allclose(s.shift(x, shift), expected, atol=1e-9)
+            # Integer shifts are rolls
+            np.testing.assert_allclose(s.shift(x, 3), np.roll(x, 3, axis=1), atol=1e-9)
+
+    def test_shift_per_row(self):
+        rng = np.random.RandomState(1)
+        waves = rng.uniform(0, 1, (12, 40))
+        shifts = rng.uniform(-100, 100, 12)
+        s = shifter.Shifter()
+        out = np.empty_like(waves)
+        self.assertIs(s.shift(waves, shifts, out=out), out)
+        for wave, shift, row in zip(waves, shifts, out):
+            np.testing.assert_allclose(row, ndimage.shift(wave, shift, order=3, mode='grid-wrap'), atol=1e-9)
+        np.testing.assert_allclose(s.shift(np.ones(1), 0.4), [1.])
+        with self.assertRaises(ValueError):
+            shifter.Shifter('quintic')
+
+    def test_spline_coefficients_are_cached(self):
+        x = np.random.RandomState(2).uniform(0, 1, 30)
+        s = shifter.Shifter('cubic')
+        with mock.patch('audioled.shifter.spline_coefficients', side_effect=shifter.spline_coefficients) as f:
+            first = s.shift(x, 0.5)
+            for t in range(5):
+                s.shift(x.copy(), 0.1 * t)
+            self.assertEqual(f.call_count, 1)
+            # Other keys and changed inputs are recomputed
+            s.shift(x, 0.5, key=1)
+            changed = x.copy()
+            changed[0] = 2.
+            s.shift(changed, 0.5, key=1)
+            self.assertEqual(f.call_count, 3)
+        # Returned arrays aren't overwritten by later calls
+        np.testing.assert_allclose(first, s.shift(x, 0.5))
+
+
+if __name__ == '__main__':
+    unittest.main()